@@ -0,0 +1,29 @@
+"""
+Compare the current and the tight MIP formulations on Gurobi.
+
+Run with `python -m benchmarks.formulations`.
+"""
+from benchmarks.lazy_cuts import benchmark_inputs
+from solver.solver import Solver
+from solver.utils import BackendError
+
+
+def main():
+    """Print node counts, callbacks and solve times of both formulations."""
+    print(f"{'input':<24}{'build':<7}{'cuts':>6}{'callbacks':>11}{'nodes':>8}{'time, s':>10}")
+    for name, coordinates in benchmark_inputs(sizes=(12, 15, 18, 20, 22)):
+        for build in ('loop', 'tight'):
+            solver = Solver(coordinates, backend='gurobi', build=build)
+            try:
+                solver.solve()
+            except BackendError as e:
+                # the tight model can fit a size-limited license the loop model exceeds
+                print(f"{name:<24}{build:<7}skipped: {str(e)[:40]}")
+                continue
+            stats = solver.get_stats()
+            print(f"{name:<24}{build:<7}{stats['lazy_constraints_added']:>6}"
+                  f"{stats['callbacks']:>11}{stats['node_count']:>8}{stats['runtime']:>10.3f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,42 @@
+"""
+Compare single-cut and multi-cut lazy constraint separation.
+
+Run with `python -m benchmarks.lazy_cuts`.
+"""
+import random
+from test.consts_input import input_matrix_7x7, input_matrix_10x10
+from test.test_routers import hard_to_solve_example
+
+from generators.generate_randomly import generate_rooms
+from solver.solver import Solver
+from solver.utils import BackendError
+
+
+def benchmark_inputs(sizes=(12, 15, 18), seed=0):
+    """Return the named inputs to benchmark."""
+    random.seed(seed)
+    inputs = [("7x7", input_matrix_7x7), ("10x10", input_matrix_10x10)]
+    inputs.extend((f"random {size}x{size}", generate_rooms(size)) for size in sizes)
+    inputs.append(("hard_to_solve_example", hard_to_solve_example["coordinates"]))
+    return inputs
+
+
+def main():
+    """Print lazy cut, callback and node counts for both modes."""
+    print(f"{'input':<24}{'mode':<8}{'cuts':>6}{'callbacks':>11}{'nodes':>8}{'time, s':>10}")
+    for name, coordinates in benchmark_inputs():
+        for multi_cut in (False, True):
+            solver = Solver(coordinates, backend='gurobi', multi_cut=multi_cut)
+            try:
+                solver.solve()
+            except BackendError as e:
+                print(f"{name:<24}skipped: {e}")
+                break
+            stats = solver.get_stats()
+            print(f"{name:<24}{'multi' if multi_cut else 'single':<8}"
+                  f"{stats['lazy_constraints_added']:>6}{stats['callbacks']:>11}"
+                  f"{stats['node_count']:>8}{stats['runtime']:>10.3f}")
+
+
+if __name__ == '__main__':
+    main()
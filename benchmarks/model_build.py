@@ -0,0 +1,74 @@
+"""
+Compare the model build time of the loop and the matrix builds on Gurobi.
+
+The matrix build is timed with and without its per-size template.
+
+Run with `python -m benchmarks.model_build`.
+"""
+import random
+import time
+
+from solver.backends.gurobi import WORKER, GurobiBackend, get_env
+from solver.solver import Solver
+
+
+def random_partition(size, rooms, seed=0):
+    """Split a size x size grid into connected rooms grown from random seeds."""
+    rng = random.Random(seed)
+    cells = [(x, y) for x in range(size) for y in range(size)]
+    owner = {cell: k for k, cell in enumerate(rng.sample(cells, rooms))}
+    frontier = list(owner)
+    while len(owner) < size * size:
+        x, y = cell = rng.choice(frontier)
+        free = [(x + dx, y + dy) for dx, dy in ((1, 0), (-1, 0), (0, 1), (0, -1))
+                if 0 <= x + dx < size and 0 <= y + dy < size and (x + dx, y + dy) not in owner]
+        if not free:
+            frontier.remove(cell)
+            continue
+        grown = rng.choice(free)
+        owner[grown] = owner[cell]
+        frontier.append(grown)
+    regions = [{} for _ in range(rooms)]
+    for (x, y), k in owner.items():
+        regions[k][f'{x},{y}'] = ''
+    for k, region in enumerate(regions):
+        if k % 3:
+            region[next(iter(region))] = 'SA'[k % 3 - 1]
+    return regions
+
+
+def build_time(coordinates, build, templates=True, repeat=5):
+    """Return the best time to build and load the model into Gurobi."""
+    get_env()
+    best = float('inf')
+    for _ in range(repeat):
+        if not templates:
+            WORKER.templates.clear()
+        start = time.perf_counter()
+        solver = Solver(coordinates, build=build)
+        backend = GurobiBackend()
+        if build == 'matrix':
+            solver.build_matrix_model(backend, {})
+        else:
+            solver.build_model(backend, {})
+        backend.model.update()
+        best = min(best, time.perf_counter() - start)
+    return best, backend.model.NumVars, backend.model.NumConstrs
+
+
+def main():
+    """Print the build time of both builds for sizes 5 to 22."""
+    print(f"{'size':>5}{'loop, ms':>10}{'vars':>6}{'rows':>6}"
+          f"{'matrix, ms':>12}{'vars':>6}{'rows':>6}{'template, ms':>14}{'speedup':>9}")
+    for size in range(5, 23):
+        coordinates = random_partition(size, max(size * size // 6, 3), seed=size)
+        loop, loop_vars, loop_rows = build_time(coordinates, 'loop')
+        matrix, matrix_vars, matrix_rows = build_time(coordinates, 'matrix', templates=False)
+        template, _, _ = build_time(coordinates, 'matrix')
+        print(f"{size:>5}{loop * 1000:>10.2f}{loop_vars:>6}{loop_rows:>6}"
+              f"{matrix * 1000:>12.2f}{matrix_vars:>6}{matrix_rows:>6}"
+              f"{template * 1000:>14.2f}{loop / template:>8.1f}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,99 @@
+"""
+Tune the Gurobi parameters per grid size and store the winning profiles.
+
+Every grid size gets a corpus of random puzzles. The parameters are searched
+one at a time, keeping a value when it lowers the total solve time of the
+corpus, for a few rounds. Gurobi's own tuning tool can not run the lazy
+connectivity cuts, which need the callback of the Solver, so it would tune
+a different model. The Solver loads the profile of the nearest tuned size.
+
+Run with `python -m benchmarks.tune_gurobi --sizes 10 12 15`.
+"""
+import argparse
+import time
+
+from benchmarks.model_build import random_partition
+from solver.backends.profiles import GUROBI_PROFILES, load_profiles, save_profiles
+from solver.solver import Solver
+from solver.utils import BackendError, SolveTimeoutError
+
+SEARCH_SPACE = {
+    'MIPFocus': [0, 1, 2, 3],
+    'Cuts': [-1, 0, 1, 2],
+    'Presolve': [-1, 0, 1, 2],
+    'Heuristics': [0.0, 0.05, 0.2, 0.5],
+    'Threads': [0, 1, 2, 4],
+}
+MIN_GAIN = 0.05  # Smaller gains are taken for timing noise
+
+
+def corpus(size, count, seed=0):
+    """Return count random puzzles of a grid size."""
+    return [random_partition(size, size * size // 4, seed + k) for k in range(count)]
+
+
+def corpus_time(puzzles, profile, time_limit):
+    """Return the total solve time of the puzzles, a timeout counts twice the time limit."""
+    total = 0.0
+    for coordinates in puzzles:
+        solver = Solver(coordinates, backend='gurobi', profile=profile)
+        start = time.perf_counter()
+        try:
+            solver.solve(time_limit=time_limit)
+        except SolveTimeoutError:
+            total += 2 * time_limit
+            continue
+        total += time.perf_counter() - start
+    return total
+
+
+def tune_size(puzzles, rounds=2, time_limit=30.0):
+    """
+    Search the parameters one at a time from Gurobi's defaults.
+
+    Returns:
+        A (profile, default_time, best_time) tuple.
+    """
+    best = {}
+    default_time = best_time = corpus_time(puzzles, best, time_limit)
+    for _ in range(rounds):
+        improved = False
+        for name, values in SEARCH_SPACE.items():
+            for value in values:
+                if best.get(name) == value:
+                    continue
+                candidate = {**best, name: value}
+                candidate_time = corpus_time(puzzles, candidate, time_limit)
+                if candidate_time < best_time * (1 - MIN_GAIN):
+                    best, best_time, improved = candidate, candidate_time, True
+        if not improved:
+            break
+    return best, default_time, best_time
+
+
+def main():
+    """Tune the requested sizes and merge their profiles into the profile file."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10, 12, 15])
+    parser.add_argument('--puzzles', type=int, default=8, help="puzzles per size")
+    parser.add_argument('--rounds', type=int, default=2)
+    parser.add_argument('--time-limit', type=float, default=30.0, help="seconds per solve")
+    parser.add_argument('--output', default=GUROBI_PROFILES)
+    args = parser.parse_args()
+
+    profiles = load_profiles(args.output)
+    print(f"{'size':<6}{'default, s':>12}{'tuned, s':>10}  profile")
+    for size in args.sizes:
+        try:
+            profile, default_time, best_time = tune_size(
+                corpus(size, args.puzzles), args.rounds, args.time_limit)
+        except BackendError as e:
+            print(f"{size:<6}skipped: {str(e)[:60]}")
+            continue
+        profiles[size] = profile
+        print(f"{size:<6}{default_time:>12.3f}{best_time:>10.3f}  {profile}")
+    save_profiles(profiles, args.output)
+
+
+if __name__ == '__main__':
+    main()
@@ -1,7 +1,11 @@
 """Module to generate all possible variants of a matrix to solve"""
+import asyncio
 import copy
 import itertools
+from collections import deque
 
+from generators.writer import BufferedWriter
+from solver.pool import BATCH_POOL, BATCH_SLOTS
 from solver.solver import Solver
 from database import DB
 
@@ -74,9 +78,34 @@ def additioal_conditions(matrix, symbols):
     return all_conditions, condition
 
 
-async def generate_variants(matrix_size, client_symbols=None, start=None, end=None):
+def layout(matrix_size, index, rows=None):
+    """Return the index-th matrix of 1/0, its rows are the digits of index in base 2 ** size"""
+    if rows is None:
+        rows = list(itertools.product([0, 1], repeat=matrix_size))
+    return [rows[(index // (len(rows) ** j)) % len(rows)] for j in range(matrix_size)]
+
+
+def solve_variants(conditions, unique=False):
+    """Solve the symbol variants of a layout and return the solvable ones with their solution"""
+    documents = []
+    for room in conditions:
+        solver = Solver(room, presolve=True, unique=unique)
+        solution = solver.solve()
+        if len(solution) != 0 and (not unique or solver.is_unique):
+            documents.append({"condition": room, "solution": solution})
+    return documents
+
+
+async def solve_layout(conditions, unique):
+    """Solve the variants of a layout in the batch pool, once a batch slot is free"""
+    async with BATCH_SLOTS:
+        return await BATCH_POOL.run(solve_variants, conditions, unique)
+
+
+async def generate_variants(matrix_size, client_symbols=None, start=None, end=None,
+                            unique=False):
     """Generate all possible variants of a matrix based on the matrix size 
-    and symbols provided by the client"""
+    and symbols provided by the client, with unique only the uniquely solvable ones"""
 
     if client_symbols is None:
         client_symbols = [""]
@@ -94,21 +123,28 @@ async def generate_variants(matrix_size, client_symbols=None, start=None, end=No
         end = len(r_v) ** matrix_size
 
     # empty the collection before inserting new data
-    await DB[f'variant-{matrix_size}'].delete_many({})
-
-    for i in range(min(start, end), min(len(r_v) ** matrix_size, end)):
-        matrix = []
-        for j in range(matrix_size):
-            row_idx = (i // (len(r_v) ** j)) % len(r_v)
-            matrix.append(r_v[row_idx])
-
-        conditions, condition = additioal_conditions(matrix, symbols)
-
-        for room in conditions:
-            solution = Solver(room).solve()
-            if len(solution) != 0:
-                _ = DB[f'variant-{matrix_size}'].insert_one(
-                    {"condition": condition, "solution": solution})
-                possible_variants_count += 1
+    collection = DB[f'variant-{matrix_size}']
+    await collection.delete_many({})
+
+    # layouts are solved in the batch pool, at most a few ahead of the writer
+    pending = deque()
+    async with BufferedWriter(collection) as writer:
+        async def write_oldest():
+            documents = await pending.popleft()
+            for document in documents:
+                await writer.add(document)
+            return len(documents)
+
+        try:
+            for i in range(min(start, end), min(len(r_v) ** matrix_size, end)):
+                conditions, _ = additioal_conditions(layout(matrix_size, i, r_v), symbols)
+                if len(pending) >= BATCH_POOL.workers:
+                    possible_variants_count += await write_oldest()
+                pending.append(asyncio.ensure_future(solve_layout(conditions, unique)))
+            while pending:
+                possible_variants_count += await write_oldest()
+        finally:
+            for task in pending:
+                task.cancel()
 
     return possible_variants_count
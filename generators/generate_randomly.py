@@ -1,10 +1,11 @@
 """Rooms generator module."""
+import os
 import random
 
-from gurobipy.gurobipy import GurobiError
-
 from solver.solver import Solver
-from solver.utils import InvalidInputError
+from solver.utils import GenerationError, InvalidInputError
+
+GENERATE_ATTEMPTS = int(os.getenv('GENERATE_ATTEMPTS', '100'))  # Random layouts tried per call
 
 
 def generate_cords_from_number(grid_size):
@@ -24,12 +25,29 @@ def generate_room(length_limit):
     return room_length, room_symbol
 
 
-def generate_rooms(size):
-    """Generate rooms."""
+def generate_rooms(size, unique=False, attempts=GENERATE_ATTEMPTS):
+    """
+    Generate solvable rooms, with unique only rooms with exactly one solution.
+
+    Raises:
+        GenerationError: If none of attempts random layouts fits.
+    """
     if size <= 1 or size >= 23:
         raise InvalidInputError(
             "The amount of rows and columns must be between 2 and 23")
 
+    for _ in range(attempts):
+        result = random_rooms(size)
+        solver = Solver(result, presolve=True, unique=unique)
+        solution = solver.solve()
+        if len(solution) > 0 and (not unique or solver.is_unique):
+            return result
+    kind = "uniquely solvable" if unique else "solvable"
+    raise GenerationError(f"No {kind} rooms were generated in {attempts} attempts")
+
+
+def random_rooms(size):
+    """Split a grid into random rooms, each with a random symbol on a random cell."""
     cords_list = generate_cords_from_number(size)
 
     x, y = [random.randint(0, size - 1), random.randint(0, size - 1)]
@@ -70,12 +88,4 @@ def generate_rooms(size):
         result.append(obj)
         obj = {}
 
-    try:
-        solver = Solver(result)
-        solution = solver.solve()
-        if len(solution) < 1:
-            result = generate_rooms(size)
-    except GurobiError:
-        return result
-
     return result
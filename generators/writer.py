@@ -0,0 +1,111 @@
+"""Buffered bulk writes of generated documents.
+
+Documents are collected into batches of batch_size and inserted with one
+unordered insert_many per batch. At most max_in_flight batches are pending at
+once; a full pipeline makes the producer wait for the oldest batch, so memory
+stays bounded when the database is slower than the generator.
+"""
+import asyncio
+import os
+import threading
+import time
+
+VARIANT_BATCH_SIZE = int(os.getenv('VARIANT_BATCH_SIZE', '500'))  # Documents per insert_many
+VARIANT_MAX_IN_FLIGHT = int(os.getenv('VARIANT_MAX_IN_FLIGHT', '4'))  # Batches pending at once
+
+
+class WriteStats:
+    """Documents, batches and seconds of the writers, for the throughput"""
+
+    def __init__(self, clock=time.monotonic):
+        self.clock = clock
+        self.documents = 0
+        self.batches = 0
+        self.seconds = 0.0
+        self.lock = threading.Lock()
+
+    def record(self, documents, batches, seconds):
+        """Count the writes of a writer and the seconds it was open"""
+        with self.lock:
+            self.documents += documents
+            self.batches += batches
+            self.seconds += seconds
+
+    def to_dict(self):
+        """Get the totals and the documents written per second"""
+        with self.lock:
+            return {"documents": self.documents, "batches": self.batches,
+                    "seconds": round(self.seconds, 3),
+                    "documents_per_second": round(self.documents / self.seconds, 1)
+                    if self.seconds else 0.0}
+
+
+VARIANT_WRITES = WriteStats()
+
+
+class BufferedWriter:
+    """
+    Insert documents into a collection in unordered batches.
+
+    Use as an async context manager, the last batch is written on exit.
+    """
+
+    def __init__(self, collection, batch_size=VARIANT_BATCH_SIZE,
+                 max_in_flight=VARIANT_MAX_IN_FLIGHT, stats=VARIANT_WRITES):
+        self.collection = collection
+        self.batch_size = batch_size
+        self.max_in_flight = max_in_flight
+        self.stats = stats
+        self.buffer = []
+        self.in_flight = set()
+        self.documents = 0
+        self.batches = 0
+        self.started = stats.clock()
+
+    async def add(self, document):
+        """Buffer a document, flushing the buffer when a batch is full"""
+        self.buffer.append(document)
+        if len(self.buffer) >= self.batch_size:
+            await self.flush()
+
+    async def flush(self):
+        """Start the insert of the buffered documents, waiting while the pipeline is full"""
+        if not self.buffer:
+            return
+        batch, self.buffer = self.buffer, []
+        while len(self.in_flight) >= self.max_in_flight:
+            done, self.in_flight = await asyncio.wait(
+                self.in_flight, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                task.result()
+        self.in_flight.add(asyncio.ensure_future(self.insert(batch)))
+        # let the insert start before the producer takes the loop again
+        await asyncio.sleep(0)
+
+    async def insert(self, batch):
+        """Insert a batch, the documents are independent so the order does not matter"""
+        result = await self.collection.insert_many(batch, ordered=False)
+        self.documents += len(result.inserted_ids)
+        self.batches += 1
+
+    async def close(self):
+        """Write the remaining documents, wait for every pending batch and record the stats"""
+        try:
+            await self.flush()
+            await asyncio.gather(*self.in_flight)
+        finally:
+            self.in_flight = set()
+            self.stats.record(self.documents, self.batches,
+                              self.stats.clock() - self.started)
+
+    def to_dict(self):
+        """Get the documents and batches written so far and the documents per second"""
+        seconds = self.stats.clock() - self.started
+        return {"documents": self.documents, "batches": self.batches,
+                "documents_per_second": round(self.documents / seconds, 1) if seconds else 0.0}
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.close()
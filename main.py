@@ -1,11 +1,18 @@
 """Entry point of the application."""
 from fastapi import FastAPI
+from fastapi.responses import ORJSONResponse
 from starlette.middleware.cors import CORSMiddleware
 
 import load_env  # pylint: disable=W0611
 from routers import auth, solver
+from solver.pool import BATCH_POOL, SOLVER_POOL
 
-app = FastAPI()
+app = FastAPI(default_response_class=ORJSONResponse)
+app.add_event_handler("shutdown", SOLVER_POOL.shutdown)
+app.add_event_handler("shutdown", BATCH_POOL.shutdown)
+app.add_event_handler("shutdown", solver.SOLVE_SESSIONS.clear)
+app.add_event_handler("startup", solver.load_cut_pool)
+app.add_event_handler("shutdown", solver.save_cut_pool)
 
 # Configure CORS
 app.add_middleware(
@@ -31,4 +38,12 @@ app.include_router(solver.router, responses={
         "description": "Un-processable Entity",
         "content": {"application/json": {"example": {"detail": "Error message"}}},
     },
+    503: {
+        "description": "Service Unavailable",
+        "content": {"application/json": {"example": {"detail": "The solver is busy, retry later"}}},
+    },
+    504: {
+        "description": "Gateway Timeout",
+        "content": {"application/json": {"example": {"detail": "Solve time limit exceeded"}}},
+    },
 }, )
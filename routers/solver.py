@@ -1,56 +1,528 @@
 """Endpoints for the solver module."""
+import asyncio
+import json
+import os
 from typing import Optional
 
+import orjson
 from bson import json_util
-from fastapi import APIRouter, Depends, HTTPException
-from gurobipy import GurobiError
+from fastapi import APIRouter, Depends, Header, HTTPException, Query
+from fastapi.responses import ORJSONResponse, StreamingResponse
 
 from auth.utils import get_current_user
 from database import DB
 from generators.all_possible_variants_generator import generate_variants
 from generators.generate_randomly import generate_rooms
-from solver.models import Condition
+from generators.writer import VARIANT_WRITES
+from solver.cache import (MongoSolveCache, SolveCache, black_cells_of, fingerprint,
+                          from_canonical, to_canonical)
+from solver.compact import SOLUTION_FORMATS, encode_solution, to_coordinates
+from solver.cutpool import CUT_POOL, MongoCutPoolStore
+from solver.jobs import JobRegistry, MongoJobStore
+from solver.models import Condition, SessionEdit, Verification
+from solver.pool import BATCH_POOL, BATCH_SLOTS, RETRY_AFTER, SOLVE_TIMEOUT, SOLVER_POOL
+from solver.portfolio import PORTFOLIO_STATS, RaceHandle, race
+from solver.session import SessionRegistry, SolveSession
 from solver.solver import Solver
-from solver.utils import InvalidInputError
+from solver.utils import (BackendError, GenerationError, InvalidInputError, PoolFullError,
+                          SolveTimeoutError)
+from solver.verify import Verifier, black_from_cells, black_from_result
 
 router = APIRouter(
     prefix='/api',
     tags=['solver']
 )
 
+SOLVE_CACHE = SolveCache()
+# the last solution of every layout, a start for puzzles differing in their symbols
+START_CACHE = SolveCache()
+# optional persistent tier, shared by all workers
+PERSISTENT_CACHE = (MongoSolveCache(DB['solve-cache'])
+                    if os.getenv('SOLVE_CACHE_PERSIST', 'false') == 'true' else None)
+
+# seed the models with the cuts of earlier puzzles of the same size, answers of
+# puzzles with several solutions may then change
+SOLVE_CUT_POOL = os.getenv('SOLVE_CUT_POOL', 'false') == 'true'
+CUT_STORE = (MongoCutPoolStore(DB['cut-pool'])
+             if SOLVE_CUT_POOL and os.getenv('CUT_POOL_PERSIST', 'false') == 'true' else None)
+
+SOLVE_JOBS = JobRegistry()
+JOB_STORE = MongoJobStore(DB['solve-jobs'])
+SOLVE_SESSIONS = SessionRegistry()
+
+
+# Accept header media types of the compact solution formats
+SOLUTION_MEDIA_TYPES = {
+    'application/vnd.puzzle.bits+json': 'bits',
+    'application/vnd.puzzle.base64+json': 'base64',
+}
+
+
+def solution_format(requested, accept):
+    """Pick the solution format from the format parameter, else from the Accept header"""
+    if requested is None:
+        media_types = [media_type.split(';')[0].strip() for media_type in (accept or '').split(',')]
+        requested = next((SOLUTION_MEDIA_TYPES[media_type] for media_type in media_types
+                          if media_type in SOLUTION_MEDIA_TYPES), 'matrix')
+    if requested not in SOLUTION_FORMATS:
+        raise HTTPException(status_code=400, detail=(
+            f"Unknown format '{requested}', must be one of: {', '.join(SOLUTION_FORMATS)}."))
+    return requested
+
+
+def encode_answer(answer, fmt):
+    """Encode a result matrix, or the solution and witness of unique mode, in a format"""
+    if isinstance(answer, dict):
+        witness = answer["witness"]
+        return {**answer, "solution": encode_solution(answer["solution"], fmt),
+                "witness": None if witness is None else encode_solution(witness, fmt)}
+    return encode_solution(answer, fmt)
+
+
+def ndjson(entry):
+    """Return an NDJSON line"""
+    return orjson.dumps(entry) + b"\n"
+
+
+async def cached_solve(solver, coordinates, options, timeout, pool=SOLVER_POOL, start=None):
+    """
+    Solve a puzzle in the pool, or map a cached solution of an equivalent puzzle back to it.
+
+    Unless a start is given, a puzzle with the same layout and other symbols
+    solved before offers its solution as a start.
+    """
+    key, transform = fingerprint(solver)
+    found, black = SOLVE_CACHE.lookup(key)
+    if not found and PERSISTENT_CACHE is not None:
+        found, black = await PERSISTENT_CACHE.lookup(key)
+        if found:
+            SOLVE_CACHE.store(key, black)
+    if found:
+        if black is None:
+            return []
+        black = from_canonical(black, transform, solver.length)
+        # an entry that breaks the rules, e.g. stored by an older version, is solved again
+        if not Verifier(solver).check(black_from_cells(black, solver.length)):
+            return solver.set_black_cells(black)
+
+    layout_key, layout_transform = fingerprint(solver, symbols=False)
+    if start is None:
+        found, layout_black = START_CACHE.lookup(layout_key)
+        if found and layout_black is not None:
+            start = from_canonical(layout_black, layout_transform, solver.length)
+
+    result = await pool.solve(coordinates, options, timeout, start=start)
+    await save_cut_pool()
+    # infeasible puzzles are the most expensive ones, so they are cached as well
+    black = to_canonical(black_cells_of(result), transform, solver.length) if result else None
+    SOLVE_CACHE.store(key, black)
+    if result:
+        START_CACHE.store(layout_key,
+                          to_canonical(black_cells_of(result), layout_transform, solver.length))
+    if PERSISTENT_CACHE is not None:
+        await PERSISTENT_CACHE.store(key, black)
+    return result
+
+
+async def load_cut_pool():
+    """Load the persisted cut pool, if any"""
+    if CUT_STORE is not None:
+        await CUT_STORE.load(CUT_POOL)
+
+
+async def save_cut_pool():
+    """Persist the cuts found since the last save, if the cut pool is persisted"""
+    if CUT_STORE is not None:
+        await CUT_STORE.save(CUT_POOL)
+
 
 @router.post('/solve')
-async def solve_matrix(data: Condition) -> list[list[str]]:
+async def solve_matrix(
+    data: Condition, multi_cut: bool = False, presolve: bool = False,
+    backend: Optional[str] = None, timeout: float = SOLVE_TIMEOUT, unique: bool = False,
+    portfolio: bool = False, fmt: Optional[str] = Query(None, alias='format'),
+    accept: Optional[str] = Header(None)
+) -> list[list[str]] | dict:
     """
     This endpoint returns the root path. You need to provide a list of rooms (regions).
     Each room is a dictionary where the keys are the coordinates of the room and the values
-    are empty string, "S" or "A".
+    are empty string, "S" or "A". The rooms can also be given compactly as "regions", the
+    region id of every cell in row-major order, with "symbols" mapping cell indexes
+    y * length + x to "S" or "A", or as the same data in a base64 "grid" string.
+    With multi_cut every violated connectivity cut is added per incumbent, with presolve
+    the cells forced by the rules are fixed before the model is built.
+    The backend ("bitboard", "gurobi" or "cpsat") is chosen automatically unless
+    provided, falling back to the next one when gurobi rejects the model. Solutions of the
+    automatically chosen backends are cached, including rotated and reflected puzzles.
+    Solving runs in a bounded worker pool and is stopped after timeout seconds.
+    The optional start, black [x, y] cells of a guessed solution, warm-starts the
+    MIP backends; otherwise the solution of a solved puzzle with the same layout
+    and other symbols is used.
+    With unique the response is {"solution", "unique", "witness"}, where witness is
+    a second solution when the puzzle has more than one.
+    With portfolio the configured formulation, parameter and backend variants race in
+    separate processes and the first answer is returned, see /solve/portfolio.
+    The solution is a matrix by default. With format "bits" or "base64", or the Accept
+    header application/vnd.puzzle.bits+json or application/vnd.puzzle.base64+json, it is
+    {"length", "black", "symbols"}: the black cells in row-major order as a string of
+    0 and 1, or packed 8 per byte in base64, and the symbols by cell index.
     """
+    fmt = solution_format(fmt, accept)
     try:
-        solver = Solver(data.coordinates)
-        return solver.solve()
+        options = {"multi_cut": multi_cut, "presolve": presolve, "backend": backend or 'auto',
+                   "unique": unique, "cut_pool": SOLVE_CUT_POOL}
+        # validate the input before it is queued
+        puzzle = data.puzzle()
+        solver = Solver(puzzle, **options)
+        if portfolio:
+            if unique or backend is not None:
+                raise ValueError("A portfolio race can not be combined with unique or backend.")
+            handle = RaceHandle()
+            try:
+                answer, _ = await SOLVER_POOL.run_thread(
+                    race, puzzle, min(timeout, SOLVE_TIMEOUT), None, PORTFOLIO_STATS,
+                    {"multi_cut": multi_cut, "presolve": presolve}, handle)
+            except asyncio.CancelledError:
+                # a client disconnect kills the variants instead of leaving them to the limit
+                handle.cancel()
+                raise
+        elif backend is None and not unique:
+            answer = await cached_solve(solver, puzzle, options, timeout, start=data.start)
+        else:
+            answer = await SOLVER_POOL.solve(puzzle, options, timeout, start=data.start)
     except InvalidInputError as e:
         raise HTTPException(status_code=400, detail=str(e)) from e
     except ValueError as e:
         raise HTTPException(status_code=400, detail=str(e)) from e
-    except GurobiError as e:
+    except BackendError as e:
         raise HTTPException(status_code=422, detail=str(e)) from e
+    except PoolFullError as e:
+        raise HTTPException(status_code=503, detail=str(e),
+                            headers={"Retry-After": str(RETRY_AFTER)}) from e
+    except SolveTimeoutError as e:
+        raise HTTPException(status_code=504, detail=str(e)) from e
+    # the response is built here, so it skips the validation of the return type
+    return ORJSONResponse(encode_answer(answer, fmt))
+
+
+@router.post('/verify')
+async def verify_solution(data: Verification) -> dict:
+    """
+    This endpoint checks a solution matrix, as /solve returns it, against the rules
+    without solving. The rooms are given in any format of /solve. The response is
+    {"valid", "violations"}, every violation a {"rule", "cells"} with the [x, y] cells
+    breaking the rule.
+    """
+    try:
+        solver = Solver(data.puzzle())
+        black = black_from_result(data.solution, solver.length)
+    except InvalidInputError as e:
+        raise HTTPException(status_code=400, detail=str(e)) from e
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e)) from e
+    violations = Verifier(solver).check(black)
+    return {"valid": not violations, "violations": violations}
+
+
+@router.get('/solve/portfolio')
+async def get_portfolio_stats() -> dict:
+    """
+    This endpoint returns the races, wins and errors of every portfolio variant. Variants
+    winning too few of their races are pruned from later races.
+    """
+    return PORTFOLIO_STATS.to_dict()
+
+
+def error_status(error):
+    """Return the HTTP status code of a solve error"""
+    if isinstance(error, (InvalidInputError, ValueError)):
+        return 400
+    if isinstance(error, BackendError):
+        return 422
+    if isinstance(error, PoolFullError):
+        return 503
+    if isinstance(error, SolveTimeoutError):
+        return 504
+    return 500
+
+
+def batch_error(index, error):
+    """Return the NDJSON entry of a batch item that could not be solved"""
+    return {"index": index, "status_code": error_status(error), "error": str(error)}
+
+
+async def solve_batch_group(solvers, transforms, indices, puzzles, options, timeout, cached):
+    """Solve one of identical batch items and map the solution to the others"""
+    first = indices[0]
+    async with BATCH_SLOTS:
+        try:
+            if cached:
+                result = await cached_solve(solvers[first], puzzles[first],
+                                            options, timeout, BATCH_POOL)
+            else:
+                result = await BATCH_POOL.solve(puzzles[first], options, timeout)
+        except Exception as e:  # pylint: disable=W0718
+            return [batch_error(index, e) for index in indices]
+    length = solvers[first].length
+    black = to_canonical(black_cells_of(result), transforms[first], length) if result else None
+    entries = [{"index": first, "result": result}]
+    for index in indices[1:]:
+        if black is None:
+            entries.append({"index": index, "result": []})
+        else:
+            cells = from_canonical(black, transforms[index], length)
+            entries.append({"index": index, "result": solvers[index].set_black_cells(cells)})
+    return entries
+
+
+@router.post('/solve/batch')
+async def solve_batch(
+    data: list[Condition], multi_cut: bool = False, presolve: bool = False,
+    backend: Optional[str] = None, timeout: float = SOLVE_TIMEOUT,
+    fmt: Optional[str] = Query(None, alias='format'), accept: Optional[str] = Header(None)
+):
+    """
+    This endpoint solves a list of puzzles, same input and options as /solve. Identical
+    puzzles, rotated and reflected ones included, are solved once. The puzzles are solved
+    in parallel in a separate pool, and every result is streamed as an NDJSON line
+    {"index", "result"} as soon as it is ready. A puzzle that can not be solved gets an
+    {"index", "status_code", "error"} line instead, the others are still solved. The results
+    are in the format of /solve.
+    """
+    fmt = solution_format(fmt, accept)
+    options = {"multi_cut": multi_cut, "presolve": presolve, "backend": backend or 'auto',
+               "cut_pool": SOLVE_CUT_POOL}
+    entries = []
+    solvers, transforms, groups, puzzles = {}, {}, {}, {}
+    for index, condition in enumerate(data):
+        try:
+            puzzles[index] = condition.puzzle()
+            solvers[index] = Solver(puzzles[index], **options)
+        except (InvalidInputError, ValueError) as e:
+            entries.append(batch_error(index, e))
+            continue
+        key, transforms[index] = fingerprint(solvers[index])
+        groups.setdefault(key, []).append(index)
+
+    async def lines():
+        for entry in entries:
+            yield ndjson(entry)
+        tasks = [asyncio.ensure_future(solve_batch_group(
+            solvers, transforms, indices, puzzles, options, timeout, backend is None))
+            for indices in groups.values()]
+        try:
+            for task in asyncio.as_completed(tasks):
+                for entry in await task:
+                    if "result" in entry:
+                        entry["result"] = encode_solution(entry["result"], fmt)
+                    yield ndjson(entry)
+        finally:
+            # the client is gone, stop the items that are still waiting
+            for task in tasks:
+                task.cancel()
+
+    return StreamingResponse(lines(), media_type="application/x-ndjson")
+
+
+@router.post('/solve/all')
+async def solve_all(
+    data: Condition, multi_cut: bool = False, presolve: bool = False,
+    backend: str = 'auto', limit: Optional[int] = None, timeout: float = SOLVE_TIMEOUT,
+    fmt: Optional[str] = Query(None, alias='format'), accept: Optional[str] = Header(None)
+):
+    """
+    This endpoint streams every solution of a puzzle, at most limit of them, as NDJSON
+    lines, same input and options as /solve. Solutions are found one at a time, so
+    puzzles with thousands of solutions do not fill the memory. An error during the
+    enumeration ends the stream with a {"status_code", "error"} line. The solutions are
+    in the format of /solve.
+    """
+    fmt = solution_format(fmt, accept)
+    try:
+        options = {"multi_cut": multi_cut, "presolve": presolve, "backend": backend}
+        puzzle = data.puzzle()
+        Solver(puzzle, **options)
+        solutions = SOLVER_POOL.iterate(
+            lambda: Solver(puzzle, **options).iter_solutions(
+                limit, min(timeout, SOLVE_TIMEOUT)))
+    except (InvalidInputError, ValueError) as e:
+        raise HTTPException(status_code=400, detail=str(e)) from e
+    except PoolFullError as e:
+        raise HTTPException(status_code=503, detail=str(e),
+                            headers={"Retry-After": str(RETRY_AFTER)}) from e
+
+    async def lines():
+        try:
+            async for solution in solutions:
+                yield ndjson(encode_solution(solution, fmt))
+        except Exception as e:  # pylint: disable=W0718
+            yield ndjson({"status_code": error_status(e), "error": str(e)})
+
+    return StreamingResponse(lines(), media_type="application/x-ndjson")
+
+
+async def run_job(job, future):
+    """Wait for the solve of a job, then record and persist its outcome"""
+    try:
+        job.finish(result=await future)
+    except Exception as e:  # pylint: disable=W0718
+        job.finish(error=str(e) or type(e).__name__)
+    try:
+        await JOB_STORE.store(job)
+        await save_cut_pool()
+    except Exception as e:  # pylint: disable=W0718
+        # nothing awaits this task, so the failure is reported by the job
+        job.finish(error=f"The job could not be stored: {e}")
+    SOLVE_JOBS.forget_finished()
+
+
+@router.post('/solve/jobs', status_code=202)
+async def create_solve_job(
+    data: Condition, multi_cut: bool = False, presolve: bool = False,
+    backend: str = 'auto', timeout: float = SOLVE_TIMEOUT
+) -> dict:
+    """
+    This endpoint queues a puzzle, same input and options as /solve, and returns
+    the job id at once. Poll /solve/jobs/{job_id} or stream /solve/jobs/{job_id}/events
+    for the result.
+    """
+    try:
+        options = {"multi_cut": multi_cut, "presolve": presolve, "backend": backend,
+                   "cut_pool": SOLVE_CUT_POOL}
+        puzzle = data.puzzle()
+        Solver(puzzle, **options)
+        job = SOLVE_JOBS.create()
+        loop = asyncio.get_running_loop()
+        # progress events are sent from the worker thread
+        future = SOLVER_POOL.submit_solve(
+            puzzle, options, timeout,
+            progress=lambda event: loop.call_soon_threadsafe(job.publish, event))
+    except (InvalidInputError, ValueError) as e:
+        raise HTTPException(status_code=400, detail=str(e)) from e
+    except PoolFullError as e:
+        raise HTTPException(status_code=503, detail=str(e),
+                            headers={"Retry-After": str(RETRY_AFTER)}) from e
+    asyncio.ensure_future(run_job(job, future))
+    return {"id": job.id, "status": job.status}
+
+
+@router.get('/solve/jobs/{job_id}')
+async def get_solve_job(job_id: str) -> dict:
+    """This endpoint returns the status of a job and, once it is done, the solved matrix."""
+    job = SOLVE_JOBS.get(job_id)
+    if job is not None:
+        return job.to_dict()
+    doc = await JOB_STORE.get(job_id)
+    if doc is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return doc
+
+
+@router.get('/solve/jobs/{job_id}/events')
+async def stream_solve_job(job_id: str):
+    """
+    This endpoint streams the progress of a job as server-sent events: the backends
+    tried, every incumbent with the lazy cuts it added and the final matrix.
+    """
+    job = SOLVE_JOBS.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+
+    async def events():
+        async for event in job.stream():
+            yield f"event: {event['event']}\ndata: {json.dumps(event)}\n\n"
+
+    return StreamingResponse(events(), media_type="text/event-stream")
+
+
+async def solve_session(session, edit=None, timeout=SOLVE_TIMEOUT):
+    """Edit and re-solve a session on a worker thread, the model stays in this process"""
+    try:
+        await SOLVER_POOL.run_thread(session.update, edit.symbols if edit else None,
+                                     edit.merges if edit else (), min(timeout, SOLVE_TIMEOUT))
+    except (InvalidInputError, ValueError, BackendError, PoolFullError,
+            SolveTimeoutError) as e:
+        headers = {"Retry-After": str(RETRY_AFTER)} if isinstance(e, PoolFullError) else None
+        raise HTTPException(status_code=error_status(e), detail=str(e), headers=headers) from e
+    return session.to_dict()
+
+
+@router.post('/sessions', status_code=201)
+async def create_session(
+    data: Condition, backend: str = 'auto', timeout: float = SOLVE_TIMEOUT
+) -> dict:
+    """
+    This endpoint opens a solve session for the puzzle editor, same input as /solve,
+    and returns its id with the solution. The session keeps the model, the connectivity
+    cuts and the last solution in memory, so edits sent to PATCH /sessions/{session_id}
+    are re-solved without rebuilding the model. Idle sessions are dropped.
+    """
+    try:
+        # edits refer to the rooms of the dict format
+        puzzle = data.puzzle()
+        session = SolveSession(
+            puzzle if isinstance(puzzle, list) else to_coordinates(puzzle), backend)
+    except (InvalidInputError, ValueError, BackendError) as e:
+        raise HTTPException(status_code=error_status(e), detail=str(e)) from e
+    SOLVE_SESSIONS.add(session)
+    return await solve_session(session, timeout=timeout)
+
+
+def get_session(session_id):
+    """Return a session, or raise 404"""
+    session = SOLVE_SESSIONS.get(session_id)
+    if session is None:
+        raise HTTPException(status_code=404, detail="Session not found")
+    return session
+
+
+@router.get('/sessions/{session_id}')
+async def get_solve_session(session_id: str) -> dict:
+    """This endpoint returns the rooms and the last solution of a session."""
+    return get_session(session_id).to_dict()
+
+
+@router.patch('/sessions/{session_id}')
+async def edit_solve_session(
+    session_id: str, edit: SessionEdit, timeout: float = SOLVE_TIMEOUT
+) -> dict:
+    """
+    This endpoint changes room symbols and merges rooms of a session, then re-solves it
+    from the last solution. Rooms are given by their index in the coordinates of the
+    session, merged rooms are removed from them. An invalid edit leaves the session as is.
+    """
+    return await solve_session(get_session(session_id), edit, timeout)
+
+
+@router.delete('/sessions/{session_id}', status_code=204)
+async def delete_solve_session(session_id: str):
+    """This endpoint closes a session and frees its model."""
+    if not SOLVE_SESSIONS.remove(session_id):
+        raise HTTPException(status_code=404, detail="Session not found")
 
 
 @router.get('/generate')
-async def generate_matrix(num: int, user: dict = Depends(get_current_user)) -> list[dict[str, str]]:
+async def generate_matrix(
+    num: int, unique: bool = False, user: dict = Depends(get_current_user)
+) -> list[dict[str, str]]:
     """
     This endpoint generates a random matrix of rooms. You need to provide the number of rooms.
-    In response, you will get a list of rooms (regions).
+    In response, you will get a list of rooms (regions). With unique the matrix has
+    exactly one solution.
     """
     try:
-        data = generate_rooms(num)
+        data = await SOLVER_POOL.run(generate_rooms, num, unique)
 
         await DB["generated-matrices"].insert_one({"coordinates": data, "user": user['id']})
 
         return data
     except InvalidInputError as e:
         raise HTTPException(status_code=400, detail=str(e)) from e
+    except (BackendError, GenerationError) as e:
+        raise HTTPException(status_code=422, detail=str(e)) from e
+    except PoolFullError as e:
+        raise HTTPException(status_code=503, detail=str(e),
+                            headers={"Retry-After": str(RETRY_AFTER)}) from e
 
 
 @router.get('/conditions')
@@ -78,14 +550,26 @@ async def get_conditions_by_user(user: dict = Depends(get_current_user)) -> list
 async def generate_matrices_by_parametrs(
     matrix_size: int,
     start: Optional[int] = None, end: Optional[int] = None,
-    symbols: Optional[str] = None
+    symbols: Optional[str] = None, unique: bool = False
 ):
-    """This endpoint generates matrices according to specified size and number of rooms."""
+    """
+    This endpoint generates matrices according to specified size and number of rooms.
+    With unique only the matrices with exactly one solution are kept.
+    """
 
-    amount = await generate_variants(matrix_size, symbols, start, end)
+    amount = await generate_variants(matrix_size, symbols, start, end, unique)
     return amount
 
 
+@router.get("/generate-matrices-by-size/stats")
+async def get_variant_write_stats() -> dict:
+    """
+    This endpoint returns the documents and batches written by the matrix generation,
+    the seconds spent and the documents written per second.
+    """
+    return VARIANT_WRITES.to_dict()
+
+
 @router.get("/get-condition")
 async def get_condition_by_index(
     matrix_size: int,
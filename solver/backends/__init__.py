@@ -0,0 +1,34 @@
+"""Solver backends: model building, the connectivity loop and result extraction."""
+import importlib
+
+from solver.backends.base import MAX_SIZE, Backend
+from solver.utils import BackendError
+
+# name: (module, class), tried in this order by the 'auto' backend
+BACKENDS = {
+    'bitboard': ('solver.bitboard', 'BitboardSolver'),
+    'gurobi': ('solver.backends.gurobi', 'GurobiBackend'),
+    'cpsat': ('solver.backends.cpsat', 'CpSatBackend'),
+}
+
+
+def get_backend(name):
+    """
+    Return the backend class registered under name.
+
+    Raises:
+        ValueError: If no backend is registered under name.
+        BackendError: If the library behind the backend is not installed.
+    """
+    if name not in BACKENDS:
+        raise ValueError(
+            f"Unknown backend '{name}', must be one of: {', '.join(BACKENDS)}.")
+    module_name, class_name = BACKENDS[name]
+    try:
+        module = importlib.import_module(module_name)
+    except ImportError as e:
+        raise BackendError(f"Backend '{name}' is not available: {e}") from e
+    return getattr(module, class_name)
+
+
+__all__ = ['BACKENDS', 'MAX_SIZE', 'Backend', 'get_backend']
@@ -0,0 +1,136 @@
+"""Base class of the solver backends."""
+
+# too big number would make the model too complex for
+# gurobi to solve in free version
+MAX_SIZE = 23
+
+
+class Backend:
+    """
+    A MIP/CP engine behind the Solver.
+
+    The Solver builds its formulation through add_var/add_constr/quicksum,
+    which accept the usual operator expressions of the engine, and checks
+    connectivity through the separate function passed to optimize.
+    """
+
+    name = ''
+    max_size = MAX_SIZE  # Largest grid dimension the backend accepts
+    # native engines search the grid directly instead of building a model
+    native = False
+    # the connectivity cuts stay in the model for the next optimize call
+    keeps_cuts = False
+    # constraints can be removed from a built model, see remove_constrs
+    incremental = False
+
+    @classmethod
+    def dedicated(cls):
+        """Return a backend for a model kept between requests and used by one thread at a time"""
+        return cls()
+
+    def dispose(self):
+        """Free the model"""
+
+    def add_var(self, lb=0, ub=1):
+        """Add a binary variable with the given bounds"""
+        raise NotImplementedError
+
+    def add_constr(self, constraint, name=''):
+        """Add a linear constraint built from the model variables"""
+        raise NotImplementedError
+
+    def remove_constrs(self, constrs):
+        """Remove constraints returned by add_constr, only supported by incremental backends"""
+        raise NotImplementedError
+
+    def quicksum(self, terms):
+        """Sum model variables into a linear expression"""
+        return sum(terms)
+
+    def set_bounds(self, var, lb, ub):
+        """Narrow the bounds of a variable"""
+        self.add_constr(var >= lb)
+        self.add_constr(var <= ub)
+
+    def cached_block(self, key, build_block):
+        """
+        Add the part of the model that is the same for every model with this key.
+
+        Args:
+            key: A hashable description of the block, e.g. the build and the grid size.
+            build_block: A function adding the block to a backend and returning its variables.
+
+        Returns:
+            The variables of the block, in the order returned by build_block.
+        """
+        # the models of this backend can not be copied, so the block is built every time
+        del key
+        return build_block(self)
+
+    def tune(self, length, profile=None):
+        """
+        Set the engine parameters for a grid size, by default they are left as they are.
+
+        Args:
+            length: The grid dimension, used to pick a stored profile.
+            profile: A dictionary of parameters used instead of the stored profile.
+        """
+
+    def set_start(self, black_vars, black_cells):
+        """Offer a guessed solution, the black cells, as a start, by default it is ignored"""
+
+    def add_vars(self, lb, ub):
+        """Add a binary variable per pair of bounds and return them as a list"""
+        return [self.add_var(int(low), int(up)) for low, up in zip(lb, ub)]
+
+    def add_matrix_constrs(self, matrix, variables, sense, rhs):
+        """
+        Add the constraints matrix @ variables <sense> rhs, one per row.
+
+        Args:
+            matrix: A scipy.sparse matrix with a column per variable.
+            variables: The variables returned by add_vars.
+            sense: A '<', '>' or '=' character per row.
+            rhs: The right-hand side of every row.
+        """
+        matrix = matrix.tocsr()
+        for row, (row_sense, row_rhs) in enumerate(zip(sense, rhs)):
+            start, end = matrix.indptr[row], matrix.indptr[row + 1]
+            expr = self.quicksum(int(value) * variables[col] for col, value in
+                                 zip(matrix.indices[start:end], matrix.data[start:end]))
+            if row_sense == '<':
+                self.add_constr(expr <= int(row_rhs))
+            elif row_sense == '>':
+                self.add_constr(expr >= int(row_rhs))
+            else:
+                self.add_constr(expr == int(row_rhs))
+
+    def optimize(self, black_vars, separate, time_limit=None):
+        """
+        Find a solution that passes the connectivity check.
+
+        Args:
+            black_vars: A dictionary of the black variable of every cell,
+                in the order expected by separate.
+            separate: A function taking the black flags of a candidate solution
+                and returning the lists of cells that may not all be black.
+            time_limit: Seconds after which the optimization is stopped.
+
+        Returns:
+            True if a solution was found.
+
+        Raises:
+            SolveTimeoutError: If the time limit was reached first.
+        """
+        raise NotImplementedError
+
+    def terminate(self):
+        """Stop a running optimize call from another thread, by default it runs to its time limit"""
+
+    def value(self, var):
+        """Get the value of a variable in the solution"""
+        raise NotImplementedError
+
+    def get_stats(self):
+        """Get the node count and runtime of the last optimize call"""
+        return {"node_count": 0, "runtime": 0.0}
@@ -0,0 +1,85 @@
+"""OR-Tools CP-SAT backend that re-solves until no connectivity cut is violated."""
+import os
+import time
+
+from ortools.sat.python import cp_model
+
+from solver.backends.base import Backend
+from solver.utils import SolveTimeoutError
+
+
+class CpSatBackend(Backend):
+    """OR-Tools CP-SAT backend"""
+
+    name = 'cpsat'
+    # no model size limit, the bound keeps the iterative loop reasonable
+    max_size = 64
+    keeps_cuts = True
+    incremental = True
+
+    def __init__(self):
+        self.model = cp_model.CpModel()
+        self.solver = cp_model.CpSolver()
+        self.solver.parameters.num_workers = os.cpu_count() or 1
+        self.node_count = 0
+        self.runtime = 0.0
+        self.stopped = False  # set by terminate, no further solve of the loop starts
+
+    def add_var(self, lb=0, ub=1):
+        return self.model.NewIntVar(lb, ub, "var")
+
+    def add_constr(self, constraint, name=''):
+        return self.model.Add(constraint).WithName(name)
+
+    def remove_constrs(self, constrs):
+        # CP-SAT can not delete a constraint, an emptied one constrains nothing
+        for constr in constrs:
+            constr.proto.clear_linear()
+            constr.proto.clear_name()
+
+    def set_bounds(self, var, lb, ub):
+        # the domain is replaced, so a later call can widen it again
+        var.proto.domain[0], var.proto.domain[1] = lb, ub
+
+    def set_start(self, black_vars, black_cells):
+        # a hint replaces the one of the previous solve, duplicates make the model invalid
+        self.model.ClearHints()
+        black_cells = set(black_cells)
+        hinted = set()
+        for cell, var in black_vars.items():
+            # cells of a merged 'S' pair share their variable
+            if var.Index() not in hinted:
+                hinted.add(var.Index())
+                self.model.AddHint(var, 1 if cell in black_cells else 0)
+
+    def optimize(self, black_vars, separate, time_limit=None):
+        variables = list(black_vars.values())
+        self.node_count, self.runtime = 0, 0.0
+        deadline = None if time_limit is None else time.monotonic() + time_limit
+        while True:
+            if self.stopped:
+                raise SolveTimeoutError("Solve time limit exceeded")
+            if deadline is not None:
+                self.solver.parameters.max_time_in_seconds = max(deadline - time.monotonic(), 0)
+            status = self.solver.Solve(self.model)
+            self.node_count += self.solver.NumBranches()
+            self.runtime += self.solver.WallTime()
+            if status == cp_model.UNKNOWN:
+                raise SolveTimeoutError("Solve time limit exceeded")
+            if status not in (cp_model.OPTIMAL, cp_model.FEASIBLE):
+                return False
+            cuts = separate([self.solver.Value(var) > 0 for var in variables])
+            if not cuts:
+                return True
+            for cut in cuts:
+                self.model.Add(sum(black_vars[cell] for cell in cut) <= len(cut) - 1)
+
+    def terminate(self):
+        self.stopped = True
+        self.solver.StopSearch()
+
+    def value(self, var):
+        return self.solver.Value(var)
+
+    def get_stats(self):
+        return {"node_count": self.node_count, "runtime": self.runtime}
@@ -0,0 +1,133 @@
+"""Gurobi backend with lazy constraints added in a MIPSOL callback."""
+import threading
+
+from gurobipy import GRB, Env, GurobiError, Model, quicksum
+
+from solver.backends.base import Backend
+from solver.backends.profiles import load_profiles, profile_for
+from solver.utils import BackendError, SolveTimeoutError
+
+# parameters by grid size, see benchmarks.tune_gurobi
+PROFILES = load_profiles()
+# a Gurobi environment is not thread-safe, so every worker thread keeps its own
+# environment and the model templates built in it
+WORKER = threading.local()
+
+
+def start_env():
+    """Start a silent environment"""
+    env = Env(empty=True)
+    env.setParam('OutputFlag', 0)
+    env.start()
+    return env
+
+
+def get_env():
+    """Return the environment of the current worker, started on first use"""
+    if getattr(WORKER, 'env', None) is None:
+        WORKER.env = start_env()
+        WORKER.templates = {}
+    return WORKER.env
+
+
+class GurobiBackend(Backend):
+    """Gurobi backend"""
+
+    name = 'gurobi'
+    incremental = True
+
+    def __init__(self, env=None):
+        # a dedicated environment, disposed with the model
+        self.env = env
+        try:
+            self.model = Model("Solver", env=env or get_env())
+        except GurobiError as e:
+            raise BackendError(str(e)) from e
+
+    @classmethod
+    def dedicated(cls):
+        # the model may move between worker threads, so it gets its own environment
+        try:
+            env = start_env()
+        except GurobiError as e:
+            raise BackendError(str(e)) from e
+        return cls(env)
+
+    def dispose(self):
+        self.model.dispose()
+        if self.env is not None:
+            self.env.dispose()
+
+    def cached_block(self, key, build_block):
+        if key not in WORKER.templates:
+            template = GurobiBackend()
+            build_block(template)
+            template.model.update()
+            WORKER.templates[key] = template.model
+        self.model.dispose()
+        self.model = WORKER.templates[key].copy()
+        return self.model.getVars()
+
+    def tune(self, length, profile=None):
+        if profile is None:
+            profile = profile_for(PROFILES, length)
+        for name, value in profile.items():
+            self.model.setParam(name, value)
+
+    def set_start(self, black_vars, black_cells):
+        black_cells = set(black_cells)
+        for cell, var in black_vars.items():
+            var.Start = 1 if cell in black_cells else 0
+
+    def set_bounds(self, var, lb, ub):
+        var.LB = lb
+        var.UB = ub
+
+    def add_var(self, lb=0, ub=1):
+        return self.model.addVar(vtype=GRB.BINARY, obj=0, ub=ub, lb=lb, name="var", column=None)
+
+    def add_constr(self, constraint, name=''):
+        return self.model.addConstr(constraint, name=name)
+
+    def remove_constrs(self, constrs):
+        self.model.remove(constrs)
+
+    def quicksum(self, terms):
+        return quicksum(terms)
+
+    def add_vars(self, lb, ub):
+        # a single MVar, the callback and the result work on its Var objects
+        return self.model.addMVar(len(lb), vtype=GRB.BINARY, lb=lb, ub=ub, name="var").tolist()
+
+    def add_matrix_constrs(self, matrix, variables, sense, rhs):
+        if matrix.shape[0]:
+            self.model.addMConstr(matrix, variables, sense, rhs)
+
+    def optimize(self, black_vars, separate, time_limit=None):
+        variables = list(black_vars.values())
+
+        def callback(model, where):
+            if where == GRB.callback.MIPSOL:
+                values = model.cbGetSolution(variables)
+                for cut in separate([value > 0.9 for value in values]):
+                    model.cbLazy(quicksum(black_vars[cell] for cell in cut) <= len(cut) - 1)
+
+        self.model.setParam('LazyConstraints', 1)
+        if time_limit is not None:
+            self.model.Params.TimeLimit = max(time_limit, 0)
+        try:
+            self.model.optimize(callback)
+        except GurobiError as e:
+            raise BackendError(str(e)) from e
+        if self.model.status in (GRB.TIME_LIMIT, GRB.INTERRUPTED):
+            raise SolveTimeoutError("Solve time limit exceeded")
+        return self.model.status == GRB.OPTIMAL
+
+    def terminate(self):
+        self.model.terminate()
+
+    def value(self, var):
+        return var.X
+
+    def get_stats(self):
+        return {"node_count": int(self.model.NodeCount), "runtime": self.model.Runtime}
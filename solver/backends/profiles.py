@@ -0,0 +1,33 @@
+"""Backend parameter profiles by grid size, written by benchmarks.tune_gurobi."""
+import json
+import os
+
+GUROBI_PROFILES = os.getenv(
+    'GUROBI_PROFILES', os.path.join(os.path.dirname(__file__), 'gurobi_profiles.json'))
+
+
+def load_profiles(path=GUROBI_PROFILES):
+    """
+    Read the parameter profiles of a file.
+
+    Returns:
+        A dictionary of the parameters by grid size, empty if there is no file.
+    """
+    if not os.path.exists(path):
+        return {}
+    with open(path, encoding='utf-8') as file:
+        return {int(length): params for length, params in json.load(file).items()}
+
+
+def save_profiles(profiles, path=GUROBI_PROFILES):
+    """Write the parameter profiles by grid size to a file"""
+    with open(path, 'w', encoding='utf-8') as file:
+        json.dump({str(length): params for length, params in sorted(profiles.items())},
+                  file, indent=2)
+
+
+def profile_for(profiles, length):
+    """Return the parameters tuned for the nearest grid size, the smaller one on a tie"""
+    if not profiles:
+        return {}
+    return profiles[min(profiles, key=lambda size: (abs(size - length), size))]
@@ -0,0 +1,185 @@
+"""Bitboard backtracking solver for small grids.
+
+The grid is a single integer with bit i * length + j for cell (i, j). Black
+cells, the neighbours of every cell, the 3-region runs and the 'S'/'A' pairs
+are all bitmasks, so each step of the depth-first search is a handful of
+bitwise operations. On grids up to 8x8 this is much cheaper than building a
+MIP model.
+"""
+import time
+
+from solver.utils import BLACK, BackendError, SolveTimeoutError
+
+
+class BitboardSolver:
+    """Depth-first search over the cells in row-major order"""
+
+    name = 'bitboard'
+    max_size = 8
+    # does not build a model through the Backend interface
+    native = True
+
+    def __init__(self, length, runs, equal_pairs, exclusive_pairs, white_cells=(), fixed=None,
+                 node_limit=None, time_limit=None):
+        self.length = length
+        self.size = length * length
+        self.full = (1 << self.size) - 1
+        self.nodes = 0
+        # give up on searches that a MIP backend proves faster
+        self.node_limit = node_limit
+        self.deadline = None if time_limit is None else time.monotonic() + time_limit
+
+        self.neighbours = []
+        self.not_first = 0  # cells that are not in the first column j == 0
+        self.not_last = 0  # cells that are not in the last column j == length - 1
+        for idx in range(self.size):
+            i, j = divmod(idx, length)
+            mask = 0
+            for ii, jj in ((i - 1, j), (i, j + 1), (i + 1, j), (i, j - 1)):
+                if 0 <= ii < length and 0 <= jj < length:
+                    mask |= self.bit((ii, jj))
+            self.neighbours.append(mask)
+            if j != 0:
+                self.not_first |= 1 << idx
+            if j != length - 1:
+                self.not_last |= 1 << idx
+
+        # a run is checked when one of its cells or their neighbours is coloured
+        self.runs_touching = [[] for _ in range(self.size)]
+        for run in runs:
+            mask = 0
+            for cell in run:
+                mask |= self.bit(cell)
+            touching = mask
+            for idx in range(self.size):
+                if mask >> idx & 1:
+                    touching |= self.neighbours[idx]
+            for idx in range(self.size):
+                if touching >> idx & 1:
+                    self.runs_touching[idx].append(mask)
+
+        # pairs are checked when the later cell of the pair is coloured
+        self.equal = {}
+        for pair in equal_pairs:
+            first, second = sorted(self.index(cell) for cell in pair)
+            self.equal.setdefault(second, 0)
+            self.equal[second] |= 1 << first
+        self.exclusive = {}
+        for pair in exclusive_pairs:
+            first, second = sorted(self.index(cell) for cell in pair)
+            self.exclusive.setdefault(second, 0)
+            self.exclusive[second] |= 1 << first
+
+        self.forced_white = 0
+        self.forced_black = 0
+        for cell in white_cells:
+            self.forced_white |= self.bit(cell)
+        for cell, colour in (fixed or {}).items():
+            if colour == BLACK:
+                self.forced_black |= self.bit(cell)
+            else:
+                self.forced_white |= self.bit(cell)
+
+    def index(self, cell):
+        """Return the bit index of a cell"""
+        return cell[0] * self.length + cell[1]
+
+    def bit(self, cell):
+        """Return the mask of a single cell"""
+        return 1 << self.index(cell)
+
+    def spread(self, seed, allowed):
+        """Grow seed through orthogonal steps within allowed cells"""
+        length = self.length
+        reach = seed
+        while True:
+            grown = (reach | ((reach << 1) & self.not_first) | ((reach >> 1) & self.not_last)
+                     | (reach << length) | (reach >> length)) & allowed
+            if grown == reach:
+                return reach
+            reach = grown
+
+    def connected(self, white, open_cells):
+        """Check that every white cell can still reach the others"""
+        if not white:
+            return True
+        seed = white & -white
+        return white & ~self.spread(seed, white | open_cells) == 0
+
+    def fits(self, idx, black, white, blocked, colour_black):
+        """
+        Check the rules that become decidable when cell idx gets its colour.
+
+        blocked holds the neighbours of the black cells, which can not turn black.
+        """
+        bit = 1 << idx
+        if colour_black:
+            if bit & (self.forced_white | blocked):
+                return False
+            if self.exclusive.get(idx, 0) & black:
+                return False
+            if self.equal.get(idx, 0) & white:
+                return False
+            black |= bit
+            blocked |= self.neighbours[idx]
+        else:
+            if bit & self.forced_black or self.equal.get(idx, 0) & black:
+                return False
+            white |= bit
+        # the cells after idx are not coloured yet
+        open_cells = self.full & ~((bit << 1) - 1)
+        free = open_cells & ~(self.forced_white | blocked)
+        for run in self.runs_touching[idx]:
+            if not run & (black | free):
+                return False
+        # a black cell can cut the white cells apart, a white cell can be cut off
+        # unless it touches a white cell, which reaches all the others
+        if colour_black or not self.neighbours[idx] & white:
+            return self.connected(white, open_cells)
+        return True
+
+    def solutions(self):
+        """
+        Yield the mask of black cells of every solution.
+
+        Raises:
+            BackendError: If the search visits more than node_limit nodes
+                before the first solution.
+            SolveTimeoutError: If the time limit is reached.
+        """
+        found = False
+        stack = [(0, 0, 0, 0)]
+        while stack:
+            idx, black, white, blocked = stack.pop()
+            self.nodes += 1
+            if self.node_limit is not None and not found and self.nodes > self.node_limit:
+                raise BackendError(f"Bitboard search exceeded {self.node_limit} nodes")
+            if self.deadline is not None and self.nodes % 1024 == 0 \
+                    and time.monotonic() > self.deadline:
+                raise SolveTimeoutError("Solve time limit exceeded")
+            if idx == self.size:
+                found = True
+                yield black
+                continue
+            bit = 1 << idx
+            # white is pushed last so it is tried first
+            if self.fits(idx, black, white, blocked, True):
+                stack.append((idx + 1, black | bit, white, blocked | self.neighbours[idx]))
+            if self.fits(idx, black, white, blocked, False):
+                stack.append((idx + 1, black, white | bit, blocked))
+
+    def solve(self):
+        """
+        Find the first solution.
+
+        Returns:
+            A list of black (i, j) cells, or None if there is no solution.
+        """
+        self.nodes = 0
+        for black in self.solutions():
+            return self.cells(black)
+        return None
+
+    def cells(self, black):
+        """Return the (i, j) cells of a mask"""
+        return [divmod(idx, self.length) for idx in range(self.size) if black >> idx & 1]
@@ -0,0 +1,153 @@
+"""Solve cache keyed by a canonical puzzle fingerprint.
+
+The rules are invariant under the 8 rotations and reflections of the grid, so
+a puzzle is stored under the smallest of its 8 transformed forms and the
+solution is kept in that canonical orientation. A lookup maps the solution
+back to the orientation of the caller.
+"""
+import hashlib
+import os
+import time
+from collections import OrderedDict
+
+from solver.utils import BLACK
+
+SOLVE_CACHE_SIZE = int(os.getenv('SOLVE_CACHE_SIZE', '1024'))
+SOLVE_CACHE_TTL = float(os.getenv('SOLVE_CACHE_TTL', '3600'))
+
+# (x, y) -> transformed (x, y) on a grid of the given length
+TRANSFORMS = [
+    lambda x, y, n: (x, y),
+    lambda x, y, n: (n - 1 - y, x),
+    lambda x, y, n: (n - 1 - x, n - 1 - y),
+    lambda x, y, n: (y, n - 1 - x),
+    lambda x, y, n: (n - 1 - x, y),
+    lambda x, y, n: (x, n - 1 - y),
+    lambda x, y, n: (y, x),
+    lambda x, y, n: (n - 1 - y, n - 1 - x),
+]
+
+
+def signature(labels, symbols, length, transform):
+    """
+    Describe the transformed grid independently of the region numbering.
+
+    Regions are renumbered in the order they are met in a row-major scan,
+    each with its symbol on first occurrence and '' afterwards.
+    """
+    moved = {TRANSFORMS[transform](x, y, length): label for (x, y), label in labels.items()}
+    renumbered = {}
+    result = []
+    for y in range(length):
+        for x in range(length):
+            label = moved[(x, y)]
+            if label not in renumbered:
+                renumbered[label] = len(renumbered)
+                result.append((renumbered[label], symbols[label]))
+            else:
+                result.append((renumbered[label], ''))
+    return tuple(result)
+
+
+def fingerprint(solver, symbols=True):
+    """
+    Return the canonical key of a puzzle and the transform leading to it.
+
+    Args:
+        solver: A Solver with its regions initialized.
+        symbols: Whether the region symbols are part of the key. Without them
+            the key only describes the layout, which puzzles differing in their
+            symbols share.
+
+    Returns:
+        A (key, transform) tuple, transform is an index into TRANSFORMS.
+    """
+    labels = {}
+    region_symbols = []
+    for label, region in enumerate(solver.regions):
+        region_symbols.append(region.symbol if symbols else '')
+        for cell in region.get_pos():
+            labels[cell] = label
+    forms = [(signature(labels, region_symbols, solver.length, k), k)
+             for k in range(len(TRANSFORMS))]
+    form, transform = min(forms)
+    key = hashlib.sha1(repr((solver.length, form)).encode()).hexdigest()
+    return key, transform
+
+
+def to_canonical(cells, transform, length):
+    """Map (x, y) cells of the caller to the canonical orientation"""
+    return sorted(TRANSFORMS[transform](x, y, length) for x, y in cells)
+
+
+def from_canonical(cells, transform, length):
+    """Map (x, y) cells of the canonical orientation back to the caller"""
+    inverse = {TRANSFORMS[transform](x, y, length): (x, y)
+               for x in range(length) for y in range(length)}
+    return sorted(inverse[tuple(cell)] for cell in cells)
+
+
+def black_cells_of(result):
+    """Return the black (x, y) cells of a get_result matrix"""
+    return [(x, y) for y, row in enumerate(result) for x, cell in enumerate(row)
+            if cell.startswith(BLACK)]
+
+
+class SolveCache:
+    """
+    In-process LRU cache of solutions with size and TTL eviction.
+
+    Values are the sorted black cells of the canonical solution,
+    or None for puzzles proven infeasible.
+    """
+
+    def __init__(self, maxsize=SOLVE_CACHE_SIZE, ttl=SOLVE_CACHE_TTL, clock=time.monotonic):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.clock = clock
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def lookup(self, key):
+        """
+        Look up a puzzle.
+
+        Returns:
+            A (found, black_cells) tuple, black_cells is None for infeasible puzzles.
+        """
+        entry = self.entries.get(key)
+        if entry is None or self.clock() - entry[0] > self.ttl:
+            self.entries.pop(key, None)
+            self.misses += 1
+            return False, None
+        self.entries.move_to_end(key)
+        self.hits += 1
+        return True, entry[1]
+
+    def store(self, key, black_cells):
+        """Store the black cells of a solution, or None for an infeasible puzzle"""
+        self.entries[key] = (self.clock(), black_cells)
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.maxsize:
+            self.entries.popitem(last=False)
+
+
+class MongoSolveCache:
+    """Persistent cache tier in a Mongo collection"""
+
+    def __init__(self, collection):
+        self.collection = collection
+
+    async def lookup(self, key):
+        """Look up a puzzle, same contract as SolveCache.lookup"""
+        doc = await self.collection.find_one({"_id": key})
+        if doc is None:
+            return False, None
+        black = doc["black"]
+        return True, None if black is None else [tuple(cell) for cell in black]
+
+    async def store(self, key, black_cells):
+        """Store the black cells of a solution, or None for an infeasible puzzle"""
+        black = None if black_cells is None else [list(cell) for cell in black_cells]
+        await self.collection.replace_one({"_id": key}, {"_id": key, "black": black}, upsert=True)
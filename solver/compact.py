@@ -0,0 +1,148 @@
+"""Compact puzzle input: an array of region ids instead of a dict per room.
+
+A puzzle is the region id of every cell in row-major order, cell y * length + x,
+and a sparse map of the cells holding an 'S' or 'A' symbol. The same puzzle
+fits a single base64 string of bytes:
+    - the grid length, one byte;
+    - the region id of every cell in row-major order, little-endian uint16;
+    - per symbol, the cell index as a little-endian uint16 and the ASCII symbol.
+Both are parsed into arrays without building the "x,y" keys of the dict format.
+
+Solutions have a compact form as well: the black cells as a row-major string
+of 0 and 1 ('bits') or packed 8 per byte, most significant bit first, in
+base64 ('base64'), with the grid length and the symbols by cell index.
+"""
+import base64
+import binascii
+from typing import NamedTuple
+
+import numpy as np
+
+from solver.utils import BLACK, InvalidInputError
+
+SYMBOL_DTYPE = np.dtype([('cell', '<u2'), ('symbol', 'S1')])
+SOLUTION_FORMATS = ('matrix', 'bits', 'base64')
+
+
+class CompactPuzzle(NamedTuple):
+    """Region ids indexed [y][x] and the symbols by cell index y * length + x"""
+    regions: np.ndarray
+    symbols: dict
+
+
+def parse_regions(regions, symbols=None):
+    """
+    Parse a flat row-major list of region ids and a map of symbols by cell index.
+
+    Raises:
+        InvalidInputError: If the ids do not fill a square grid or a symbol is invalid.
+    """
+    regions = np.asarray(regions)
+    length = int(round(np.sqrt(regions.size)))
+    if regions.ndim != 1 or length * length != regions.size:
+        raise InvalidInputError("The region ids must fill a square grid")
+    if not np.issubdtype(regions.dtype, np.integer) or (regions < 0).any():
+        raise InvalidInputError("The region ids must be non-negative integers")
+    parsed = {}
+    for cell, symbol in (symbols or {}).items():
+        cell = int(cell)
+        if not 0 <= cell < regions.size:
+            raise InvalidInputError(f"There is no cell {cell}")
+        if symbol not in ('', 'S', 'A'):
+            raise ValueError("Invalid value in symbols, must be empty string or 'S'/'A'.")
+        if symbol:
+            parsed[cell] = symbol
+    return CompactPuzzle(regions.reshape(length, length), parsed)
+
+
+def decode_puzzle(text):
+    """
+    Parse the base64 form of a puzzle.
+
+    Raises:
+        InvalidInputError: If the string is not a valid encoded puzzle.
+    """
+    try:
+        data = base64.b64decode(text, validate=True)
+    except (binascii.Error, ValueError) as e:
+        raise InvalidInputError("The grid is not valid base64") from e
+    if not data:
+        raise InvalidInputError("The grid is empty")
+    size = data[0] * data[0]
+    end = 1 + 2 * size
+    if len(data) < end or (len(data) - end) % SYMBOL_DTYPE.itemsize:
+        raise InvalidInputError("The grid does not match its length")
+    regions = np.frombuffer(data, dtype='<u2', count=size, offset=1)
+    entries = np.frombuffer(data, dtype=SYMBOL_DTYPE, offset=end)
+    return parse_regions(regions, {int(cell): symbol.decode('ascii', 'replace')
+                                   for cell, symbol in entries})
+
+
+def encode_puzzle(puzzle):
+    """Return the base64 form of a CompactPuzzle"""
+    length = puzzle.regions.shape[0]
+    entries = np.array(sorted(puzzle.symbols.items()), dtype=SYMBOL_DTYPE)
+    data = (bytes([length]) + puzzle.regions.astype('<u2').tobytes()
+            + entries.tobytes())
+    return base64.b64encode(data).decode('ascii')
+
+
+def from_coordinates(coordinates):
+    """Convert rooms of the dict format to a CompactPuzzle"""
+    cells = {}
+    symbols = {}
+    for region_id, room in enumerate(coordinates):
+        for coord, symbol in room.items():
+            x, y = map(int, coord.split(','))
+            cells[x, y] = region_id
+            if symbol:
+                symbols[x, y] = symbol
+    length = max(max(cell) for cell in cells) + 1
+    regions = np.zeros((length, length), dtype=int)
+    for (x, y), region_id in cells.items():
+        regions[y, x] = region_id
+    return CompactPuzzle(regions, {y * length + x: symbol for (x, y), symbol in symbols.items()})
+
+
+def to_coordinates(puzzle):
+    """Convert a CompactPuzzle to rooms of the dict format, ordered by region id"""
+    length = puzzle.regions.shape[0]
+    rooms = {}
+    for cell, region_id in enumerate(puzzle.regions.ravel().tolist()):
+        y, x = divmod(cell, length)
+        rooms.setdefault(region_id, {})[f'{x},{y}'] = puzzle.symbols.get(cell, '')
+    return [rooms[region_id] for region_id in sorted(rooms)]
+
+
+def encode_solution(result, solution_format):
+    """
+    Encode a get_result matrix in one of SOLUTION_FORMATS, 'matrix' returns it as it is.
+
+    Returns:
+        A {"length", "black", "symbols"} dictionary for the compact formats.
+    """
+    if solution_format == 'matrix':
+        return result
+    cells = np.array(result, dtype=str).ravel()
+    black = np.char.startswith(cells, BLACK)
+    if solution_format == 'bits':
+        encoded = (black.astype(np.uint8) + ord('0')).tobytes().decode('ascii')
+    else:
+        encoded = base64.b64encode(np.packbits(black).tobytes()).decode('ascii')
+    marked = np.flatnonzero(np.char.find(cells, '/') >= 0)
+    return {
+        "length": len(result),
+        "black": encoded,
+        "symbols": {str(cell): cells[cell].split('/')[1] for cell in marked.tolist()},
+    }
+
+
+def decode_black(encoded, solution_format):
+    """Return the black cells of an encoded solution as a boolean array indexed [y][x]"""
+    length = encoded["length"]
+    if solution_format == 'bits':
+        black = np.frombuffer(encoded["black"].encode('ascii'), dtype=np.uint8) == ord('1')
+    else:
+        packed = np.frombuffer(base64.b64decode(encoded["black"]), dtype=np.uint8)
+        black = np.unpackbits(packed, count=length * length).astype(bool)
+    return black.reshape(length, length)
@@ -0,0 +1,88 @@
+"""Pool of connectivity cuts shared by the solves of same-sized puzzles.
+
+The wall and loop cuts only depend on the grid, not on the rooms, so a cut
+found for one puzzle is valid for every puzzle of the same size. The pool
+counts in how many solves every cut was violated, seeds new models with the
+most violated ones and drops the least violated ones when it is full. A
+cut is kept as the sorted indexes i * length + j of its cells.
+"""
+import heapq
+import os
+import threading
+
+CUT_POOL_SIZE = int(os.getenv('CUT_POOL_SIZE', '512'))  # Cuts kept per grid size
+CUT_POOL_SEED = int(os.getenv('CUT_POOL_SEED', '64'))  # Cuts added to a new model
+
+
+class CutPool:
+    """In-process pool of cuts by grid size, with the number of solves that violated them"""
+
+    def __init__(self, maxsize=CUT_POOL_SIZE):
+        self.maxsize = maxsize
+        self.cuts = {}  # length -> {cell indexes: hits}
+        self.changed = set()  # Grid sizes changed since the last take_changed
+        # solves of several worker threads record their cuts
+        self.lock = threading.Lock()
+
+    def record(self, length, cuts):
+        """Count the (i, j) cuts violated in a solve, each once"""
+        keys = {tuple(sorted(i * length + j for i, j in cut)) for cut in cuts}
+        if not keys:
+            return
+        with self.lock:
+            pool = self.cuts.setdefault(length, {})
+            for key in keys:
+                pool[key] = pool.get(key, 0) + 1
+            self.evict(length)
+            self.changed.add(length)
+
+    def evict(self, length):
+        """Keep the maxsize most violated cuts of a grid size"""
+        pool = self.cuts[length]
+        if len(pool) > self.maxsize:
+            self.cuts[length] = dict(heapq.nlargest(self.maxsize, pool.items(),
+                                                    key=lambda item: item[1]))
+
+    def top(self, length, count=CUT_POOL_SEED):
+        """Return the count most violated cuts of a grid size, as lists of (i, j) cells"""
+        with self.lock:
+            best = heapq.nlargest(count, self.cuts.get(length, {}).items(),
+                                  key=lambda item: item[1])
+        return [[divmod(index, length) for index in key] for key, _ in best]
+
+    def merge(self, length, entries):
+        """Add (cell indexes, hits) entries, e.g. loaded from a store"""
+        with self.lock:
+            pool = self.cuts.setdefault(length, {})
+            for key, hits in entries:
+                key = tuple(key)
+                pool[key] = pool.get(key, 0) + hits
+            self.evict(length)
+
+    def take_changed(self):
+        """Return the (length, entries) of the grid sizes changed since the last call"""
+        with self.lock:
+            changed, self.changed = self.changed, set()
+            return [(length, list(self.cuts[length].items())) for length in changed]
+
+
+class MongoCutPoolStore:
+    """Cut pool persisted in a Mongo collection, a document per grid size"""
+
+    def __init__(self, collection):
+        self.collection = collection
+
+    async def load(self, pool):
+        """Merge the stored cuts into pool"""
+        async for doc in self.collection.find():
+            pool.merge(doc["_id"], doc["cuts"])
+
+    async def save(self, pool):
+        """Store the grid sizes of pool changed since the last save"""
+        for length, entries in pool.take_changed():
+            cuts = [[list(key), hits] for key, hits in entries]
+            await self.collection.replace_one({"_id": length}, {"_id": length, "cuts": cuts},
+                                              upsert=True)
+
+
+CUT_POOL = CutPool()
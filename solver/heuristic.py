@@ -0,0 +1,85 @@
+"""Greedy heuristic that guesses black cells to warm-start the MIP backends."""
+from collections import deque
+
+from solver.utils import BLACK, WHITE
+
+
+def cell_neigh(cell, length):
+    """Return a list of orthogonally neighbouring cells"""
+    i, j = cell
+    return [(ii, jj) for (ii, jj) in ((i - 1, j), (i, j + 1), (i + 1, j), (i, j - 1))
+            if 0 <= ii < length and 0 <= jj < length]
+
+
+def whites_connected(black, length):
+    """Check that the cells which are not black form one orthogonally connected area"""
+    white = length * length - len(black)
+    if not white:
+        return True
+    seed = next((i, j) for i in range(length) for j in range(length) if (i, j) not in black)
+    seen = {seed}
+    queue = deque([seed])
+    while queue:
+        for neighbour in cell_neigh(queue.popleft(), length):
+            if neighbour not in black and neighbour not in seen:
+                seen.add(neighbour)
+                queue.append(neighbour)
+    return len(seen) == white
+
+
+def greedy_start(length, runs, equal_pairs, exclusive_pairs, white_cells=(), fixed=None):
+    """
+    Pick black cells run by run for a MIP start.
+
+    The most constrained run is served first, by the free cell covering the
+    most unserved runs that keeps black cells apart, respects the 'S' and 'A'
+    pairs and keeps the white cells connected. Runs without such a cell are
+    left unserved, so the guess may be infeasible, in which case the backend
+    drops it.
+
+    Returns:
+        A sorted list of black (i, j) cells.
+    """
+    fixed = fixed or {}
+    black = {cell for cell, colour in fixed.items() if colour == BLACK}
+    banned = set(white_cells) | {cell for cell, colour in fixed.items() if colour == WHITE}
+    for cell in black:
+        banned.update(cell_neigh(cell, length))
+    equal, exclusive = {}, {}
+    for first, second in equal_pairs:
+        equal[first], equal[second] = second, first
+    for first, second in exclusive_pairs:
+        exclusive.setdefault(first, set()).add(second)
+        exclusive.setdefault(second, set()).add(first)
+    runs_by_cell = {}
+    for run in runs:
+        for cell in run:
+            runs_by_cell.setdefault(cell, []).append(run)
+
+    def allowed(group):
+        cells = set(group)
+        if cells & (banned | black):
+            return False
+        if any(neighbour in cells for cell in cells for neighbour in cell_neigh(cell, length)):
+            return False
+        if any(other in black for cell in cells for other in exclusive.get(cell, ())):
+            return False
+        return whites_connected(black | cells, length)
+
+    def unserved(run):
+        return not black.intersection(run)
+
+    for run in sorted(runs, key=lambda run: sum(cell not in banned for cell in run)):
+        if not unserved(run):
+            continue
+        candidates = sorted((cell for cell in run if cell not in banned),
+                            key=lambda cell: -sum(map(unserved, runs_by_cell[cell])))
+        for cell in candidates:
+            group = [cell] + ([equal[cell]] if cell in equal else [])
+            if allowed(group):
+                for member in group:
+                    black.add(member)
+                    banned.update(cell_neigh(member, length))
+                    banned.update(exclusive.get(member, ()))
+                break
+    return sorted(black)
@@ -0,0 +1,132 @@
+"""Asynchronous solve jobs with progress events.
+
+A job is solved in the worker pool while clients poll its status or stream
+its events. The Solver reports a "backend" event for every backend it tries
+and an "incumbent" event, with the cuts it added, for every candidate
+solution checked by the MIP backends. The job adds a final "done" or "failed"
+event. Finished jobs are kept in memory for a while and can be persisted in
+Mongo, where a TTL index removes them.
+"""
+import asyncio
+import datetime
+import os
+import uuid
+from collections import OrderedDict
+
+SOLVE_JOB_TTL = int(os.getenv('SOLVE_JOB_TTL', '86400'))
+SOLVE_JOBS_KEPT = int(os.getenv('SOLVE_JOBS_KEPT', '256'))
+
+QUEUED, RUNNING, DONE, FAILED = 'queued', 'running', 'done', 'failed'
+
+
+class SolveJob:
+    """A puzzle queued in the worker pool and the events of its solve"""
+
+    def __init__(self, job_id=None):
+        self.id = job_id or uuid.uuid4().hex
+        self.status = QUEUED
+        self.events = []
+        self.result = None
+        self.error = None
+        self.created = datetime.datetime.now(datetime.timezone.utc)
+        self.finished = None
+        self.changed = asyncio.Event()
+
+    def publish(self, event):
+        """Record an event and wake up the streams waiting for it"""
+        if self.status == QUEUED:
+            self.status = RUNNING
+        self.events.append(event)
+        # a fresh event per change, so every waiting stream is woken up once
+        changed, self.changed = self.changed, asyncio.Event()
+        changed.set()
+
+    def finish(self, result=None, error=None):
+        """Record the result, or the error, of the solve"""
+        self.result = result
+        self.error = error
+        self.finished = datetime.datetime.now(datetime.timezone.utc)
+        if error is None:
+            self.publish({"event": DONE, "result": result})
+            self.status = DONE
+        else:
+            self.publish({"event": FAILED, "error": error})
+            self.status = FAILED
+
+    def is_finished(self):
+        """Check whether the solve has ended"""
+        return self.status in (DONE, FAILED)
+
+    async def stream(self):
+        """Yield every event of the job, waiting for new ones until it is finished"""
+        sent = 0
+        while True:
+            changed = self.changed
+            while sent < len(self.events):
+                yield self.events[sent]
+                sent += 1
+            if self.is_finished():
+                return
+            await changed.wait()
+
+    def to_dict(self):
+        """Get the status and the result of the job"""
+        return {
+            "id": self.id,
+            "status": self.status,
+            "result": self.result,
+            "error": self.error,
+            "events": len(self.events),
+        }
+
+
+class JobRegistry:
+    """In-process registry of jobs, the oldest finished jobs are dropped first"""
+
+    def __init__(self, kept=SOLVE_JOBS_KEPT):
+        self.kept = kept
+        self.jobs = OrderedDict()
+
+    def create(self):
+        """Register a new job"""
+        job = SolveJob()
+        self.jobs[job.id] = job
+        return job
+
+    def get(self, job_id):
+        """Get a job by id, or None"""
+        return self.jobs.get(job_id)
+
+    def forget_finished(self):
+        """Drop the oldest finished jobs above the kept amount"""
+        finished = [job_id for job_id, job in self.jobs.items() if job.is_finished()]
+        for job_id in finished[:max(len(finished) - self.kept, 0)]:
+            del self.jobs[job_id]
+
+
+class MongoJobStore:
+    """Finished jobs in a Mongo collection, expired by a TTL index"""
+
+    def __init__(self, collection, ttl=SOLVE_JOB_TTL):
+        self.collection = collection
+        self.ttl = ttl
+        self.indexed = False
+
+    async def store(self, job):
+        """Persist a finished job"""
+        if not self.indexed:
+            await self.collection.create_index("finished", expireAfterSeconds=self.ttl)
+            self.indexed = True
+        doc = job.to_dict()
+        doc["_id"] = doc.pop("id")
+        doc["finished"] = job.finished
+        await self.collection.replace_one({"_id": job.id}, doc, upsert=True)
+
+    async def get(self, job_id):
+        """Get the status and the result of a persisted job, or None"""
+        doc = await self.collection.find_one({"_id": job_id})
+        if doc is None:
+            return None
+        doc["id"] = doc.pop("_id")
+        doc.pop("finished", None)
+        return doc
@@ -1,8 +1,10 @@
 """Models"""
 from test.consts_input import input_matrix_7x7
-from typing import Dict, List
+from typing import Dict, List, Optional, Tuple
 
-from pydantic import BaseModel
+from pydantic import BaseModel, model_validator
+
+from solver.compact import decode_puzzle, parse_regions
 
 example_data_for_docs: list = [
     {
@@ -12,11 +14,53 @@ example_data_for_docs: list = [
 
 
 class Condition(BaseModel):
-    """Input data for the solver endpoint"""
-    coordinates: List[Dict[str, str]]
+    """Input data for the solver endpoint, the rooms in one of three formats"""
+    coordinates: Optional[List[Dict[str, str]]] = None
+    # compact format: the region id of every cell in row-major order and the
+    # 'S'/'A' symbols by cell index y * length + x, see solver.compact
+    regions: Optional[List[int]] = None
+    symbols: Dict[int, str] = {}
+    # the compact format as a single base64 string
+    grid: Optional[str] = None
+    # black (x, y) cells of a guessed solution, used as a MIP start
+    start: Optional[List[Tuple[int, int]]] = None
+
+    @model_validator(mode='after')
+    def check_format(self):
+        """Check that the rooms are given in exactly one format"""
+        if sum(value is not None for value in (self.coordinates, self.regions, self.grid)) != 1:
+            raise ValueError("Provide exactly one of coordinates, regions or grid.")
+        return self
+
+    def puzzle(self):
+        """
+        Return the rooms as the Solver takes them, a CompactPuzzle for the compact formats.
+
+        Raises:
+            InvalidInputError: If the compact rooms can not be parsed.
+        """
+        if self.regions is not None:
+            return parse_regions(self.regions, self.symbols)
+        if self.grid is not None:
+            return decode_puzzle(self.grid)
+        return self.coordinates
 
     model_config = {
         "json_schema_extra": {
             "examples": example_data_for_docs,
         }
     }
+
+
+class Verification(Condition):
+    """Input data for the verify endpoint, the rooms and a candidate solution"""
+    # 'B'/'W' cells indexed [y][x], with an optional '/S' or '/A' as /solve returns them
+    solution: List[List[str]]
+
+
+class SessionEdit(BaseModel):
+    """Edit of the rooms of a solve session"""
+    # new symbol of rooms, by their index in coordinates, '' clears it
+    symbols: Dict[int, str] = {}
+    # pairs of room indexes, the second room joins the first one
+    merges: List[Tuple[int, int]] = []
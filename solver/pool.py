@@ -0,0 +1,227 @@
+"""Bounded worker pool that keeps blocking solves off the event loop."""
+import asyncio
+import functools
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+from solver.solver import Solver
+from solver.utils import PoolFullError, SolveTimeoutError
+
+SOLVER_POOL_KIND = os.getenv('SOLVER_POOL_KIND', 'thread')  # 'thread' or 'process'
+SOLVER_POOL_SIZE = int(os.getenv('SOLVER_POOL_SIZE', str(os.cpu_count() or 1)))
+SOLVER_QUEUE_SIZE = int(os.getenv('SOLVER_QUEUE_SIZE', '32'))
+SOLVE_TIMEOUT = float(os.getenv('SOLVE_TIMEOUT', '60'))
+# batches get their own pool, so they can not starve interactive solves
+SOLVER_BATCH_POOL_KIND = os.getenv('SOLVER_BATCH_POOL_KIND', 'process')
+SOLVER_BATCH_POOL_SIZE = int(os.getenv('SOLVER_BATCH_POOL_SIZE',
+                                       str(max((os.cpu_count() or 1) // 2, 1))))
+RETRY_AFTER = 5  # seconds suggested to clients turned away by a full pool
+STOP = object()  # marks the end of the items of SolverPool.iterate
+
+
+class SolveHandle:
+    """Handle to stop the solve of a queued task from the event loop, in thread pools"""
+
+    def __init__(self):
+        self.solver = None
+        self.cancelled = False
+        self.lock = threading.Lock()
+
+    def attach(self, solver):
+        """Register the Solver of the task, cancelled at once if the task was"""
+        with self.lock:
+            self.solver = solver
+            if self.cancelled:
+                solver.cancel()
+
+    def cancel(self):
+        """Stop the solve, or keep it from starting"""
+        with self.lock:
+            self.cancelled = True
+            if self.solver is not None:
+                self.solver.cancel()
+
+
+def solve_task(coordinates, options, deadline, progress=None, start=None, handle=None):
+    """
+    Solve a puzzle in a worker.
+
+    Args:
+        coordinates: The rooms of the puzzle, as in Condition.coordinates.
+        options: Keyword arguments for the Solver.
+        deadline: time.time() by which the solve must end, queueing included.
+        progress: Optional function receiving the progress events of the Solver.
+        start: Optional black (x, y) cells of a guessed solution.
+        handle: Optional SolveHandle stopping the solve when the request is cancelled.
+    """
+    time_limit = deadline - time.time()
+    if time_limit <= 0:
+        raise SolveTimeoutError("Solve time limit exceeded")
+    solver = Solver(coordinates, progress=progress, **options)
+    if handle is not None:
+        handle.attach(solver)
+    result = solver.solve(time_limit=time_limit, start=start)
+    if solver.unique:
+        return {"solution": result, **solver.get_uniqueness()}
+    return result
+
+
+class SolverPool:
+    """
+    Thread or process pool with a bounded queue.
+
+    At most workers tasks run at once and at most queue_size more wait for a
+    worker, further tasks are rejected with PoolFullError.
+    """
+
+    def __init__(self, kind=SOLVER_POOL_KIND, workers=SOLVER_POOL_SIZE,
+                 queue_size=SOLVER_QUEUE_SIZE):
+        if kind not in ('thread', 'process'):
+            raise ValueError("The pool kind must be 'thread' or 'process'.")
+        self.kind = kind
+        self.workers = workers
+        self.queue_size = queue_size
+        self.pending = 0  # Running and queued tasks
+        self.executor = None
+
+    def get_executor(self):
+        """Start the executor on first use"""
+        if self.executor is None:
+            executor_class = ThreadPoolExecutor if self.kind == 'thread' else ProcessPoolExecutor
+            self.executor = executor_class(max_workers=self.workers)
+        return self.executor
+
+    def submit(self, fn, *args, **kwargs):
+        """
+        Queue fn in the pool and return an asyncio future of its result.
+
+        Raises:
+            PoolFullError: If all workers are busy and the queue is full.
+        """
+        return self.schedule(self.get_executor(), functools.partial(fn, *args, **kwargs))
+
+    def schedule(self, executor, call):
+        """Admit call and run it on executor, None being the default executor of the loop"""
+        if self.pending >= self.workers + self.queue_size:
+            raise PoolFullError("The solver is busy, retry later")
+        loop = asyncio.get_running_loop()
+        future = loop.run_in_executor(executor, call)
+        self.pending += 1
+        future.add_done_callback(self.release)
+        return future
+
+    def release(self, _future):
+        """Free the slot of a finished task"""
+        self.pending -= 1
+
+    async def run(self, fn, *args, **kwargs):
+        """Run fn in the pool and wait for its result, see submit"""
+        return await self.submit(fn, *args, **kwargs)
+
+    def iterate(self, make_items, *args, buffer=16, idle_timeout=SOLVE_TIMEOUT):
+        """
+        Produce the items of make_items(*args) in the pool and return an async iterator of them.
+
+        The worker waits while buffer items are not consumed, so a slow
+        client does not make the items pile up in memory. It gives up when
+        the consumer stops or takes no item for idle_timeout seconds, e.g.
+        when the iterator is never started.
+
+        Raises:
+            PoolFullError: If all workers are busy and the queue is full.
+        """
+        loop = asyncio.get_running_loop()
+        items = asyncio.Queue(maxsize=buffer)
+        stopped = threading.Event()
+
+        def put(entry):
+            """Wait for room in the queue, False if the consumer took nothing for too long"""
+            try:
+                asyncio.run_coroutine_threadsafe(
+                    asyncio.wait_for(items.put(entry), idle_timeout), loop).result()
+                return True
+            except asyncio.TimeoutError:
+                return False
+
+        def produce():
+            try:
+                for item in make_items(*args):
+                    if not put((item, None)) or stopped.is_set():
+                        return
+                error = None
+            except Exception as e:  # pylint: disable=W0718
+                error = e
+            if not stopped.is_set():
+                put((STOP, error))
+
+        # the items are passed to the event loop, so they are produced on a thread
+        self.schedule(self.thread_executor(), produce)
+        return self.consume(items, stopped)
+
+    def thread_executor(self):
+        """Return the executor of a thread pool, or the default executor of the loop"""
+        return self.get_executor() if self.kind == 'thread' else None
+
+    async def run_thread(self, fn, *args):
+        """Run fn on a thread, for work on objects that can not be sent to a process"""
+        return await self.schedule(self.thread_executor(), functools.partial(fn, *args))
+
+    @staticmethod
+    async def consume(items, stopped):
+        """Yield the items put in the queue by iterate, raising the error of the worker"""
+        try:
+            while True:
+                item, error = await items.get()
+                if item is STOP:
+                    if error is not None:
+                        raise error
+                    return
+                yield item
+        finally:
+            # unblock a worker waiting for room, it stops after its current item
+            stopped.set()
+            while not items.empty():
+                items.get_nowait()
+
+    def submit_solve(self, coordinates, options=None, timeout=SOLVE_TIMEOUT, progress=None,
+                     start=None, handle=None):
+        """
+        Queue a puzzle in the pool, to be solved within timeout seconds.
+
+        progress and handle are only used in thread pools, they can not reach
+        the event loop from another process.
+        """
+        if self.kind == 'process':
+            progress = handle = None
+        return self.submit(solve_task, coordinates, options or {},
+                           time.time() + min(timeout, SOLVE_TIMEOUT), progress, start, handle)
+
+    async def solve(self, coordinates, options=None, timeout=SOLVE_TIMEOUT, start=None):
+        """
+        Solve a puzzle in the pool within timeout seconds.
+
+        In thread pools a cancelled request, e.g. by a client disconnect,
+        stops the optimization instead of leaving it to its time limit.
+        """
+        handle = SolveHandle()
+        future = self.submit_solve(coordinates, options, timeout, start=start, handle=handle)
+        try:
+            return await future
+        except asyncio.CancelledError:
+            handle.cancel()
+            raise
+
+    def shutdown(self):
+        """Stop the workers"""
+        if self.executor is not None:
+            self.executor.shutdown(wait=False, cancel_futures=True)
+            self.executor = None
+
+
+SOLVER_POOL = SolverPool()
+# batch items wait for a free worker before they are submitted, so no queue
+BATCH_POOL = SolverPool(SOLVER_BATCH_POOL_KIND, SOLVER_BATCH_POOL_SIZE, queue_size=0)
+# batch items solved at once, over all batches and generation runs
+BATCH_SLOTS = asyncio.Semaphore(BATCH_POOL.workers)
@@ -0,0 +1,218 @@
+"""Portfolio racing of solver variants.
+
+Solve times on hard puzzles vary by orders of magnitude between
+formulations, parameters and backends. A race starts every active variant
+in its own process on the same puzzle, returns the first proven answer, a
+solution or a proof that there is none, and kills the others. Wins are
+counted per variant, and variants that keep losing are left out of later
+races.
+"""
+import multiprocessing
+import os
+import queue
+import threading
+import time
+
+from solver.solver import Solver
+from solver.utils import BackendError, InvalidInputError, SolveTimeoutError
+
+# name: Solver options
+PORTFOLIO_VARIANTS = {
+    'gurobi-loop': {"backend": "gurobi", "build": "loop"},
+    'gurobi-tight': {"backend": "gurobi", "build": "tight"},
+    'gurobi-tight-focus': {"backend": "gurobi", "build": "tight", "profile": {"MIPFocus": 1}},
+    'cpsat-tight': {"backend": "cpsat", "build": "tight"},
+}
+
+
+def portfolio_names(value):
+    """
+    Return the variant names of a comma-separated list.
+
+    Raises:
+        ValueError: If the list is empty or names an unknown variant.
+    """
+    names = [name.strip() for name in value.split(',') if name.strip()]
+    unknown = [name for name in names if name not in PORTFOLIO_VARIANTS]
+    if unknown or not names:
+        raise ValueError(f"Unknown portfolio variants: {', '.join(unknown) or 'none given'}, "
+                         f"must be one or more of: {', '.join(PORTFOLIO_VARIANTS)}.")
+    return names
+
+
+# comma-separated names of the variants to race, all of them by default
+SOLVE_PORTFOLIO = portfolio_names(os.getenv('SOLVE_PORTFOLIO', ','.join(PORTFOLIO_VARIANTS)))
+# variants winning less than this share of their first races are pruned
+PORTFOLIO_MIN_RACES = int(os.getenv('PORTFOLIO_MIN_RACES', '20'))
+PORTFOLIO_MIN_WIN_RATE = float(os.getenv('PORTFOLIO_MIN_WIN_RATE', '0.05'))
+POLL_INTERVAL = 0.5  # seconds between checks for variants that died without an answer
+
+
+def get_context():
+    """Return the multiprocessing context of the races, its server process imports the solver"""
+    context = multiprocessing.get_context('forkserver')
+    context.set_forkserver_preload(['solver.solver'])
+    return context
+
+
+def run_variant(name, coordinates, options, time_limit, results):
+    """Solve a puzzle with the options of a variant and put (name, result, error) on results"""
+    try:
+        result = Solver(coordinates, **options).solve(time_limit=time_limit)
+        results.put((name, result, None))
+    except (BackendError, InvalidInputError, SolveTimeoutError, ValueError) as e:
+        results.put((name, None, e))
+    except Exception as e:  # pylint: disable=W0718
+        # engine errors may not survive pickling
+        results.put((name, None, BackendError(f"{type(e).__name__}: {e}")))
+
+
+def exited_variants(processes, failed):
+    """Return the errors of the variants that exited without reporting, not yet in failed"""
+    # a variant killed e.g. by the OOM killer never reports
+    return {name: BackendError(f"Variant '{name}' exited with code {process.exitcode}")
+            for name, process in processes.items()
+            if name not in failed and process.exitcode not in (None, 0)}
+
+
+class PortfolioStats:
+    """Races and wins of every variant"""
+
+    def __init__(self, min_races=PORTFOLIO_MIN_RACES, min_win_rate=PORTFOLIO_MIN_WIN_RATE):
+        self.min_races = min_races
+        self.min_win_rate = min_win_rate
+        self.races = {}
+        self.wins = {}
+        self.errors = {}
+        self.lock = threading.Lock()
+
+    def record(self, names, winner=None, failed=()):
+        """Count a race of the variants, its winner and the variants that failed"""
+        with self.lock:
+            for name in names:
+                self.races[name] = self.races.get(name, 0) + 1
+            if winner is not None:
+                self.wins[winner] = self.wins.get(winner, 0) + 1
+            for name in failed:
+                self.errors[name] = self.errors.get(name, 0) + 1
+
+    def is_pruned(self, name):
+        """Check whether a variant won too few of its races to keep racing"""
+        races = self.races.get(name, 0)
+        return races >= self.min_races and self.wins.get(name, 0) < self.min_win_rate * races
+
+    def active(self, names):
+        """Return the variants to race, the one with the most wins is always kept"""
+        with self.lock:
+            kept = [name for name in names if not self.is_pruned(name)]
+            if not kept and names:
+                kept = [max(names, key=lambda name: self.wins.get(name, 0))]
+            return kept
+
+    def to_dict(self):
+        """Get the races, wins and errors of every variant and whether it is pruned"""
+        with self.lock:
+            return {name: {"races": races, "wins": self.wins.get(name, 0),
+                           "errors": self.errors.get(name, 0), "pruned": self.is_pruned(name)}
+                    for name, races in self.races.items()}
+
+
+PORTFOLIO_STATS = PortfolioStats()
+
+
+class RaceHandle:
+    """The variant processes of a race, killed from the event loop when the request is cancelled"""
+
+    def __init__(self):
+        self.processes = []
+        self.cancelled = False
+        self.lock = threading.Lock()
+
+    def start(self, processes):
+        """Start the variants, killed at once if the race was cancelled"""
+        processes = list(processes)
+        for process in processes:
+            process.start()
+        with self.lock:
+            self.processes = processes
+            if self.cancelled:
+                self.kill()
+
+    def cancel(self):
+        """Stop the race, or keep it from running"""
+        with self.lock:
+            self.cancelled = True
+            self.kill()
+
+    def kill(self):
+        """Kill the variants still running"""
+        for process in self.processes:
+            if process.is_alive():
+                process.kill()
+
+    def stop(self):
+        """Kill the variants still running and wait for all of them to exit"""
+        with self.lock:
+            self.kill()
+        for process in self.processes:
+            process.join()
+
+
+def race(coordinates, time_limit, names=None, stats=PORTFOLIO_STATS, options=None,
+         handle=None):
+    """
+    Solve a puzzle with every active variant at once and return the first answer.
+
+    Args:
+        coordinates: The rooms of the puzzle, as in Condition.coordinates.
+        time_limit: Seconds after which all variants are stopped.
+        names: The variants to race, SOLVE_PORTFOLIO by default.
+        stats: The PortfolioStats recording the race and pruning the variants.
+        options: Solver options shared by all variants, e.g. presolve.
+        handle: Optional RaceHandle stopping the race when the request is cancelled.
+
+    Returns:
+        A (result, winner) tuple, result is [] if the puzzle has no solution.
+
+    Raises:
+        SolveTimeoutError: If no variant ends within time_limit seconds, or the race
+            is cancelled.
+        BackendError: If every variant failed, the error of the first one.
+    """
+    handle = handle or RaceHandle()
+    names = stats.active(names or SOLVE_PORTFOLIO)
+    context = get_context()
+    results = context.Queue()
+    processes = {
+        name: context.Process(
+            target=run_variant, daemon=True,
+            args=(name, coordinates, {**(options or {}), **PORTFOLIO_VARIANTS[name]},
+                  time_limit, results))
+        for name in names}
+    handle.start(processes.values())
+    deadline = time.monotonic() + time_limit
+    failed = {}
+    try:
+        while True:
+            if handle.cancelled:
+                # killed variants are not counted as failures
+                raise SolveTimeoutError("Solve time limit exceeded")
+            if len(failed) == len(processes):
+                stats.record(names, failed=failed)
+                raise next(iter(failed.values()))
+            left = deadline - time.monotonic()
+            if left <= 0:
+                stats.record(names, failed=failed)
+                raise SolveTimeoutError("Solve time limit exceeded")
+            try:
+                name, result, error = results.get(timeout=min(left, POLL_INTERVAL))
+            except queue.Empty:
+                failed.update(exited_variants(processes, failed))
+                continue
+            if error is None:
+                stats.record(names, winner=name, failed=failed)
+                return result, name
+            failed[name] = error
+    finally:
+        # the losers are killed, not waited for
+        handle.stop()
@@ -0,0 +1,108 @@
+"""Logical presolve that fixes forced cells before the model is built."""
+from collections import deque
+
+from solver.utils import WHITE, BLACK
+
+
+class Contradiction(Exception):
+    """Raised when the rules force a cell to be both black and white."""
+
+
+class Presolver:
+    """
+    Propagate the puzzle rules over partially coloured cells.
+
+    Every rule mirrors a constraint of the model, so a fixed cell has the
+    same colour in every solution of the model:
+        - a black cell makes its orthogonal neighbours white;
+        - a white cell needs a white orthogonal neighbour;
+        - a run spanning 3 regions needs a black cell;
+        - 'S' pairs have equal colours, 'A' pairs are not both black.
+    """
+
+    def __init__(self, length, runs, equal_pairs, exclusive_pairs, white_cells=()):
+        self.length = length
+        self.colours = {}
+        self.runs = runs
+        self.runs_by_cell = {}
+        for run in runs:
+            for cell in run:
+                self.runs_by_cell.setdefault(cell, []).append(run)
+        self.equal = {}
+        for first, second in equal_pairs:
+            self.equal.setdefault(first, set()).add(second)
+            self.equal.setdefault(second, set()).add(first)
+        self.exclusive = {}
+        for first, second in exclusive_pairs:
+            self.exclusive.setdefault(first, set()).add(second)
+            self.exclusive.setdefault(second, set()).add(first)
+        self.queue = deque()
+        for cell in white_cells:
+            self.assign(cell, WHITE)
+
+    def cell_neigh(self, cell):
+        """Return a list of orthogonally neighbouring cells"""
+        i, j = cell
+        return [(ii, jj) for (ii, jj) in ((i - 1, j), (i, j + 1), (i + 1, j), (i, j - 1))
+                if 0 <= ii < self.length and 0 <= jj < self.length]
+
+    def assign(self, cell, colour):
+        """Fix the colour of a cell and queue it for propagation"""
+        current = self.colours.get(cell)
+        if current == colour:
+            return
+        if current is not None:
+            raise Contradiction(cell)
+        self.colours[cell] = colour
+        self.queue.append(cell)
+
+    def check_run(self, run):
+        """A run of white cells spanning 3 regions is not allowed"""
+        free = [cell for cell in run if self.colours.get(cell) != WHITE]
+        if not free:
+            raise Contradiction(run[0])
+        if len(free) == 1:
+            self.assign(free[0], BLACK)
+
+    def check_connected(self, cell):
+        """A white cell needs at least one white neighbour"""
+        if self.colours.get(cell) != WHITE:
+            return
+        free = [n for n in self.cell_neigh(cell) if self.colours.get(n) != BLACK]
+        if not free:
+            raise Contradiction(cell)
+        if len(free) == 1:
+            self.assign(free[0], WHITE)
+
+    def propagate(self, cell):
+        """Apply every rule touching a freshly fixed cell"""
+        colour = self.colours[cell]
+        if colour == BLACK:
+            for neighbour in self.cell_neigh(cell):
+                self.assign(neighbour, WHITE)
+            for other in self.exclusive.get(cell, ()):
+                self.assign(other, WHITE)
+        else:
+            for run in self.runs_by_cell.get(cell, ()):
+                self.check_run(run)
+        for other in self.equal.get(cell, ()):
+            self.assign(other, colour)
+        self.check_connected(cell)
+        for neighbour in self.cell_neigh(cell):
+            self.check_connected(neighbour)
+
+    def run(self):
+        """
+        Fix every deducible cell.
+
+        Returns:
+            A dictionary of fixed cells and their colours.
+
+        Raises:
+            Contradiction: If the puzzle has no solution.
+        """
+        for run in self.runs:
+            self.check_run(run)
+        while self.queue:
+            self.propagate(self.queue.popleft())
+        return self.colours
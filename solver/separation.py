@@ -0,0 +1,186 @@
+"""Separation of the connectivity lazy constraints.
+
+Black cells may only touch diagonally, so white connectivity is broken exactly
+when the diagonally connected black cells either run from one boundary cell to
+another (a wall) or close a cycle (a loop). Both cases are found with a single
+union-find pass over the grid, without recursion.
+"""
+from collections import deque
+
+
+class UnionFind:
+    """Disjoint-set forest with path halving and union by size."""
+
+    def __init__(self, size):
+        self.parent = list(range(size))
+        self.size = [1] * size
+
+    def find(self, item):
+        """Return the representative of the set containing item."""
+        parent = self.parent
+        while parent[item] != item:
+            parent[item] = parent[parent[item]]
+            item = parent[item]
+        return item
+
+    def union(self, first, second):
+        """Join two sets. Return False if they were already joined."""
+        first, second = self.find(first), self.find(second)
+        if first == second:
+            return False
+        if self.size[first] < self.size[second]:
+            first, second = second, first
+        self.parent[second] = first
+        self.size[first] += self.size[second]
+        return True
+
+
+def diagonal_neighbours(idx, length):
+    """Return the flat indices of the diagonal neighbours of a cell."""
+    i, j = divmod(idx, length)
+    neighbours = []
+    for di in (-1, 1):
+        if 0 <= i + di < length:
+            for dj in (-1, 1):
+                if 0 <= j + dj < length:
+                    neighbours.append((i + di) * length + j + dj)
+    return neighbours
+
+
+def is_boundary(idx, length):
+    """Return True if the cell lies on the border of the grid."""
+    i, j = divmod(idx, length)
+    return i in (0, length - 1) or j in (0, length - 1)
+
+
+def peel(cells, length, keep_boundary):
+    """
+    Repeatedly strip cells with a single diagonal neighbour in the set.
+
+    Boundary cells are never stripped when keep_boundary is set, so a wall
+    keeps both of its end points.
+    """
+    cells = set(cells)
+    degree = {idx: sum(n in cells for n in diagonal_neighbours(idx, length))
+              for idx in cells}
+    stack = [idx for idx, deg in degree.items()
+             if deg == 1 and not (keep_boundary and is_boundary(idx, length))]
+    while stack:
+        idx = stack.pop()
+        if idx not in cells:
+            continue
+        cells.remove(idx)
+        for neighbour in diagonal_neighbours(idx, length):
+            if neighbour in cells:
+                degree[neighbour] -= 1
+                if degree[neighbour] == 1 and not (
+                        keep_boundary and is_boundary(neighbour, length)):
+                    stack.append(neighbour)
+    return sorted(cells)
+
+
+def shortest_path(cells, start, targets, length, skip_edge=None):
+    """
+    Breadth-first search from start through cells towards any of targets.
+
+    Targets are end points, the search does not continue through them.
+    Return a dict mapping each reached target to the path leading to it.
+    """
+    previous = {start: None}
+    queue = deque([start])
+    paths = {}
+    while queue:
+        idx = queue.popleft()
+        if idx in targets and idx != start:
+            path = [idx]
+            while previous[path[-1]] is not None:
+                path.append(previous[path[-1]])
+            paths[idx] = path
+            continue
+        for neighbour in diagonal_neighbours(idx, length):
+            if (neighbour in cells and neighbour not in previous
+                    and {idx, neighbour} != skip_edge):
+                previous[neighbour] = idx
+                queue.append(neighbour)
+    return paths
+
+
+def minimal_walls(cells, length):
+    """Return the shortest boundary to boundary paths of a component."""
+    cells = set(cells)
+    boundary = {idx for idx in cells if is_boundary(idx, length)}
+    walls = set()
+    for start in sorted(boundary):
+        for path in shortest_path(cells, start, boundary, length).values():
+            walls.add(tuple(sorted(path)))
+    return sorted(walls)
+
+
+def minimal_loops(cells, closing_edges, length):
+    """Return the shortest cycle through each edge that closed a cycle."""
+    cells = set(cells)
+    loops = set()
+    for first, second in closing_edges:
+        paths = shortest_path(cells, first, {second}, length,
+                              skip_edge={first, second})
+        if second in paths:
+            loops.add(tuple(sorted(paths[second])))
+    return sorted(loops)
+
+
+def find_violations(black, length, minimal=False):
+    """
+    Find every wall and every loop of diagonally connected black cells.
+
+    Args:
+        black: A flat list of booleans, black[i * length + j] for cell (i, j).
+        length: The grid dimension.
+        minimal: Split each component into its shortest walls and cycles
+            instead of returning one trimmed cell set per component.
+
+    Returns:
+        A (walls, loops) tuple. Each entry is a list of (i, j) cells, trimmed
+        of trailing branches, that may not all be black at the same time.
+    """
+    union_find = UnionFind(length * length)
+    cyclic = {}
+    for idx, is_black in enumerate(black):
+        if not is_black:
+            continue
+        i, j = divmod(idx, length)
+        if i == 0:
+            continue
+        # Only the two diagonal neighbours in the previous row have been
+        # visited already, so every diagonal edge is joined exactly once.
+        for dj in (-1, 1):
+            if 0 <= j + dj < length and black[idx - length + dj]:
+                if not union_find.union(idx, idx - length + dj):
+                    cyclic.setdefault(idx, []).append(idx - length + dj)
+
+    components = {}
+    boundary = {}
+    for idx, is_black in enumerate(black):
+        if is_black:
+            root = union_find.find(idx)
+            components.setdefault(root, []).append(idx)
+            if is_boundary(idx, length):
+                boundary[root] = boundary.get(root, 0) + 1
+    closing_edges = {}
+    for idx, others in cyclic.items():
+        closing_edges.setdefault(union_find.find(idx), []).extend(
+            (idx, other) for other in others)
+
+    walls, loops = [], []
+    for root, cells in components.items():
+        if boundary.get(root, 0) > 1:
+            if minimal:
+                walls.extend(minimal_walls(cells, length))
+            else:
+                walls.append(peel(cells, length, keep_boundary=True))
+        if root in closing_edges:
+            if minimal:
+                loops.extend(minimal_loops(cells, closing_edges[root], length))
+            else:
+                loops.append(peel(cells, length, keep_boundary=False))
+    return ([[divmod(idx, length) for idx in wall] for wall in walls],
+            [[divmod(idx, length) for idx in loop] for loop in loops])
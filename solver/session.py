@@ -0,0 +1,312 @@
+"""Solve sessions that keep the model of a puzzle between edits.
+
+The puzzle editor changes a room symbol or merges two rooms at a time. A
+session keeps its backend model, the connectivity cuts found so far and the
+last solution. An edit only swaps the rows of the runs and symmetry pairs
+that changed, and the model is re-optimized from the last solution. The
+connectivity cuts only depend on the grid, so they stay valid after every
+edit. Backends that can not remove constraints rebuild the model instead,
+with the cuts found so far.
+"""
+import os
+import threading
+import time
+import uuid
+from collections import OrderedDict
+
+from solver.backends import get_backend
+from solver.separation import find_violations
+from solver.solver import Solver
+from solver.utils import BackendError, InvalidInputError
+
+SOLVE_SESSION_TTL = float(os.getenv('SOLVE_SESSION_TTL', '1800'))
+SOLVE_SESSIONS_KEPT = int(os.getenv('SOLVE_SESSIONS_KEPT', '64'))
+
+
+def edit_rooms(coordinates, symbols=None, merges=()):
+    """
+    Apply an edit to the rooms of a puzzle.
+
+    Args:
+        coordinates: The rooms, as in Condition.coordinates.
+        symbols: The new symbol of rooms by index, '' clears it.
+        merges: Pairs of room indexes, the second room joins the first one
+            and loses its symbol. Indexes refer to the rooms before the edit.
+
+    Returns:
+        The edited rooms, without the merged ones.
+
+    Raises:
+        InvalidInputError: If an index does not refer to a room.
+    """
+    rooms = [dict(room) for room in coordinates]
+
+    def check(index):
+        if not 0 <= index < len(rooms):
+            raise InvalidInputError(f"There is no room {index}")
+        return index
+
+    for index, symbol in (symbols or {}).items():
+        room = rooms[check(index)]
+        for k, cell in enumerate(room):
+            room[cell] = symbol if k == 0 else ''
+
+    owner = list(range(len(rooms)))
+
+    def find(index):
+        while owner[index] != index:
+            index = owner[index]
+        return index
+
+    for first, second in merges:
+        first, second = find(check(first)), find(check(second))
+        if first != second:
+            rooms[first].update({cell: '' for cell in rooms[second]})
+            rooms[second] = {}
+            owner[second] = first
+    return [room for room in rooms if room]
+
+
+class SolveSession:
+    """A puzzle with its model, its connectivity cuts and its last solution"""
+
+    def __init__(self, coordinates, backend='auto'):
+        self.id = uuid.uuid4().hex
+        self.solver = Solver(coordinates, backend=backend)
+        self.coordinates = [dict(room) for room in coordinates]
+        self.backends = [name for name in self.solver.backend_names()
+                         if not get_backend(name).native]
+        if not self.backends:
+            raise ValueError("Sessions need a MIP backend, e.g. 'gurobi' or 'cpsat'.")
+        self.model = None
+        self.black_vars = {}
+        self.rows = {}  # Constraints of the runs and symmetry pairs, by kind and cells
+        self.white = set()  # Cells whose mirror forces them white
+        self.cuts = {}  # Connectivity cut pool, by sorted cells
+        self.black = None  # Black cells of the last solution
+        self.result = []
+        self.edits = 0
+        self.rows_changed = 0
+        self.node_count = 0
+        self.runtime = 0.0
+        self.closed = False
+        # a session is solved by one worker at a time
+        self.lock = threading.Lock()
+
+    def open_model(self):
+        """Build the model on the first backend that can be started, with the cut pool"""
+        while self.model is None:
+            try:
+                self.model = get_backend(self.backends[0]).dedicated()
+            except BackendError:
+                if len(self.backends) == 1:
+                    raise
+                self.backends.pop(0)
+        variables = self.solver.matrix_block(self.model)
+        self.model.tune(self.solver.length)
+        length = self.solver.length
+        self.black_vars = {(i, j): variables[i * length + j]
+                           for i in range(length) for j in range(length)}
+        for cut in self.cuts:
+            self.add_cut(cut)
+        self.rows, self.white = {}, set()
+        self.update_rows()
+
+    def close_model(self):
+        """Free the model, the cut pool and the last solution are kept"""
+        if self.model is not None:
+            self.model.dispose()
+            self.model = None
+
+    def add_cut(self, cut):
+        """Add a connectivity cut to the model"""
+        m = self.model
+        m.add_constr(m.quicksum(self.black_vars[cell] for cell in cut) <= len(cut) - 1)
+
+    def add_row(self, key):
+        """Add the constraint of a run or a symmetry pair"""
+        m = self.model
+        kind, cells = key
+        variables = [self.black_vars[cell] for cell in cells]
+        if kind == 'run':
+            return m.add_constr(m.quicksum(variables) >= 1)
+        if kind == 'equal':
+            return m.add_constr(variables[0] == variables[1])
+        return m.add_constr(variables[0] + variables[1] <= 1)
+
+    def update_rows(self):
+        """Swap the rows of the runs and symmetry pairs that changed since the last update"""
+        equal, exclusive, white = self.solver.symmetry_pairs()
+        rows = {('run', tuple(run)) for run in self.solver.orthogonal_runs()}
+        rows.update(('equal', pair) for pair in equal)
+        rows.update(('exclusive', pair) for pair in exclusive)
+        stale = [key for key in self.rows if key not in rows]
+        if stale:
+            self.model.remove_constrs([self.rows.pop(key) for key in stale])
+        added = rows - self.rows.keys()
+        for key in added:
+            self.rows[key] = self.add_row(key)
+        for cell in self.white - white:
+            self.model.set_bounds(self.black_vars[cell], 0, 1)
+        for cell in white - self.white:
+            self.model.set_bounds(self.black_vars[cell], 0, 0)
+        self.rows_changed = len(stale) + len(added) + len(self.white ^ white)
+        self.white = white
+
+    def edit(self, symbols=None, merges=()):
+        """
+        Change room symbols and merge rooms, see edit_rooms.
+
+        Raises:
+            InvalidInputError: If the edit does not lead to a valid puzzle,
+                the session is left unchanged.
+        """
+        coordinates = edit_rooms(self.coordinates, symbols, merges)
+        solver = Solver(coordinates, backend=self.solver.backend)
+        self.solver, self.coordinates = solver, coordinates
+        self.edits += 1
+        if self.model is None:
+            return
+        if self.model.incremental:
+            self.update_rows()
+        else:
+            self.close_model()
+
+    def solve(self, time_limit=None):
+        """
+        Re-optimize the model from the last solution.
+
+        Returns:
+            The result matrix, or [] if the puzzle has no solution.
+
+        Raises:
+            SolveTimeoutError: If time_limit seconds pass before the solve is done.
+        """
+        found_cuts = []
+
+        def separate(black):
+            walls, loops = find_violations(black, self.solver.length, minimal=True)
+            found_cuts.extend(walls + loops)
+            return walls + loops
+
+        while True:
+            if self.model is None:
+                self.open_model()
+            if self.black is not None:
+                self.model.set_start(self.black_vars, self.black)
+            try:
+                found = self.model.optimize(self.black_vars, separate, time_limit=time_limit)
+                break
+            except BackendError:
+                # e.g. gurobi's size-limited license, the next backend starts from the cut pool
+                if len(self.backends) == 1:
+                    raise
+                self.close_model()
+                self.backends.pop(0)
+            finally:
+                self.keep_cuts(found_cuts)
+                found_cuts.clear()
+
+        stats = self.model.get_stats()
+        self.node_count, self.runtime = stats["node_count"], stats["runtime"]
+        if not found:
+            self.result = []
+            return self.result
+        self.black = [cell for cell, var in self.black_vars.items()
+                      if self.model.value(var) > 0.5]
+        self.result = self.solver.set_black_cells(self.black)
+        return self.result
+
+    def keep_cuts(self, cuts):
+        """Add new cuts to the pool and, unless the backend keeps them, to the model"""
+        for cut in cuts:
+            key = tuple(sorted(cut))
+            if key in self.cuts:
+                continue
+            self.cuts[key] = None
+            if self.model is not None and not self.model.keeps_cuts:
+                self.add_cut(key)
+
+    def update(self, symbols=None, merges=(), time_limit=None):
+        """Apply an edit, if any, and solve, one worker at a time"""
+        with self.lock:
+            try:
+                if symbols or merges:
+                    self.edit(symbols, merges)
+                return self.solve(time_limit)
+            finally:
+                if self.closed:
+                    self.close_model()
+
+    def close(self):
+        """Free the model, at once or when the running solve ends"""
+        self.closed = True
+        if self.lock.locked():
+            # update closes the model when its solve ends
+            return
+        with self.lock:
+            self.close_model()
+
+    def to_dict(self):
+        """Get the rooms, the last solution and the statistics of the session"""
+        return {
+            "id": self.id,
+            "coordinates": self.coordinates,
+            "solution": self.result,
+            "stats": {
+                "backend": self.backends[0],
+                "edits": self.edits,
+                "rows_changed": self.rows_changed,
+                "cuts": len(self.cuts),
+                "node_count": self.node_count,
+                "runtime": self.runtime,
+            },
+        }
+
+
+class SessionRegistry:
+    """In-process sessions, dropped after ttl idle seconds or least recently used first"""
+
+    def __init__(self, maxsize=SOLVE_SESSIONS_KEPT, ttl=SOLVE_SESSION_TTL, clock=time.monotonic):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.clock = clock
+        self.sessions = OrderedDict()
+
+    def add(self, session):
+        """Register a session, dropping the idle and the least recently used ones"""
+        self.sessions[session.id] = (self.clock(), session)
+        self.evict()
+        return session
+
+    def get(self, session_id):
+        """Get a session by id and mark it used, or None"""
+        self.evict()
+        entry = self.sessions.get(session_id)
+        if entry is None:
+            return None
+        self.sessions[session_id] = (self.clock(), entry[1])
+        self.sessions.move_to_end(session_id)
+        return entry[1]
+
+    def remove(self, session_id):
+        """Drop a session, returns whether it existed"""
+        entry = self.sessions.pop(session_id, None)
+        if entry is not None:
+            entry[1].close()
+        return entry is not None
+
+    def evict(self):
+        """Drop the sessions idle for more than ttl seconds and the ones above maxsize"""
+        now = self.clock()
+        expired = [session_id for session_id, (used, _) in self.sessions.items()
+                   if now - used > self.ttl]
+        for session_id in expired:
+            self.remove(session_id)
+        while len(self.sessions) > self.maxsize:
+            self.remove(next(iter(self.sessions)))
+
+    def clear(self):
+        """Drop every session"""
+        for session_id in list(self.sessions):
+            self.remove(session_id)
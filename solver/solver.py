@@ -1,30 +1,79 @@
 """Solver class for this task"""
 
+import itertools
+import time
+from contextlib import closing
 from typing import Any
 
-from gurobipy.gurobipy import Model
-from gurobipy import GRB, quicksum
+import numpy as np
+from scipy import sparse
 
-from solver.utils import ValueInput, build_matrix, Region, WHITE, GREY, BLACK, InvalidInputError
+from solver.backends import BACKENDS, MAX_SIZE, get_backend
+from solver.compact import CompactPuzzle
+from solver.cutpool import CUT_POOL
+from solver.heuristic import greedy_start
+from solver.presolve import Contradiction, Presolver
+from solver.separation import UnionFind, find_violations
+from solver.utils import (Grid, build_matrix, BLACK, EAST, SOUTH, InvalidInputError, BackendError,
+                          SolveTimeoutError)
+
+NATIVE_NODE_LIMIT = 20000
 
 
 class Solver:
     """Solver class"""
 
-    def __init__(self, input_matrix=None):
+    def __init__(self, input_matrix=None, multi_cut=False, presolve=False, backend='auto',
+                 progress=None, unique=False, build='loop', warm_start=False, cut_pool=False,
+                 profile=None):
         if input_matrix is None:
             input_matrix = []
-        self.boundary_cells = 0
-        self.visited_black_cells = []
-        self.visited_cells = []
-
-        ##################################
+        # called with a dictionary for every progress event of a solve
+        self.progress = progress
+        # name of a registered backend, 'auto' tries them in order
+        self.backend = backend
+        self.backend_used = ''
+        # add every violated wall/loop cut per incumbent instead of the first one
+        self.multi_cut = multi_cut
+        # fix the cells forced by the rules before building the model
+        self.use_presolve = presolve
+        if build not in ('loop', 'matrix', 'tight'):
+            raise ValueError("The model build must be 'loop', 'matrix' or 'tight'.")
+        # 'matrix' assembles the model as sparse matrices and adds it in bulk,
+        # 'tight' does the same with pairwise adjacency and merged 'S' pairs
+        self.build = build
+        # guess a MIP start with the greedy heuristic when none is given
+        self.warm_start = warm_start
+        self.warm_started = False
+        # seed the model with the cuts most violated by earlier puzzles of the same size
+        # and record the cuts found, see solver.cutpool
+        self.cut_pool = cut_pool
+        self.seeded_cuts = 0
+        # backend parameters, by default the profile stored for the grid size
+        self.profile = profile
+        # look for a second solution to prove that the first one is unique
+        self.unique = unique
+        self.is_unique = None
+        self.witness = None  # A second solution, found in unique mode
+        self.presolved_cells = 0
         self.lazy_constraints_added = 0
-        self.grid_inputs: dict[Any, Any] = {}  # Dictionary of inp objects
+        self.callbacks = 0  # Number of incumbents checked in the callback
+        self.node_count = 0
+        self.runtime = 0.0
+        self.deadline = None  # time.monotonic() by which the current solve must end
+        self.cancelled = False  # set by cancel, ends the current and later solves
+        self.model = None  # Backend of the running optimization, stopped by cancel
+        self.grid = Grid(0)  # Colour, region, walls and symbol of every cell
         self.length = 0  # Grid dimension
 
-        self.regions = []  # List of Region objects
-        self.init_regions(input_matrix)
+        self.regions = []  # List of Region views of the grid
+        self.region_ids = []  # region_ids[x][y] is the index of the region of a cell
+        self.south_run_ends = []  # south_run_ends[x][y] is the last y of the run south of a cell
+        self.east_run_ends = []  # east_run_ends[y][x] is the last x of the run east of a cell
+        if isinstance(input_matrix, CompactPuzzle):
+            self.init_compact(input_matrix)
+        else:
+            self.init_regions(input_matrix)
 
     def cell_neigh(self, cell):
         """Return a list of neighbouring cells"""
@@ -42,128 +91,115 @@ class Solver:
 
     def vert_neigh(self, cell):
         """Return a list of vertically connected cells"""
-        neighbours = []
-        regions = []
-        for i in range(cell[1], self.length):
-            neighbours.append((cell[0], i))
-            for region in self.regions:
-                if (cell[0], i) in region.get_pos():
-                    if region not in regions:
-                        regions.append(region)
-                    if len(regions) >= 3:
-                        return neighbours
-        return False
-
-    # Iterate east until a string of cells has been collected that spans exactly 3 regions.
+        x, y = cell
+        end = self.south_run_ends[x][y]
+        if end is None:
+            return False
+        return [(x, k) for k in range(y, end + 1)]
+
+    # The run east of a cell is the shortest string of cells spanning exactly 3 regions.
     # Otherwise, return False
     def hor_neigh(self, cell):
         """Return a list of horizontally connected cells"""
-        neighbours = []
-        regions = []
-        for i in range(cell[0], self.length):
-            neighbours.append((i, cell[1]))
-            for region in self.regions:
-                if (i, cell[1]) in region.get_pos():
-                    if region not in regions:
-                        regions.append(region)
-                    if len(regions) >= 3:
-                        return neighbours
-        return False
-
-    def diagonal_neighbours(self, cell):
-        """Return a list of diagonally connected cells"""
-        neighbours = []
-        i, j = cell
-        if i - 1 >= 0 and j - 1 >= 0:
-            neighbours.append((i - 1, j - 1))
-        if i - 1 >= 0 and j + 1 <= self.length - 1:
-            neighbours.append((i - 1, j + 1))
-        if i + 1 <= self.length - 1 and j + 1 <= self.length - 1:
-            neighbours.append((i + 1, j + 1))
-        if i + 1 <= self.length - 1 and j - 1 >= 0:
-            neighbours.append((i + 1, j - 1))
-        return neighbours
-
-    def follow_black_cells_loop(self, prev_cell, cell, xv):
-        """Follow black cells to find a loop"""
-        if cell in self.visited_cells:
-            return
-        self.visited_cells.append(cell)
-        self.visited_black_cells.append(cell)
-        loop_found = None
-        for (i, j) in self.diagonal_neighbours(cell):
-            if xv[(i, j, 1)] > 0.9:  # if the neighbouring cell is black
-                # If the neighbouring cell is NOT the previous cell, but it has been visited,
-                # then we have found a loop
-                if (i, j) != prev_cell and (i, j) in self.visited_cells:
-                    loop_found = True
-                    return
-                if not loop_found:
-                    self.follow_black_cells_loop(cell, (i, j), xv)
-
-    # Iterate through all diagonally connected black cells.
-    # If two distinct boundary points have been found,
-    # then an impenetrable black wall has been found.
-    def follow_black_cells(self, cell, xv):
-        """Follow black cells to find a wall"""
-        if cell in self.visited_cells:
-            return
-        if (cell[0] == 0 or cell[0] == self.length - 1 or cell[1] == 0
-                or cell[1] == self.length - 1):  # If cell on boundary
-            self.boundary_cells += 1
-        self.visited_cells.append(cell)
-        self.visited_black_cells.append(cell)
-        if self.boundary_cells > 1:
-            return
-        for (i, j) in self.diagonal_neighbours(cell):
-            if xv[(i, j, 1)] > 0.9:
-                self.follow_black_cells((i, j), xv)
-
-    def purge_trails(self, loop_mode):
-        """Purge trailing points"""
-        trail_exists = True
-        while trail_exists:
-            trail_exists = False
-            for cell in self.visited_cells:
-                if not loop_mode:
-                    # If on boundary, don't count as endpoint
-                    if (cell[0] == 0 or cell[0] == self.length - 1 or
-                            cell[1] == 0 or cell[1] == self.length - 1):
-                        continue
-                neighbours = self.diagonal_neighbours(cell)
-                if len(set(self.visited_cells).intersection(neighbours)) == 1:  # Found an endpoint
-                    trail_exists = True
-                    self.visited_cells.remove(cell)
+        x, y = cell
+        end = self.east_run_ends[y][x]
+        if end is None:
+            return False
+        return [(k, y) for k in range(x, end + 1)]
+
+    @staticmethod
+    def run_ends(region_ids):
+        """
+        Find the end of the shortest run spanning 3 regions from every start of a line.
+
+        Both ends only move forward, so the whole line is one sweep.
+
+        Args:
+            region_ids: The region id of every cell of a row or column, None for no region.
+
+        Returns:
+            A list of the index of the last cell of the run from every start, or None.
+        """
+        ends = [None] * len(region_ids)
+        counts = {}
+        end = -1
+        for start, region_id in enumerate(region_ids):
+            while len(counts) < 3 and end + 1 < len(region_ids):
+                end += 1
+                if region_ids[end] is not None:
+                    counts[region_ids[end]] = counts.get(region_ids[end], 0) + 1
+            if len(counts) == 3:
+                ends[start] = end
+            if region_id is not None:
+                counts[region_id] -= 1
+                if not counts[region_id]:
+                    del counts[region_id]
+        return ends
+
+    def index_regions(self):
+        """Build the cell-to-region id array and the run tables of every row and column"""
+        columns = self.grid.region.reshape(self.length, self.length).tolist()
+        self.region_ids = [[None if region_id < 0 else region_id for region_id in column]
+                           for column in columns]
+        self.index_runs()
+
+    def index_runs(self):
+        """Build the run tables of every row and column from the region ids"""
+        self.south_run_ends = [self.run_ends(column) for column in self.region_ids]
+        self.east_run_ends = [
+            self.run_ends([self.region_ids[x][y] for x in range(self.length)])
+            for y in range(self.length)]
+
+    def check_length(self, max_x, max_y):
+        """Check that the largest coordinates make a square grid the backend accepts"""
+        if max_x != max_y:
+            raise InvalidInputError(
+                "The amount of rows and columns of the matrix are not equal")
+        max_size = self.max_size()
+        if max_x < 1 or max_x >= max_size:
+            raise InvalidInputError(
+                f"The amount of rows and columns must be between 2 and {max_size}")
+
+    def init_compact(self, puzzle):
+        """Initialize regions from a CompactPuzzle, the region ids are used as they are"""
+        length = puzzle.regions.shape[0]
+        self.check_length(length - 1, length - 1)
+        self.length = length
+        # renumber the ids to 0..n-1 in increasing order
+        _, labels = np.unique(puzzle.regions, return_inverse=True)
+        labels = labels.ravel()
+
+        symbols = {}
+        for cell, symbol in puzzle.symbols.items():
+            y, x = divmod(cell, length)
+            symbols[x * length + y] = symbol
+        # cells grouped by region, each group in row-major order
+        order = np.argsort(labels, kind='stable')
+        bounds = np.searchsorted(labels[order], np.arange(labels.max() + 2))
+        y, x = np.divmod(order, length)
+        self.grid = Grid(length, x * length + y, bounds, symbols)
+        self.regions = self.grid.regions()
+        self.index_regions()
 
     def init_regions(self, regions):
         """Initialize regions"""
         max_x, max_y = [0, 0]
         missing_coordinates = []
-        all_keys = set()
-
-        # Accumulate all keys
-        for x in regions:
-            all_keys.update(x.keys())
+        # every key is parsed once
+        parsed = {}
 
-        # Calculate max_x and max_y
-        for coord in all_keys:
-            x, y = map(int, coord.split(','))
-            max_x = max(max_x, x)
-            max_y = max(max_y, y)
-
-        if max_x != max_y:
-            raise InvalidInputError(
-                "The amount of rows and columns of the matrix are not equal")
-        # too big number would make the model too complex for
-        # gurobi to solve in free version
-        if max_x < 1 or max_x >= 23:
-            raise InvalidInputError(
-                "The amount of rows and columns must be between 2 and 23")
+        for region in regions:
+            for coord in region:
+                if coord not in parsed:
+                    parsed[coord] = x, y = tuple(map(int, coord.split(',')))
+                    max_x = max(max_x, x)
+                    max_y = max(max_y, y)
+        self.check_length(max_x, max_y)
 
         # Check for missing coordinates
         for x in range(max_x):
             for y in range(max_y):
-                if f"{x},{y}" not in all_keys:
+                if f"{x},{y}" not in parsed:
                     missing_coordinates.append((x, y))
 
         if len(missing_coordinates) > 0:
@@ -171,51 +207,87 @@ class Solver:
                 "Some regions are not filled", missing_coordinates)
 
         self.length = max_x + 1
+        groups = []
+        symbols = {}
         for region in regions:
-            region_symbol = ''
-            grid_inputs = []
+            cells = []
             for coord, symbol in region.items():
-                x, y = map(int, coord.split(','))
+                x, y = parsed[coord]
                 if symbol not in ('', 'S', 'A'):
                     raise ValueError(
                         "Invalid value in coordinates, must be empty string or 'S'/'A'.")
-
-                grid_input_obj = ValueInput(x, y, GREY)
-                self.grid_inputs[(x, y)] = grid_input_obj
-                grid_inputs.append(grid_input_obj)
+                cells.append(x * self.length + y)
                 if symbol:
-                    grid_input_obj.symbol = symbol
-                    region_symbol = symbol
-            region_obj = Region(grid_inputs, region_symbol)
-            self.regions.append(region_obj)
-            region_obj.group_grid_inputs()
+                    symbols[cells[-1]] = symbol
+            groups.append(cells)
+        self.grid = Grid.from_groups(self.length, groups, symbols)
+        self.regions = self.grid.regions()
+        self.index_regions()
+
+    def run_constraints(self, m, x):
+        """A black cell in every vertical and horizontal run spanning 3 regions"""
+        for neighbours in self.orthogonal_runs():
+            m.add_constr(m.quicksum(x[ii, jj, 1] for (ii, jj) in neighbours) >= 1)
+
+    def orthogonal_runs(self):
+        """Return the vertical and horizontal runs of cells spanning 3 regions"""
+        runs = []
+        cells = self.grid.cells()
+        walls = self.grid.walls[cells]
+        for flag, neigh in ((SOUTH, self.vert_neigh), (EAST, self.hor_neigh)):
+            for cell in cells[walls & flag != 0].tolist():
+                neighbours = neigh(divmod(cell, self.length))
+                if neighbours:
+                    runs.append(neighbours)
+        return runs
 
-    def one_ort_and_vert(self, m, x):
-        """One, orthogonal and vertical constraints"""
+    def symmetry_pairs(self):
+        """
+        Return the cell pairs linked by 'S' and 'A' regions.
 
-        # select one constraint
-        for (i, j), _ in self.grid_inputs.items():
-            [black_1, white_1] = [x[i, j, 0], x[i, j, 1]]
-            one_constraint = black_1 + white_1 == 1
-            m.addConstr(one_constraint, name='one constraint')
-
-        vert_orthogonal = {}
-        for (i, j), inp in self.grid_inputs.items():
-            if inp.south:
-                neighbours = self.vert_neigh(inp.get_pos())
-                if neighbours:
-                    vert_orthogonal[(i, j)] = m.addConstr(
-                        quicksum(x[ii, jj, 1]
-                                 for (ii, jj) in neighbours) >= 1)
-
-        hor_orthogonal = {}
-        for (i, j), inp in self.grid_inputs.items():
-            if inp.east:
-                neighbours = self.hor_neigh(inp.get_pos())
-                if neighbours:
-                    hor_orthogonal[(i, j)] = m.addConstr(
-                        quicksum(x[ii, jj, 1]
-                                 for (ii, jj) in neighbours) >= 1)
+        Mirrors the constraints of region_constraints: 'S' pairs must be equal,
+        'A' pairs must not both be black, and a cell whose mirror lies outside
+        an 'S' region, or is the cell itself in an 'A' region, must be white.
+
+        Returns:
+            A (equal_pairs, exclusive_pairs, white_cells) tuple.
+        """
+        equal, exclusive, white = set(), set(), set()
+        for region in self.regions:
+            if not region.symbol:
+                continue
+            cells = set(region.get_pos())
+            min_x = min(cell[0] for cell in cells)
+            max_x = max(cell[0] for cell in cells)
+            min_y = min(cell[1] for cell in cells)
+            max_y = max(cell[1] for cell in cells)
+            for cell in cells:
+                mirror = (min_x + max_x - cell[0], min_y + max_y - cell[1])
+                if region.symbol == 'S':
+                    if mirror not in cells:
+                        white.add(cell)
+                    elif cell < mirror:
+                        equal.add((cell, mirror))
+                elif mirror == cell:
+                    white.add(cell)
+                elif mirror in cells and cell < mirror:
+                    exclusive.add((cell, mirror))
+        return equal, exclusive, white
+
+    def presolve(self):
+        """
+        Fix the cells forced by the rules before the model is built.
+
+        Returns:
+            A dictionary of fixed cells and their colours,
+            or None if the rules show that there is no solution.
+        """
+        equal, exclusive, white = self.symmetry_pairs()
+        try:
+            return Presolver(self.length, self.orthogonal_runs(),
+                             equal, exclusive, white).run()
+        except Contradiction:
+            return None
 
     def region_constraints(self, m, x):
         """Region constraints"""
@@ -231,7 +303,7 @@ class Solver:
                         for j, _ in enumerate(matrix[0]):
                             [v1, v2] = [matrix[i][j], m_reversed[i][j]]
                             constraint: Any = v1 == v2
-                            m.addConstr(constraint,
+                            m.add_constr(constraint,
                                         name='compare_' + str(i) + '_' + str(j))
 
                 if region.symbol == 'A':
@@ -239,109 +311,480 @@ class Solver:
                         for j, _ in enumerate(matrix[0]):
                             [v1, v2] = [matrix[i][j], m_reversed[i][j]]
                             constraint = v1 + v2 <= 1
-                            m.addConstr(
+                            m.add_constr(
                                 constraint, name='not_equal_' + str(i) + '_' + str(j))
 
-    def solve(self):
-        """Matrix solver"""
+    def solve(self, time_limit=None, start=None):
+        """
+        Matrix solver
+
+        Args:
+            time_limit: Seconds after which the solve is stopped.
+            start: Black (x, y) cells of a guessed solution, e.g. the solution of a
+                similar puzzle, passed to the MIP backends as a start.
+
+        Raises:
+            SolveTimeoutError: If time_limit seconds pass before the solve is done.
+        """
+        self.is_unique = None
+        self.witness = None
+        # a second solution refutes uniqueness
+        solutions = self.black_cell_solutions(time_limit, start)
+        try:
+            found = list(itertools.islice(solutions, 2 if self.unique else 1))
+        finally:
+            # ends the enumeration, e.g. records its cuts
+            solutions.close()
+        if not found:
+            self.is_unique = False
+            return []
+        if self.unique:
+            self.is_unique = len(found) == 1
+            self.witness = self.set_black_cells(found[1]) if len(found) == 2 else None
+        # upd current solution in grid_inputs
+        return self.set_black_cells(found[0])
+
+    def iter_solutions(self, limit=None, time_limit=None):
+        """
+        Yield the result matrix of every solution, at most limit of them.
+
+        Solutions are found one at a time, each with a no-good cut excluding
+        the ones before, so the whole set is never held in memory.
+
+        Raises:
+            SolveTimeoutError: If time_limit seconds pass before the enumeration is done.
+        """
+        for black_cells in itertools.islice(self.black_cell_solutions(time_limit), limit):
+            yield self.set_black_cells(black_cells)
+
+    def black_cell_solutions(self, time_limit=None, start=None):
+        """
+        Yield the black (x, y) cells of every solution, trying the backends in order.
+
+        A backend is only left for the next one before it finds a solution,
+        so no solution is yielded twice.
+        """
+        self.deadline = None if time_limit is None else time.monotonic() + time_limit
+        if self.cancelled or time_limit is not None and time_limit <= 0:
+            raise SolveTimeoutError("Solve time limit exceeded")
+        self.presolved_cells = 0
+        self.warm_started = False
+        self.seeded_cuts = 0
+        self.grid.set_colours()
+
+        fixed = {}
+        if self.use_presolve:
+            fixed = self.presolve()
+            if fixed is None:
+                return
+            self.presolved_cells = len(fixed)
+
+        names = self.backend_names()
+        for k, name in enumerate(names):
+            yielded = False
+            try:
+                engine = get_backend(name)
+                self.notify("backend", backend=name)
+                solutions = (self.native_solutions(engine, fixed) if engine.native
+                             else self.model_solutions(engine(), fixed, start))
+                # a closed enumeration closes the one of the backend
+                with closing(solutions):
+                    for black_cells in solutions:
+                        yielded = True
+                        yield black_cells
+                return
+            except BackendError:
+                # fall back to the next backend, e.g. on gurobi's size-limited license
+                if yielded or k == len(names) - 1:
+                    raise
+
+    def backend_names(self):
+        """Return the names of the backends to try, in order"""
+        if self.backend != 'auto':
+            return [self.backend]
+        names = []
+        for name in BACKENDS:
+            try:
+                if get_backend(name).max_size >= self.length:
+                    names.append(name)
+            except BackendError:
+                continue
+        return names
+
+    def max_size(self):
+        """Return the largest grid dimension accepted by the selected backend"""
+        if self.backend != 'auto':
+            return get_backend(self.backend).max_size
+        # the fallback reaches the backend accepting the largest grids
+        sizes = []
+        for name in BACKENDS:
+            try:
+                sizes.append(get_backend(name).max_size)
+            except BackendError:
+                continue
+        return max(sizes, default=MAX_SIZE)
+
+    def native_solutions(self, engine, fixed):
+        """Enumerate the solutions of small grids with a native engine, e.g. the bitboard search"""
+        self.backend_used = engine.name
         self.lazy_constraints_added = 0
-        for inp in self.grid_inputs.values():
-            inp.default_colour = GREY
-
-        m = Model("Solver")
-        m.Params.LogToConsole = 0
-        x = {
-            (i, j, col): m.addVar(vtype=GRB.BINARY, obj=0, ub=1, lb=0, name="var", column=None)
-            for (i, j), _ in self.grid_inputs.items() for col in
-            [0, 1]
-        }
+        self.callbacks = 0
+        # propagation is cheap next to the search, so it always runs here
+        fixed = fixed or self.presolve()
+        if fixed is None:
+            return
+        equal, exclusive, white = self.symmetry_pairs()
+        # in auto mode hard searches are left to the MIP backends
+        node_limit = NATIVE_NODE_LIMIT if self.backend == 'auto' else None
+        search = engine(self.length, self.orthogonal_runs(), equal, exclusive, white, fixed,
+                        node_limit=node_limit, time_limit=self.time_left())
+        self.runtime = 0.0
+        start = time.perf_counter()
+        for black in search.solutions():
+            self.runtime += time.perf_counter() - start
+            self.node_count = search.nodes
+            yield search.cells(black)
+            start = time.perf_counter()
+        self.runtime += time.perf_counter() - start
+        self.node_count = search.nodes
+
+    def loop_variables(self, variables):
+        """Map the variables of loop_block to (i, j, colour) keys, 0 white and 1 black"""
+        return {(i, j, col): variables[2 * (i * self.length + j) + col]
+                for i in range(self.length) for j in range(self.length) for col in (0, 1)}
+
+    def loop_block(self, m):
+        """Add the white and black variables and the rows that only depend on the grid size"""
+        size = self.length * self.length
+        variables = m.add_vars(np.zeros(2 * size), np.ones(2 * size))
+        x = self.loop_variables(variables)
+        cells = [(i, j) for i in range(self.length) for j in range(self.length)]
 
-        self.region_constraints(m, x)
+        # select one constraint
+        for i, j in cells:
+            m.add_constr(x[i, j, 0] + x[i, j, 1] == 1, name='one constraint')
 
-        # AdjacentBlack
-        _ = [m.addConstr(
-            quicksum(x[ii, jj, 1] for (ii, jj) in self.cell_neigh(
-                (i, j))) <= len(self.cell_neigh((i, j))) * (1 - x[i, j, 1]))
-             for (i, j), _ in self.grid_inputs.items()]
+        # ConnectedAtLeast
+        for i, j in cells:
+            m.add_constr(m.quicksum(x[ii, jj, 0] for (ii, jj) in self.cell_neigh((i, j)))
+                         >= x[i, j, 0])
 
-        self.one_ort_and_vert(m, x)
+        # AdjacentBlack
+        for i, j in cells:
+            neighbours = self.cell_neigh((i, j))
+            m.add_constr(m.quicksum(x[ii, jj, 1] for (ii, jj) in neighbours)
+                         <= len(neighbours) * (1 - x[i, j, 1]))
+        return variables
+
+    def build_model(self, m, fixed):
+        """
+        Add a white and a black variable per cell and the constraints one by one.
+
+        The variables and the rows that only depend on the grid size are
+        copied from a template of the backend, when it keeps one.
+
+        Returns:
+            A dictionary of the black variable of every cell.
+        """
+        x = self.loop_variables(m.cached_block(('loop', self.length), self.loop_block))
+        # pass the presolved cells as bounds, the backend presolve removes them
+        for (i, j), colour in fixed.items():
+            black = 1 if colour == BLACK else 0
+            m.set_bounds(x[i, j, 1], black, black)
+            m.set_bounds(x[i, j, 0], 1 - black, 1 - black)
 
-        # ConnectedAtLeast
-        _ = [
-            m.addConstr(quicksum(x[ii, jj, 0] for (
-                ii, jj) in self.cell_neigh((i, j))) >= x[i, j, 0])
-            for (i, j), _ in self.grid_inputs.items()]
-
-        def callback(model, where):
-            if where == GRB.callback.MIPSOL:
-
-                xv = dict(zip(x.keys(), model.cbGetSolution(list(x.values()))))
-
-                # upd current solution in grid_inputs
-                for (i, j), grid_input_new in self.grid_inputs.items():
-                    if xv[(i, j, 1)] > 0.9:
-                        grid_input_new.default_colour = BLACK
-                    else:
-                        grid_input_new.default_colour = WHITE
-
-                self.visited_black_cells = []
-                for k in xv:
-                    # If cell on boundary
-                    if k[0] in [0, self.length - 1] or k[1] in [0, self.length - 1]:
-                        # If cell is black and hasn't been checked yet
-                        if (xv[(k[0], k[1], 1)] > 0.9 and (k[0], k[1])
-                                not in self.visited_black_cells):
-                            self.boundary_cells = 0
-                            self.visited_cells = []
-                            self.follow_black_cells((k[0], k[1]), xv)
-                            if self.boundary_cells > 1:
-                                # PURGE TRAILING POINTS:
-                                self.purge_trails(loop_mode=False)
-
-                                self.lazy_constraints_added += 1
-                                model.cbLazy(quicksum(x[(i, j, 1)] for (
-                                    i, j) in self.visited_cells) <= len(self.visited_cells) - 1)
-                                break
-
-                self.visited_black_cells = []
-                for k in xv:
-                    # If cell is black and hasn't been checked yet
-                    if xv[(k[0], k[1], 1)] > 0.9 and (k[0], k[1]) not in self.visited_black_cells:
-                        loop_found = False
-                        self.visited_cells = []
-                        self.follow_black_cells_loop(0, (k[0], k[1]), xv)
-                        if loop_found:
-                            # PURGE TRAILING POINTS:
-                            self.purge_trails(loop_mode=True)
-
-                            self.lazy_constraints_added += 1
-                            model.cbLazy(quicksum(x[(i, j, 1)] for (
-                                i, j) in self.visited_cells) <= len(self.visited_cells) - 1)
-                            break
-
-        m.setParam('LazyConstraints', 1)
-        m.optimize(callback)
-        if m.status != 2:
-            return []
+        self.region_constraints(m, x)
+        self.run_constraints(m, x)
+        return {(i, j): x[i, j, 1] for i in range(self.length) for j in range(self.length)}
+
+    def matrix_block(self, m):
+        """Add the black variables and the neighbour rows, which only depend on the grid size"""
+        size = self.length * self.length
+        variables = m.add_vars(np.zeros(size), np.ones(size))
+        matrix, sense, rhs = self.neighbour_matrix()
+        m.add_matrix_constrs(matrix, variables, sense, rhs)
+        return variables
+
+    def build_matrix_model(self, m, fixed):
+        """
+        Add a single black variable per cell and the constraints in bulk.
+
+        The white variable of the loop build is 1 - black, so the model has
+        the same solutions with half the variables and no linking rows.
+
+        Returns:
+            A dictionary of the black variable of every cell.
+        """
+        variables = m.cached_block(('matrix', self.length), self.matrix_block)
+        equal, exclusive, white = self.symmetry_pairs()
+        for i, j in white:
+            m.set_bounds(variables[i * self.length + j], 0, 0)
+        for (i, j), colour in fixed.items():
+            black = 1 if colour == BLACK else 0
+            m.set_bounds(variables[i * self.length + j], black, black)
+        matrix, sense, rhs = self.region_matrix(equal, exclusive)
+        m.add_matrix_constrs(matrix, variables, sense, rhs)
+        return {(i, j): variables[i * self.length + j]
+                for i in range(self.length) for j in range(self.length)}
+
+    def build_tight_model(self, m, fixed):
+        """
+        Add one variable per cell, or per 'S' pair, and the tight constraints in bulk.
+
+        Compared to the matrix build, adjacent cells get a pairwise
+        b_i + b_j <= 1 row instead of the big-M row of the cell, whose LP
+        relaxation is weaker, and cells of an 'S' pair share one variable
+        instead of being linked by an equality.
+
+        Returns:
+            A dictionary of the black variable of every cell.
+        """
+        length = self.length
+        size = length * length
+        equal, exclusive, white = self.symmetry_pairs()
+        classes = UnionFind(size)
+        for (i, j), (ii, jj) in equal:
+            classes.union(i * length + j, ii * length + jj)
+        roots = [classes.find(cell) for cell in range(size)]
+        column_of = {root: k for k, root in enumerate(dict.fromkeys(roots))}
+        columns = np.array([column_of[root] for root in roots])
+
+        lb = np.zeros(len(column_of))
+        ub = np.ones(len(column_of))
+        for i, j in white:
+            ub[columns[i * length + j]] = 0
+        for (i, j), colour in fixed.items():
+            lb[columns[i * length + j]] = ub[columns[i * length + j]] = \
+                1 if colour == BLACK else 0
+        variables = m.add_vars(lb, ub)
+        matrix, sense, rhs = self.tight_matrix(columns, exclusive)
+        m.add_matrix_constrs(matrix, variables, sense, rhs)
+        return {(i, j): variables[columns[i * length + j]]
+                for i in range(length) for j in range(length)}
+
+    def tight_matrix(self, columns, exclusive):
+        """
+        Assemble the rows of the tight build.
+
+        Cell (i, j) is the variable columns[i * length + j], entries of cells
+        sharing a variable are summed. The rows are, in order:
+            - b_i + b_j <= 1 for every pair of orthogonal neighbours;
+            - ConnectedAtLeast: sum of the neighbours - b <= deg - 1;
+            - a black cell in every 3-region run;
+            - 'A' pairs not both black.
+
+        Returns:
+            A (matrix, sense, rhs) tuple for Backend.add_matrix_constrs.
+        """
+        length = self.length
+        size = length * length
+        index = np.arange(size).reshape(length, length)
+        first = np.concatenate([index[:-1, :].ravel(), index[:, :-1].ravel()])
+        second = np.concatenate([index[1:, :].ravel(), index[:, 1:].ravel()])
+        edges = len(first)
+        both_first, both_second = np.concatenate([first, second]), np.concatenate([second, first])
+        degree = np.bincount(both_first, minlength=size)
+        cells = np.arange(size)
+
+        rows = [np.arange(edges), np.arange(edges), edges + cells, edges + both_first]
+        cols = [first, second, cells, both_second]
+        values = [np.ones(2 * edges), -np.ones(size), np.ones(2 * edges)]
+        sense = ['<'] * (edges + size)
+        rhs = [np.ones(edges), degree - 1]
+
+        run_rows, run_cols = [], []
+        row = edges + size
+        for run in self.orthogonal_runs() + [list(pair) for pair in exclusive]:
+            for i, j in run:
+                run_rows.append(row)
+                run_cols.append(i * length + j)
+            row += 1
+        runs = row - edges - size - len(exclusive)
+        rows.append(np.array(run_rows, dtype=int))
+        cols.append(np.array(run_cols, dtype=int))
+        values.append(np.ones(len(run_rows)))
+        sense += ['>'] * runs + ['<'] * len(exclusive)
+        rhs.append(np.ones(runs + len(exclusive)))
+
+        matrix = sparse.csr_matrix(
+            (np.concatenate(values),
+             (np.concatenate(rows), columns[np.concatenate(cols).astype(int)])),
+            shape=(row, int(columns.max()) + 1))
+        return matrix, np.array(sense), np.concatenate(rhs).astype(float)
+
+    def neighbour_matrix(self):
+        """
+        Assemble the rows of the matrix build that only depend on the grid size.
+
+        Cell (i, j) is column i * length + j. The rows are, in order:
+            - AdjacentBlack: deg * b + sum of the neighbours <= deg;
+            - ConnectedAtLeast: sum of the neighbours - b <= deg - 1.
+
+        Returns:
+            A (matrix, sense, rhs) tuple for Backend.add_matrix_constrs.
+        """
+        length = self.length
+        size = length * length
+        index = np.arange(size).reshape(length, length)
+        # both orders of every pair of orthogonal neighbours
+        first = np.concatenate([index[:-1, :].ravel(), index[:, :-1].ravel()])
+        second = np.concatenate([index[1:, :].ravel(), index[:, 1:].ravel()])
+        first, second = np.concatenate([first, second]), np.concatenate([second, first])
+        degree = np.bincount(first, minlength=size)
+        cells = np.arange(size)
+
+        rows = np.concatenate([cells, first, size + cells, size + first])
+        cols = np.concatenate([cells, second, cells, second])
+        values = np.concatenate([degree, np.ones(len(first)), -np.ones(size), np.ones(len(first))])
+        matrix = sparse.csr_matrix((values, (rows, cols)), shape=(2 * size, size))
+        rhs = np.concatenate([degree, degree - 1]).astype(float)
+        return matrix, np.array(['<'] * (2 * size)), rhs
+
+    def region_matrix(self, equal, exclusive):
+        """
+        Assemble the rows of the matrix build that depend on the regions.
+
+        The rows are a black cell in every 3-region run, then 'S' pairs
+        equal and 'A' pairs not both black.
+
+        Returns:
+            A (matrix, sense, rhs) tuple for Backend.add_matrix_constrs.
+        """
+        length = self.length
+        rows, cols, values, sense, rhs = [], [], [], [], []
+        for run in self.orthogonal_runs():
+            for i, j in run:
+                rows.append(len(rhs))
+                cols.append(i * length + j)
+                values.append(1)
+            sense.append('>')
+            rhs.append(1)
+        for pairs, coefficient, pair_sense, pair_rhs in ((equal, -1, '=', 0),
+                                                         (exclusive, 1, '<', 1)):
+            for (i, j), (ii, jj) in pairs:
+                rows.extend([len(rhs), len(rhs)])
+                cols.extend([i * length + j, ii * length + jj])
+                values.extend([1, coefficient])
+                sense.append(pair_sense)
+                rhs.append(pair_rhs)
+        matrix = sparse.csr_matrix((np.array(values, dtype=float), (rows, cols)),
+                                   shape=(len(rhs), length * length))
+        return matrix, np.array(sense), np.array(rhs, dtype=float)
+
+    def heuristic_start(self, fixed):
+        """Guess the black cells of a solution with the greedy heuristic"""
+        equal, exclusive, white = self.symmetry_pairs()
+        return greedy_start(self.length, self.orthogonal_runs(), equal, exclusive, white, fixed)
+
+    def model_solutions(self, m, fixed, start=None):
+        """Build the model on a backend and enumerate its solutions with no-good cuts"""
+        self.backend_used = m.name
+        self.model = m
+        self.lazy_constraints_added = 0
+        self.callbacks = 0
+        self.node_count = 0
+        self.runtime = 0.0
+        if self.build == 'matrix':
+            black_vars = self.build_matrix_model(m, fixed)
+        elif self.build == 'tight':
+            black_vars = self.build_tight_model(m, fixed)
+        else:
+            black_vars = self.build_model(m, fixed)
+        m.tune(self.length, self.profile)
+        if start is None and self.warm_start:
+            start = self.heuristic_start(fixed)
+        if start is not None:
+            m.set_start(black_vars, [tuple(cell) for cell in start])
+            self.warm_started = True
+
+        cuts = []
+        seeds = CUT_POOL.top(self.length) if self.cut_pool else []
+        for cut in seeds:
+            m.add_constr(m.quicksum(black_vars[cell] for cell in cut) <= len(cut) - 1)
+        self.seeded_cuts = len(seeds)
+
+        def separate(black):
+            self.callbacks += 1
+            walls, loops = find_violations(black, self.length, minimal=self.multi_cut)
+            if not self.multi_cut:
+                # one wall and one loop per incumbent, the rest is found on the next ones
+                walls, loops = walls[:1], loops[:1]
+            self.lazy_constraints_added += len(walls) + len(loops)
+            cuts.extend(walls + loops)
+            # an incumbent without violated cuts is the solution
+            self.notify("incumbent", callbacks=self.callbacks, cuts=len(walls) + len(loops),
+                        lazy_constraints_added=self.lazy_constraints_added)
+            return walls + loops
+
+        kept = 0
+        try:
+            while True:
+                found = m.optimize(black_vars, separate, time_limit=self.time_left())
+                stats = m.get_stats()
+                self.node_count += stats["node_count"]
+                self.runtime += stats["runtime"]
+                if not found:
+                    return
+                black_cells = [cell for cell, var in black_vars.items() if m.value(var) > 0.5]
+                yield black_cells
+
+                # re-optimize the same model with this black pattern excluded,
+                # the connectivity cuts found so far are kept
+                if not m.keeps_cuts:
+                    for cut in cuts[kept:]:
+                        m.add_constr(m.quicksum(black_vars[cell] for cell in cut) <= len(cut) - 1)
+                    kept = len(cuts)
+                black_set = set(black_cells)
+                m.add_constr(
+                    m.quicksum(var for cell, var in black_vars.items() if cell not in black_set)
+                    - m.quicksum(black_vars[cell] for cell in black_cells)
+                    >= 1 - len(black_cells), name='no_good')
+        finally:
+            # the cuts of every solution of the enumeration count as one solve
+            if self.cut_pool:
+                CUT_POOL.record(self.length, cuts)
+
+    def get_uniqueness(self):
+        """Get whether the last solution is unique, or a second solution as a witness"""
+        return {"unique": bool(self.is_unique), "witness": self.witness}
+
+    def get_stats(self):
+        """Get the statistics of the last solve"""
+        return {
+            "backend": self.backend_used,
+            "presolved_cells": self.presolved_cells,
+            "lazy_constraints_added": self.lazy_constraints_added,
+            "callbacks": self.callbacks,
+            "node_count": self.node_count,
+            "runtime": self.runtime,
+            "warm_started": self.warm_started,
+            "seeded_cuts": self.seeded_cuts,
+        }
 
+    def notify(self, event, **data):
+        """Pass a progress event to the progress function, if any"""
+        if self.progress is not None:
+            self.progress({"event": event, **data})
+
+    def cancel(self):
+        """Stop the solve from another thread, it raises SolveTimeoutError"""
+        self.cancelled = True
+        if self.model is not None:
+            self.model.terminate()
+
+    def time_left(self):
+        """Return the seconds left until the deadline of the current solve, if any"""
+        if self.cancelled:
+            return 0
+        if self.deadline is None:
+            return None
+        return max(self.deadline - time.monotonic(), 0)
+
+    def set_black_cells(self, black_cells):
+        """Colour the grid from a list of black (x, y) cells and get the result"""
+        self.grid.set_colours([i * self.length + j for i, j in black_cells])
         return self.get_result()
 
     def get_result(self):
         """Get the result"""
-        # Create an empty list to store the rows
-        matrix = []
-
-        # Loop self.length times to create self.length rows
-        for _ in range(self.length):
-            # Create an empty list for each row
-            row = []
-            for _ in range(self.length):
-                row.append(0)  # Add 0 to each element in the row
-            # Add the completed row to the matrix
-            matrix.append(row)
-
-        for inp in self.grid_inputs.values():
-            matrix[inp.pos[1]][inp.pos[0]] = inp.get_colour()
-            if inp.symbol:
-                matrix[inp.pos[1]][inp.pos[0]] += f"/{inp.symbol}"
-        return matrix
+        return self.grid.result()
@@ -1,55 +1,126 @@
 """Utility functions for the solver module."""
+import itertools
+
+import numpy as np
+
 WHITE = 'W'
 GREY = 'G'
 BLACK = 'B'
 
 
+# wall bitflags of a cell, set on the sides where the neighbour is in another region
+NORTH, EAST, SOUTH, WEST = 1, 2, 4, 8
+COLOURS = (GREY, WHITE, BLACK)  # colour codes of Grid.colour
+
+
 class Region:
-    """Region class to represent a region (room) in the grid."""
+    """Region class to represent a region (room) in the grid, a view over a range of its cells."""
+    __slots__ = ('grid', 'start', 'end', 'symbol')
 
-    def __init__(self, grid_inputs, symbol=''):
-        self.grid_inputs = grid_inputs
+    def __init__(self, grid, start, end, symbol=''):
+        self.grid = grid
+        self.start = start
+        self.end = end
         self.symbol = symbol
 
+    def cells(self):
+        """Get the cell indexes x * length + y of the region (room)."""
+        return self.grid.order[self.start:self.end]
+
     def get_pos(self):
         """Get the coordinates of the region (room)."""
-        return [(grid_input.pos[0], grid_input.pos[1]) for grid_input in self.grid_inputs]
-
-    def group_grid_inputs(self):
-        """Group grid inputs based on their position."""
-        cells = self.get_pos()
-        for grid_input in self.grid_inputs:
-            x, y = grid_input.get_pos()
-            if (x - 1, y) not in cells:
-                grid_input.west = True
-            if (x, y + 1) not in cells:
-                grid_input.south = True
-            if (x + 1, y) not in cells:
-                grid_input.east = True
-            if (x, y - 1) not in cells:
-                grid_input.north = True
-
-
-class ValueInput:
-    """ValueInput class to represent a cell in the grid."""
-
-    def __init__(self, x_pos=None, y_pos=None, default_colour=None):
-        self.pos = (x_pos, y_pos)
-        self.symbol = ''
-        self.default_colour = default_colour
-
-        self.north = False
-        self.east = False
-        self.south = False
-        self.west = False
+        x, y = np.divmod(self.cells(), self.grid.length)
+        return list(zip(x.tolist(), y.tolist()))
 
-    def get_pos(self):
-        """Get the coordinates of the cell."""
-        return self.pos[0], self.pos[1]
 
-    def get_colour(self):
-        """Get the colour of the cell."""
-        return self.default_colour
+class Grid:
+    """
+    Cells of a square grid in flat arrays indexed x * length + y.
+
+    Every cell has a colour code, a region id, wall bitflags and a symbol. The
+    cells of each region are a range of order, in the order they were given.
+    """
+    __slots__ = ('length', 'colour', 'region', 'walls', 'symbol', 'order', 'starts',
+                 'region_symbols')
+
+    def __init__(self, length, order=(), starts=(0,), symbols=None):
+        size = length * length
+        self.length = length
+        self.colour = np.zeros(size, dtype=np.uint8)
+        self.region = np.full(size, -1, dtype=np.int32)  # -1 for a cell of no region
+        self.walls = np.zeros(size, dtype=np.uint8)
+        self.symbol = np.zeros(size, dtype='U1')
+        self.order = np.asarray(order, dtype=np.intp)
+        self.starts = np.asarray(starts, dtype=np.intp)
+
+        sizes = np.diff(self.starts)
+        region_of = np.repeat(np.arange(len(sizes), dtype=np.int32), sizes)
+        self.region[self.order] = region_of
+        for cell, symbol in (symbols or {}).items():
+            self.symbol[cell] = symbol
+        # the last symbol met in a region is the symbol of the region
+        self.region_symbols = [''] * len(sizes)
+        for position in np.flatnonzero(self.symbol[self.order]).tolist():
+            self.region_symbols[region_of[position]] = str(self.symbol[self.order[position]])
+        self.set_walls()
+
+    @classmethod
+    def from_groups(cls, length, groups, symbols=None):
+        """Build a grid from a list of the cell indexes of every region"""
+        sizes = [len(group) for group in groups]
+        order = np.fromiter(itertools.chain.from_iterable(groups), dtype=np.intp,
+                            count=sum(sizes))
+        return cls(length, order, np.concatenate(([0], np.cumsum(sizes))), symbols)
+
+    def set_walls(self):
+        """Set the walls between cells of different regions and on the grid border"""
+        region = self.region.reshape(self.length, self.length)  # [x][y]
+        walls = self.walls.reshape(self.length, self.length)
+        for flag, shift, axis in ((WEST, 1, 0), (EAST, -1, 0), (NORTH, 1, 1), (SOUTH, -1, 1)):
+            other = np.full_like(region, -1)
+            source = [slice(None)] * 2
+            target = [slice(None)] * 2
+            target[axis] = slice(1, None) if shift > 0 else slice(None, -1)
+            source[axis] = slice(None, -1) if shift > 0 else slice(1, None)
+            other[tuple(target)] = region[tuple(source)]
+            walls[(other != region) | (region < 0)] |= flag
+
+    def regions(self):
+        """Get a Region view of every region"""
+        return [Region(self, start, end, symbol) for start, end, symbol in
+                zip(self.starts[:-1].tolist(), self.starts[1:].tolist(), self.region_symbols)]
+
+    def cells(self):
+        """Get the indexes of the cells of the regions in order, each once"""
+        _, first = np.unique(self.order, return_index=True)
+        if len(first) == len(self.order):
+            return self.order
+        return self.order[np.sort(first)]
+
+    def positions(self):
+        """Get the (x, y) coordinates of the cells of the regions in order, each once"""
+        x, y = np.divmod(self.cells(), self.length)
+        return list(zip(x.tolist(), y.tolist()))
+
+    def set_colours(self, black_cells=None):
+        """Colour the cells of the regions grey, or black and white from black cell indexes"""
+        cells = self.cells()
+        if black_cells is None:
+            self.colour[cells] = COLOURS.index(GREY)
+            return
+        self.colour[cells] = COLOURS.index(WHITE)
+        self.colour[np.asarray(black_cells, dtype=np.intp)] = COLOURS.index(BLACK)
+
+    def result(self):
+        """Get the colour and symbol of every cell as a matrix indexed [y][x], 0 for no region"""
+        names = np.array(COLOURS)[self.colour]
+        marked = self.symbol != ''
+        names = np.where(marked, np.char.add(np.char.add(names, '/'), self.symbol), names)
+        matrix = names.reshape(self.length, self.length).T.tolist()
+        for cell in np.flatnonzero(self.region < 0).tolist():
+            x, y = divmod(cell, self.length)
+            matrix[y][x] = 0
+        return matrix
 
 
 def build_matrix(cords, x_matrix):
@@ -84,3 +155,19 @@ def build_matrix(cords, x_matrix):
 
 class InvalidInputError(Exception):
     """InvalidInputError class to handle invalid input errors."""
+
+
+class BackendError(Exception):
+    """BackendError class to handle errors of the solver backends."""
+
+
+class SolveTimeoutError(Exception):
+    """SolveTimeoutError class to handle solves stopped by their time limit."""
+
+
+class GenerationError(Exception):
+    """GenerationError class to handle random rooms that found no fitting puzzle."""
+
+
+class PoolFullError(Exception):
+    """PoolFullError class to handle requests turned away by a full worker pool."""
@@ -0,0 +1,124 @@
+"""Check a candidate solution against the rules without a solver backend.
+
+The rule tables of a puzzle, the runs spanning 3 regions and the 'S'/'A'
+cell pairs, are built once per puzzle into index arrays. A candidate is a
+boolean black mask indexed [x][y] and is checked with a few array operations:
+    - no two black cells are orthogonally adjacent;
+    - the white cells are one orthogonally connected area;
+    - every run spanning 3 regions holds a black cell;
+    - 'S' regions are point symmetric, 'A' regions have no black mirrored pair.
+"""
+import numpy as np
+from scipy import ndimage
+
+from solver.utils import BLACK, EAST, SOUTH, WHITE, InvalidInputError
+
+
+def black_from_cells(cells, length):
+    """Return the black mask indexed [x][y] of a list of black (x, y) cells"""
+    black = np.zeros((length, length), dtype=bool)
+    if len(cells):
+        x, y = np.asarray(cells, dtype=np.intp).T
+        black[x, y] = True
+    return black
+
+
+def black_from_result(result, length):
+    """
+    Return the black mask indexed [x][y] of a get_result matrix indexed [y][x].
+
+    Raises:
+        InvalidInputError: If the matrix is not a grid of 'B' and 'W' cells of the length.
+    """
+    cells = np.array(result, dtype=str)
+    if cells.shape != (length, length):
+        raise InvalidInputError(f"The solution must be a {length}x{length} matrix")
+    colours = np.char.partition(cells, '/')[..., 0]
+    if not np.isin(colours, (BLACK, WHITE)).all():
+        raise InvalidInputError(f"The solution cells must be '{BLACK}' or '{WHITE}'")
+    return (colours == BLACK).T
+
+
+class Verifier:
+    """Rule tables of a puzzle, checking candidate solutions in a few array operations"""
+
+    def __init__(self, solver):
+        self.length = solver.length
+        starts = solver.grid.cells()
+        walls = solver.grid.walls[starts]
+        # cell indexes x * length + y of every run, padded with an index past the grid
+        runs = []
+        for flag, ends, step in ((SOUTH, solver.south_run_ends, 1),
+                                 (EAST, solver.east_run_ends, self.length)):
+            for start in starts[walls & flag != 0].tolist():
+                x, y = divmod(start, self.length)
+                end = ends[x][y] if flag == SOUTH else ends[y][x]
+                if end is not None:
+                    size = end - (y if flag == SOUTH else x) + 1
+                    runs.append(np.arange(size) * step + start)
+        self.runs = np.full((len(runs), max(map(len, runs), default=0)),
+                            self.length * self.length, dtype=np.intp)
+        for k, run in enumerate(runs):
+            self.runs[k, :len(run)] = run
+        equal, exclusive, white = solver.symmetry_pairs()
+        self.equal = self.pair_indexes(equal)
+        self.exclusive = self.pair_indexes(exclusive)
+        self.white = np.array([x * self.length + y for x, y in white], dtype=np.intp)
+
+    def pair_indexes(self, pairs):
+        """Return the cell indexes of (x, y) cell pairs as two arrays"""
+        indexes = np.array([[a[0] * self.length + a[1], b[0] * self.length + b[1]]
+                            for a, b in pairs], dtype=np.intp).reshape(-1, 2)
+        return indexes[:, 0], indexes[:, 1]
+
+    def cells_of(self, indexes):
+        """Return [x, y] lists of cell indexes"""
+        x, y = np.divmod(np.asarray(indexes, dtype=np.intp), self.length)
+        return [list(cell) for cell in zip(x.tolist(), y.tolist())]
+
+    def check(self, black):
+        """
+        Check a black mask indexed [x][y] against the rules.
+
+        Returns:
+            A list of {"rule", "cells"} violations, empty for a solution.
+        """
+        violations = []
+        adjacent = np.zeros_like(black)
+        pairs = black[1:, :] & black[:-1, :]
+        adjacent[1:, :] |= pairs
+        adjacent[:-1, :] |= pairs
+        pairs = black[:, 1:] & black[:, :-1]
+        adjacent[:, 1:] |= pairs
+        adjacent[:, :-1] |= pairs
+        if adjacent.any():
+            violations.append({"rule": "adjacent black cells",
+                               "cells": self.cells_of(np.flatnonzero(adjacent))})
+
+        labels, count = ndimage.label(~black)
+        if count > 1:
+            largest = np.bincount(labels.ravel())[1:].argmax() + 1
+            cut_off = (labels != largest) & ~black
+            violations.append({"rule": "white cells not connected",
+                               "cells": self.cells_of(np.flatnonzero(cut_off))})
+
+        # the padding index past the grid reads as white
+        flat = np.append(black.ravel(), False)
+        for run in self.runs[~flat[self.runs].any(axis=1)]:
+            violations.append({"rule": "white run spanning 3 regions",
+                               "cells": self.cells_of(run[run < black.size])})
+
+        first, second = self.equal
+        unequal = flat[first] != flat[second]
+        if unequal.any():
+            violations.append({"rule": "'S' region not symmetric", "cells": self.cells_of(
+                np.concatenate((first[unequal], second[unequal])))})
+        first, second = self.exclusive
+        both = flat[first] & flat[second]
+        if both.any():
+            violations.append({"rule": "'A' region with mirrored black cells",
+                               "cells": self.cells_of(np.concatenate((first[both], second[both])))})
+        if flat[self.white].any():
+            violations.append({"rule": "black cell that symmetry makes white",
+                               "cells": self.cells_of(self.white[flat[self.white]])})
+        return violations
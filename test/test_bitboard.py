@@ -0,0 +1,44 @@
+"""Test the bitboard solver"""
+from test.consts_input import input_matrix_7x7, input_matrix_10x10
+from test.test_solver import matrix_7x7_real_solution
+import numpy as np
+import pytest
+
+from solver.bitboard import BitboardSolver
+from solver.solver import Solver
+from solver.utils import BackendError, InvalidInputError
+
+
+def test_small_grid_is_routed_to_bitboard():
+    """Grids up to 8x8 are solved without a MIP model"""
+    solver = Solver(input_matrix=input_matrix_7x7)
+    solution = np.array(solver.solve())
+    assert np.array_equal(matrix_7x7_real_solution, solution)
+    assert solver.get_stats()['backend'] == 'bitboard'
+
+
+def test_large_grid_is_not_routed_to_bitboard():
+    """Grids above 8x8 are solved by a MIP backend"""
+    solver = Solver(input_matrix=input_matrix_10x10)
+    solver.solve()
+    assert solver.get_stats()['backend'] != 'bitboard'
+    with pytest.raises(InvalidInputError):
+        Solver(input_matrix=input_matrix_10x10, backend='bitboard')
+
+
+def test_run_needs_black_cell():
+    """A run spanning 3 regions gets a black cell"""
+    # 3x3 grid where the run (0, 2), (1, 2), (2, 2) spans 3 regions
+    search = BitboardSolver(3, [[(0, 2), (1, 2), (2, 2)]], [], [], white_cells=[(0, 2), (2, 2)])
+    assert search.solve() == [(1, 2)]
+    # with the middle cell forced white as well there is no solution
+    search = BitboardSolver(3, [[(0, 2), (1, 2), (2, 2)]], [], [],
+                            white_cells=[(0, 2), (1, 2), (2, 2)])
+    assert search.solve() is None
+
+
+def test_node_limit():
+    """The search gives up after node_limit nodes"""
+    search = BitboardSolver(8, [], [], [], node_limit=10)
+    with pytest.raises(BackendError):
+        list(search.solutions())
@@ -0,0 +1,70 @@
+"""Test the solve cache"""
+from test.consts_input import input_matrix_7x7
+import numpy as np
+
+from solver.cache import (SolveCache, TRANSFORMS, black_cells_of, fingerprint, from_canonical,
+                          to_canonical)
+from solver.solver import Solver
+
+
+def transform_input(regions, transform, length):
+    """Rotate or reflect an input matrix"""
+    moved = []
+    for region in regions:
+        moved_region = {}
+        for coord, symbol in region.items():
+            x, y = map(int, coord.split(','))
+            new_x, new_y = TRANSFORMS[transform](x, y, length)
+            moved_region[f'{new_x},{new_y}'] = symbol
+        moved.append(moved_region)
+    return moved
+
+
+def test_transformed_puzzles_share_the_key():
+    """All 8 rotations and reflections of a puzzle have the same key"""
+    keys = {fingerprint(Solver(transform_input(input_matrix_7x7, k, 7)))[0]
+            for k in range(len(TRANSFORMS))}
+    assert len(keys) == 1
+
+
+def test_different_symbols_change_the_key():
+    """Changing a region symbol changes the key"""
+    changed = [dict(region) for region in input_matrix_7x7]
+    changed[0]['1,0'] = 'A'
+    assert fingerprint(Solver(changed))[0] != fingerprint(Solver(input_matrix_7x7))[0]
+
+
+def test_layout_key_ignores_symbols():
+    """Puzzles differing only in their symbols share the layout key"""
+    changed = [dict(region) for region in input_matrix_7x7]
+    changed[0]['1,0'] = 'A'
+    assert (fingerprint(Solver(changed), symbols=False)
+            == fingerprint(Solver(input_matrix_7x7), symbols=False))
+
+
+def test_cached_solution_is_mapped_back():
+    """A solution cached for a puzzle solves its rotated copy"""
+    solver = Solver(input_matrix_7x7)
+    result = solver.solve()
+    _, transform = fingerprint(solver)
+    canonical = to_canonical(black_cells_of(result), transform, 7)
+
+    rotated_input = transform_input(input_matrix_7x7, 1, 7)
+    rotated = Solver(rotated_input)
+    _, rotated_transform = fingerprint(rotated)
+    cached = rotated.set_black_cells(from_canonical(canonical, rotated_transform, 7))
+    assert np.array_equal(np.array(cached), np.array(Solver(rotated_input).solve()))
+
+
+def test_lru_eviction_and_ttl():
+    """The least recently used and the expired entries are evicted"""
+    now = [0.0]
+    cache = SolveCache(maxsize=2, ttl=10, clock=lambda: now[0])
+    cache.store('a', [(0, 0)])
+    cache.store('b', None)
+    assert cache.lookup('a') == (True, [(0, 0)])
+    cache.store('c', [])
+    assert cache.lookup('b') == (False, None)
+    assert cache.lookup('a') == (True, [(0, 0)])
+    now[0] = 11.0
+    assert cache.lookup('c') == (False, None)
@@ -0,0 +1,59 @@
+"""Test the compact puzzle format"""
+import base64
+from test.consts_input import input_matrix_7x7
+from test.test_solver import matrix_7x7_real_solution
+import numpy as np
+import pytest
+
+from solver.compact import (decode_black, decode_puzzle, encode_puzzle, encode_solution,
+                            from_coordinates, parse_regions, to_coordinates)
+from solver.solver import Solver
+from solver.utils import InvalidInputError
+
+
+def test_round_trip():
+    """Both compact forms describe the same puzzle as the dict format"""
+    puzzle = from_coordinates(input_matrix_7x7)
+    decoded = decode_puzzle(encode_puzzle(puzzle))
+    assert np.array_equal(decoded.regions, puzzle.regions)
+    assert decoded.symbols == puzzle.symbols
+    assert to_coordinates(decoded) == [
+        dict(sorted(room.items(), key=lambda item: item[0].split(',')[::-1]))
+        for room in input_matrix_7x7]
+
+
+def test_compact_solver_matches_dict_solver():
+    """A Solver built from the compact format has the same runs and solution"""
+    compact = Solver(parse_regions(from_coordinates(input_matrix_7x7).regions.ravel().tolist(),
+                                   from_coordinates(input_matrix_7x7).symbols))
+    solver = Solver(input_matrix_7x7)
+    assert compact.region_ids == solver.region_ids
+    assert compact.east_run_ends == solver.east_run_ends
+    assert compact.symmetry_pairs() == solver.symmetry_pairs()
+    assert np.array_equal(matrix_7x7_real_solution, np.array(compact.solve()))
+
+
+def test_invalid_compact_input():
+    """Grids that are not square, bad symbols and broken strings are rejected"""
+    with pytest.raises(InvalidInputError):
+        parse_regions([0, 1, 2])
+    with pytest.raises(InvalidInputError):
+        parse_regions([0, 1, 2, 3], {7: 'S'})
+    with pytest.raises(ValueError):
+        parse_regions([0, 1, 2, 3], {0: 'X'})
+    with pytest.raises(InvalidInputError):
+        decode_puzzle('not base64!')
+    data = base64.b64decode(encode_puzzle(from_coordinates(input_matrix_7x7)))
+    with pytest.raises(InvalidInputError):
+        decode_puzzle(base64.b64encode(data[:40]).decode())
+
+
+@pytest.mark.parametrize("solution_format", ['bits', 'base64'])
+def test_solution_round_trip(solution_format):
+    """Test that a compact solution keeps the black cells and the symbols."""
+    encoded = encode_solution(matrix_7x7_real_solution, solution_format)
+    cells = np.array(matrix_7x7_real_solution)
+    assert (decode_black(encoded, solution_format) == np.char.startswith(cells, 'B')).all()
+    for cell, symbol in encoded["symbols"].items():
+        assert cells.ravel()[int(cell)].endswith('/' + symbol)
+    assert encode_solution(matrix_7x7_real_solution, 'matrix') is matrix_7x7_real_solution
@@ -0,0 +1,41 @@
+"""Test the cut pool"""
+from test.consts_input import input_matrix_10x10
+
+from solver.cutpool import CUT_POOL, CutPool
+from solver.solver import Solver
+
+
+def test_pool_keeps_the_most_violated_cuts():
+    """Cuts are counted once per solve and the least violated ones are dropped"""
+    pool = CutPool(maxsize=2)
+    pool.record(5, [[(0, 1), (1, 0)], [(1, 0), (0, 1)]])
+    pool.record(5, [[(0, 1), (1, 0)], [(2, 3), (3, 2)]])
+    pool.record(5, [[(2, 3), (3, 2)], [(4, 4), (3, 3)]])
+    assert pool.cuts[5][(1, 5)] == 2
+    assert len(pool.cuts[5]) == 2
+    assert pool.top(5, 1) in ([[(0, 1), (1, 0)]], [[(2, 3), (3, 2)]])
+    assert [length for length, _ in pool.take_changed()] == [5]
+    assert not pool.take_changed()
+
+
+def test_solve_is_seeded_with_recorded_cuts():
+    """A second solve of the same size starts from the cuts of the first one"""
+    CUT_POOL.cuts.pop(10, None)
+    first = Solver(input_matrix_10x10, backend='gurobi', cut_pool=True)
+    first.solve()
+    assert first.get_stats()['seeded_cuts'] == 0
+    recorded = len(CUT_POOL.top(10))
+    second = Solver(input_matrix_10x10, backend='gurobi', cut_pool=True)
+    assert second.solve()
+    assert second.get_stats()['seeded_cuts'] == recorded > 0
+    assert second.callbacks < first.callbacks
+
+
+def test_enumeration_counts_as_one_solve(monkeypatch):
+    """The cuts of both solves of a uniqueness check are recorded together"""
+    calls = []
+    monkeypatch.setattr(CUT_POOL, 'record', lambda length, cuts: calls.append(len(cuts)))
+    solver = Solver(input_matrix_10x10, backend='gurobi', cut_pool=True, unique=True)
+    assert solver.solve()
+    assert solver.get_uniqueness()['witness'] is not None
+    assert len(calls) == 1 and calls[0] > 0
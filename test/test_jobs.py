@@ -0,0 +1,76 @@
+"""Test the solve jobs"""
+import asyncio
+from test.consts_input import input_matrix_10x10
+
+from routers import solver as solver_router
+from solver.jobs import DONE, FAILED, JobRegistry, SolveJob
+from solver.solver import Solver
+
+
+def test_solver_reports_progress():
+    """The Solver reports its backend and every incumbent checked"""
+    events = []
+    solver = Solver(input_matrix_10x10, backend='gurobi', progress=events.append)
+    solver.solve()
+    assert events[0] == {"event": "backend", "backend": "gurobi"}
+    incumbents = [event for event in events if event["event"] == "incumbent"]
+    assert len(incumbents) == solver.callbacks
+    assert incumbents[-1]["cuts"] == 0
+    assert incumbents[-1]["lazy_constraints_added"] == solver.lazy_constraints_added
+
+
+def test_stream_replays_and_waits_for_events():
+    """A stream yields past events, then new ones until the job is finished"""
+    job = SolveJob()
+
+    async def collect():
+        job.publish({"event": "backend", "backend": "gurobi"})
+        received = []
+
+        async def read():
+            async for event in job.stream():
+                received.append(event["event"])
+
+        reader = asyncio.ensure_future(read())
+        await asyncio.sleep(0)
+        job.finish(result=[["W"]])
+        await reader
+        return received
+
+    assert asyncio.run(collect()) == ["backend", DONE]
+    assert job.to_dict()["status"] == DONE
+
+
+def test_registry_forgets_old_finished_jobs():
+    """Only the newest finished jobs are kept, running jobs are never dropped"""
+    registry = JobRegistry(kept=1)
+    running = registry.create()
+    first, second = registry.create(), registry.create()
+    first.finish(result=[])
+    second.finish(error="Solve time limit exceeded")
+    registry.forget_finished()
+    assert registry.get(running.id) is running
+    assert registry.get(first.id) is None
+    assert registry.get(second.id).to_dict()["status"] == "failed"
+
+
+def test_job_fails_when_it_can_not_be_stored(monkeypatch):
+    """A job whose outcome can not be persisted is marked failed"""
+    class BrokenStore:
+        """Job store of an unreachable database"""
+
+        async def store(self, _job):
+            """Fail like a lost connection"""
+            raise ConnectionError("connection refused")
+
+    monkeypatch.setattr(solver_router, 'JOB_STORE', BrokenStore())
+    job = SolveJob()
+
+    async def run():
+        future = asyncio.get_running_loop().create_future()
+        future.set_result([["W"]])
+        await solver_router.run_job(job, future)
+
+    asyncio.run(run())
+    assert job.status == FAILED
+    assert "connection refused" in job.error
@@ -0,0 +1,107 @@
+"""Test the solver worker pool"""
+import asyncio
+import threading
+import time
+from test.consts_input import input_matrix_7x7, input_matrix_10x10
+import pytest
+
+from solver.pool import SolveHandle, SolverPool, solve_task
+from solver.solver import Solver
+from solver.utils import PoolFullError, SolveTimeoutError
+
+
+def test_pool_solves_like_the_solver():
+    """A solve in the pool returns the same matrix as a direct solve"""
+    pool = SolverPool(workers=2, queue_size=0)
+    try:
+        result = asyncio.run(pool.solve(input_matrix_7x7))
+    finally:
+        pool.shutdown()
+    assert result == Solver(input_matrix_7x7).solve()
+
+
+def test_full_pool_rejects_tasks():
+    """Tasks beyond the workers and the queue are rejected"""
+    pool = SolverPool(workers=1, queue_size=1)
+    release = threading.Event()
+
+    async def submit():
+        tasks = [asyncio.ensure_future(pool.run(release.wait)) for _ in range(2)]
+        await asyncio.sleep(0)
+        with pytest.raises(PoolFullError):
+            await pool.run(release.wait)
+        release.set()
+        return await asyncio.gather(*tasks)
+
+    try:
+        results = asyncio.run(submit())
+    finally:
+        pool.shutdown()
+    assert results == [True, True]
+    assert pool.pending == 0
+
+
+def test_expired_deadline_times_out():
+    """A task that waited past its deadline is not solved"""
+    with pytest.raises(SolveTimeoutError):
+        solve_task(input_matrix_7x7, {}, time.time() - 1)
+
+
+@pytest.mark.parametrize("backend", ["gurobi", "cpsat"])
+def test_cancel_stops_the_solve(backend):
+    """A solve cancelled from its first incumbent stops with SolveTimeoutError"""
+    def progress(event):
+        if event["event"] == "incumbent":
+            solver.cancel()
+
+    solver = Solver(input_matrix_10x10, backend=backend, progress=progress)
+    with pytest.raises(SolveTimeoutError):
+        list(solver.iter_solutions())
+
+
+def test_cancelled_task_is_not_solved():
+    """A task cancelled while it is queued is not solved"""
+    handle = SolveHandle()
+    handle.cancel()
+    with pytest.raises(SolveTimeoutError):
+        solve_task(input_matrix_7x7, {}, time.time() + 60, handle=handle)
+    assert handle.solver.cancelled
+
+
+def test_solver_time_limit():
+    """A solve over its time limit raises SolveTimeoutError"""
+    with pytest.raises(SolveTimeoutError):
+        Solver(input_matrix_10x10, backend='gurobi').solve(time_limit=0)
+
+
+def test_iterate_streams_items():
+    """Items are produced in the pool and consumed as an async iterator"""
+    pool = SolverPool(workers=1, queue_size=0)
+
+    async def consume():
+        items = [item async for item in pool.iterate(range, 40, buffer=4)]
+        # the slot is freed on the loop once the worker returns
+        while pool.pending:
+            await asyncio.sleep(0.01)
+        return items
+
+    try:
+        assert asyncio.run(asyncio.wait_for(consume(), 10)) == list(range(40))
+    finally:
+        pool.shutdown()
+    assert pool.pending == 0
+
+
+def test_iterate_without_consumer_frees_the_worker():
+    """A producer whose items are never taken gives up after the idle timeout"""
+    pool = SolverPool(workers=1, queue_size=0)
+
+    async def abandon():
+        pool.iterate(range, 40, buffer=4, idle_timeout=0.5)
+        while pool.pending:
+            await asyncio.sleep(0.1)
+
+    try:
+        asyncio.run(asyncio.wait_for(abandon(), 10))
+    finally:
+        pool.shutdown()
@@ -0,0 +1,56 @@
+"""Test the portfolio races"""
+from test.consts_input import input_matrix_7x7
+from test.test_solver import matrix_7x7_real_solution
+import numpy as np
+import pytest
+
+from solver.portfolio import PortfolioStats, RaceHandle, portfolio_names, race
+from solver.utils import SolveTimeoutError
+
+
+def test_race_returns_the_first_answer():
+    """The winner of a race answers the puzzle and the race is recorded"""
+    stats = PortfolioStats()
+    result, winner = race(input_matrix_7x7, 30, ['gurobi-tight', 'cpsat-tight'], stats)
+    assert np.array_equal(matrix_7x7_real_solution, np.array(result))
+    assert stats.to_dict()[winner]["wins"] == 1
+    assert {name: entry["races"] for name, entry in stats.to_dict().items()} == {
+        'gurobi-tight': 1, 'cpsat-tight': 1}
+
+
+def test_losing_variants_are_pruned():
+    """Variants winning too few races are left out, the best one is always kept"""
+    stats = PortfolioStats(min_races=4, min_win_rate=0.3)
+    for _ in range(4):
+        stats.record(['fast', 'slow'], winner='fast')
+    assert stats.active(['fast', 'slow']) == ['fast']
+    assert stats.to_dict()['slow']['pruned']
+    assert stats.active(['slow']) == ['slow']
+
+
+def test_portfolio_names_are_checked():
+    """A list of variants must not be empty or name an unknown variant"""
+    assert portfolio_names('gurobi-tight, cpsat-tight') == ['gurobi-tight', 'cpsat-tight']
+    with pytest.raises(ValueError, match="gurobi-fast"):
+        portfolio_names('gurobi-tight,gurobi-fast')
+    with pytest.raises(ValueError):
+        portfolio_names(',')
+
+
+def test_cancelled_race_kills_its_variants():
+    """A race cancelled once its variants started kills them and is not recorded"""
+
+    class CancelOnStart(RaceHandle):
+        """Cancel the race as soon as its variants are started"""
+
+        def start(self, processes):
+            super().start(processes)
+            self.cancel()
+
+    strips = [{f'{x},{y}': '' for x in range(30)} for y in range(30)]
+    stats, handle = PortfolioStats(), CancelOnStart()
+    with pytest.raises(SolveTimeoutError):
+        race(strips, 60, ['cpsat-tight'], stats, handle=handle)
+    assert handle.processes
+    assert not any(process.is_alive() for process in handle.processes)
+    assert not stats.to_dict()
@@ -0,0 +1,57 @@
+"""Test the logical presolve"""
+from test.consts_input import input_matrix_10x10
+from test.test_routers import hard_to_solve_example
+import pytest
+
+from solver.presolve import Contradiction, Presolver
+from solver.solver import Solver
+from solver.utils import BLACK, WHITE
+
+
+def test_black_cell_whitens_neighbours():
+    """Orthogonal neighbours of a black cell are white"""
+    presolver = Presolver(3, [], [], [])
+    presolver.assign((1, 1), BLACK)
+    fixed = presolver.run()
+    assert all(fixed[cell] == WHITE for cell in [(0, 1), (1, 0), (1, 2), (2, 1)])
+
+
+def test_run_with_one_free_cell():
+    """A 3-region run with a single free cell forces that cell black"""
+    run = [(0, 0), (1, 0), (2, 0)]
+    fixed = Presolver(3, [run], [], [], white_cells=[(0, 0), (2, 0)]).run()
+    assert fixed[(1, 0)] == BLACK
+
+
+def test_equal_pairs_and_contradiction():
+    """'S' pairs share their colour, conflicting colours raise a contradiction"""
+    presolver = Presolver(3, [], [((0, 0), (2, 2))], [((0, 0), (2, 2))])
+    presolver.assign((0, 0), BLACK)
+    with pytest.raises(Contradiction):
+        presolver.run()
+
+
+def test_odd_a_room_centre_is_white():
+    """The centre cell of an odd 'A' room must be white"""
+    solver = Solver([{'0,0': 'A', '1,0': '', '2,0': ''},
+                     {'0,1': '', '1,1': '', '2,1': ''},
+                     {'0,2': '', '1,2': '', '2,2': ''}])
+    _, exclusive, white = solver.symmetry_pairs()
+    assert white == {(1, 0)}
+    assert exclusive == {((0, 0), (2, 0))}
+
+
+def test_presolve_matches_solution():
+    """Every presolved cell keeps its colour in the solution"""
+    solver = Solver(input_matrix=input_matrix_10x10, presolve=True)
+    fixed = solver.presolve()
+    solution = solver.solve()
+    assert solver.presolved_cells == len(fixed) > 0
+    assert all(solution[y][x][0] == colour for (x, y), colour in fixed.items())
+
+
+def test_presolve_proves_infeasible():
+    """The presolve finds an all-white run that can not be avoided"""
+    solver = Solver(hard_to_solve_example['coordinates'], presolve=True)
+    assert solver.presolve() is None
+    assert not solver.solve()
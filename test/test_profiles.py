@@ -0,0 +1,29 @@
+"""Test the backend parameter profiles"""
+from test.consts_input import input_matrix_7x7
+from test.test_solver import matrix_7x7_real_solution
+import numpy as np
+
+from solver.backends.gurobi import GurobiBackend
+from solver.backends.profiles import load_profiles, profile_for, save_profiles
+from solver.solver import Solver
+
+
+def test_profiles_are_stored_by_size(tmp_path):
+    """Profiles survive a round trip and the nearest tuned size is picked"""
+    path = tmp_path / 'profiles.json'
+    assert load_profiles(path) == {}
+    save_profiles({10: {'MIPFocus': 1}, 15: {'Cuts': 2}}, path)
+    profiles = load_profiles(path)
+    assert profile_for(profiles, 7) == {'MIPFocus': 1}
+    assert profile_for(profiles, 13) == {'Cuts': 2}
+    assert profile_for(profiles, 12) == {'MIPFocus': 1}
+    assert profile_for({}, 12) == {}
+
+
+def test_profile_is_applied():
+    """The parameters of a profile are set on the Gurobi model"""
+    backend = GurobiBackend()
+    backend.tune(7, {'MIPFocus': 2, 'Heuristics': 0.2})
+    assert backend.model.Params.MIPFocus == 2
+    solver = Solver(input_matrix_7x7, backend='gurobi', profile={'MIPFocus': 1, 'Cuts': 0})
+    assert np.array_equal(matrix_7x7_real_solution, np.array(solver.solve()))
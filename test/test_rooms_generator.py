@@ -3,7 +3,7 @@ import random
 import pytest
 
 from generators.generate_randomly import generate_rooms
-from solver.utils import InvalidInputError
+from solver.utils import GenerationError, InvalidInputError
 
 
 def test_generate_rooms_valid_input():
@@ -52,3 +52,9 @@ def test_generate_rooms_output():
         assert all(symbol in {'', 'S', 'A'} for symbol in room.values())
 
     # Additional assertions can be added based on the specific behavior of the function
+
+
+def test_generate_rooms_gives_up():
+    """Test that a failed search raises after the retry cap instead of recursing."""
+    with pytest.raises(GenerationError):
+        generate_rooms(4, attempts=0)
@@ -2,7 +2,7 @@
 import asyncio
 import json
 from test.test_solver import matrix_10x10_real_solution
-from test.consts_input import input_matrix_10x10
+from test.consts_input import input_matrix_7x7, input_matrix_10x10
 import numpy as np
 import pytest
 
@@ -10,6 +10,8 @@ from fastapi.testclient import TestClient
 from httpx import AsyncClient
 
 from main import app
+from solver.compact import decode_black, encode_puzzle, from_coordinates
+from solver.solver import Solver
 
 # Create a test client using the TestClient class provided by FastAPI
 test_client = TestClient(app=app)
@@ -610,12 +612,27 @@ def test_solve_matrix_invalid_input():
     assert response.status_code == 400
     print("response.text", response.text)
     # Assert that the response contains the expected error message
-    assert "The amount of rows and columns must be between 2 and 23" in response.text
+    assert "The amount of rows and columns must be between 2 and 64" in response.text
+
+
+def test_solve_matrix_large_grid_falls_back_to_cpsat():
+    """Test for solving a grid too large for gurobi without choosing a backend."""
+    quadrants = [{f"{i},{j}": "" for i in range(30) for j in range(30)
+                  if (i < 15, j < 15) == quadrant}
+                 for quadrant in ((True, True), (True, False), (False, True), (False, False))]
+    assert Solver(quadrants).backend_names() == ['cpsat']
+    response = test_client.post("/api/solve", json={"coordinates": quadrants})
+
+    assert response.status_code == 200
+    assert np.array(response.json()).shape == (30, 30)
+    response = test_client.post(
+        "/api/verify", json={"coordinates": quadrants, "solution": response.json()})
+    assert response.json()["valid"]
 
 
 def test_solve_matrix_hard_to_solve_for_gurobi_model():
     """Test for solving a matrix that exceeds the size limit of the Gurobi model."""
-    response = test_client.post("/api/solve", json=hard_to_solve_example)
+    response = test_client.post("/api/solve?backend=gurobi", json=hard_to_solve_example)
 
     # Assert that the response status code is 400 (Bad Request)
     assert response.status_code == 422
@@ -626,6 +643,24 @@ def test_solve_matrix_hard_to_solve_for_gurobi_model():
             in response.text)
 
 
+def test_solve_matrix_hard_to_solve_falls_back():
+    """Test that a matrix rejected by the Gurobi license is solved by the next backend."""
+    response = test_client.post("/api/solve", json=hard_to_solve_example)
+
+    # the example has no solution, which the fallback backend proves
+    assert response.status_code == 200
+    assert response.json() == []
+
+
+def test_solve_matrix_unknown_backend():
+    """Test for solving a matrix with a backend that does not exist."""
+    response = test_client.post(
+        "/api/solve?backend=unknown", json={"coordinates": input_matrix_10x10})
+
+    assert response.status_code == 400
+    assert "Unknown backend 'unknown'" in response.text
+
+
 @pytest.mark.asyncio
 async def test_generate_rooms_valid_input(user_token):
     """Test for generating rooms with valid input."""
@@ -740,3 +775,139 @@ async def test_not_found_conditions_for_user():
             "/api/conditions", headers={"Authorization": f"Bearer {data['access_token']}"})
 
     assert response.text == '{"detail":"404: No matrices found for the specified user"}'
+
+
+def test_solve_job_streams_the_result():
+    """Test that a queued job streams its progress and the solved matrix."""
+    # a single event loop for the requests and the background solve
+    with TestClient(app=app) as client:
+        response = client.post("/api/solve/jobs", json={"coordinates": input_matrix_10x10})
+        assert response.status_code == 202
+        job_id = response.json()["id"]
+
+        with client.stream("GET", f"/api/solve/jobs/{job_id}/events") as stream:
+            lines = [line for line in stream.iter_lines() if line.startswith("data: ")]
+        final = json.loads(lines[-1][len("data: "):])
+        assert final["event"] == "done"
+
+        response = client.get(f"/api/solve/jobs/{job_id}")
+        assert response.json()["status"] == "done"
+        assert response.json()["result"] == final["result"]
+
+
+def test_solve_job_not_found():
+    """Test that an unknown job id is not found."""
+    response = test_client.get("/api/solve/jobs/unknown/events")
+    assert response.status_code == 404
+
+
+def test_solve_batch_streams_every_item():
+    """Test that a batch dedupes identical puzzles and reports invalid ones per item."""
+    batch = [
+        {"coordinates": input_matrix_10x10},
+        {"coordinates": []},
+        {"coordinates": input_matrix_10x10},
+    ]
+    response = test_client.post("/api/solve/batch", json=batch)
+
+    assert response.status_code == 200
+    entries = {entry["index"]: entry
+               for entry in map(json.loads, response.text.splitlines())}
+    assert sorted(entries) == [0, 1, 2]
+    assert entries[1]["status_code"] == 400
+    assert np.array_equal(matrix_10x10_real_solution, np.array(entries[0]["result"]))
+    assert entries[2]["result"] == entries[0]["result"]
+
+
+def test_solve_matrix_unique():
+    """Test that the unique mode returns a witness for a puzzle with several solutions."""
+    response = test_client.post("/api/solve?unique=true", json={"coordinates": input_matrix_10x10})
+
+    assert response.status_code == 200
+    assert response.json()["unique"] is False
+    assert response.json()["witness"] != response.json()["solution"]
+
+
+def test_solve_all_streams_every_solution():
+    """Test that every solution of the 7x7 puzzle is streamed, at most limit of them."""
+    with TestClient(app=app) as client:
+        response = client.post("/api/solve/all?limit=5", json={"coordinates": input_matrix_7x7})
+
+    assert response.status_code == 200
+    solutions = [json.loads(line) for line in response.text.splitlines()]
+    assert len(solutions) == 1
+    assert solutions[0] == test_client.post(
+        "/api/solve", json={"coordinates": input_matrix_7x7}).json()
+
+
+def test_solve_session_is_edited():
+    """Test that a session is solved, edited, re-solved and closed."""
+    with TestClient(app=app) as client:
+        response = client.post("/api/sessions", json={"coordinates": input_matrix_7x7})
+        assert response.status_code == 201
+        session = response.json()
+        assert session["solution"] == client.post(
+            "/api/solve", json={"coordinates": input_matrix_7x7}).json()
+
+        response = client.patch(f"/api/sessions/{session['id']}", json={"merges": [[2, 3]]})
+        assert response.status_code == 200
+        assert len(response.json()["coordinates"]) == len(input_matrix_7x7) - 1
+
+        response = client.patch(f"/api/sessions/{session['id']}", json={"merges": [[0, 20]]})
+        assert response.status_code == 400
+
+        assert client.delete(f"/api/sessions/{session['id']}").status_code == 204
+        assert client.get(f"/api/sessions/{session['id']}").status_code == 404
+
+
+def test_solve_matrix_portfolio():
+    """Test that a portfolio race solves the puzzle and counts the win."""
+    response = test_client.post("/api/solve?portfolio=true",
+                                json={"coordinates": input_matrix_7x7})
+
+    assert response.status_code == 200
+    assert response.json() == test_client.post(
+        "/api/solve", json={"coordinates": input_matrix_7x7}).json()
+    stats = test_client.get("/api/solve/portfolio").json()
+    assert sum(entry["wins"] for entry in stats.values()) >= 1
+
+
+def test_solve_matrix_compact_input():
+    """Test that both compact formats are solved like the dict format."""
+    puzzle = from_coordinates(input_matrix_7x7)
+    expected = test_client.post("/api/solve", json={"coordinates": input_matrix_7x7}).json()
+    response = test_client.post("/api/solve", json={
+        "regions": puzzle.regions.ravel().tolist(), "symbols": puzzle.symbols})
+    assert response.json() == expected
+    response = test_client.post("/api/solve", json={"grid": encode_puzzle(puzzle)})
+    assert response.json() == expected
+    response = test_client.post("/api/solve", json={"grid": "???"})
+    assert response.status_code == 400
+
+
+def test_solve_matrix_solution_formats():
+    """Test that the solution is encoded by the format parameter or the Accept header."""
+    matrix = test_client.post("/api/solve", json={"coordinates": input_matrix_7x7}).json()
+    black = np.char.startswith(np.array(matrix), 'B')
+    bits = test_client.post("/api/solve?format=bits", json={"coordinates": input_matrix_7x7})
+    assert (decode_black(bits.json(), 'bits') == black).all()
+    packed = test_client.post("/api/solve", json={"coordinates": input_matrix_7x7},
+                              headers={"Accept": "application/vnd.puzzle.base64+json"})
+    assert (decode_black(packed.json(), 'base64') == black).all()
+    response = test_client.post("/api/solve?format=png", json={"coordinates": input_matrix_7x7})
+    assert response.status_code == 400
+
+
+def test_verify_solution():
+    """Test that a solution is checked against the rules without solving."""
+    solution = test_client.post("/api/solve", json={"coordinates": input_matrix_7x7}).json()
+    response = test_client.post("/api/verify", json={"coordinates": input_matrix_7x7,
+                                                     "solution": solution})
+    assert response.json() == {"valid": True, "violations": []}
+    solution[0] = ['W' + cell[1:] for cell in solution[0]]
+    response = test_client.post("/api/verify", json={"coordinates": input_matrix_7x7,
+                                                     "solution": solution})
+    assert not response.json()["valid"]
+    response = test_client.post("/api/verify", json={"coordinates": input_matrix_7x7,
+                                                     "solution": solution[1:]})
+    assert response.status_code == 400
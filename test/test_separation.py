@@ -0,0 +1,57 @@
+"""Test the lazy constraint separation"""
+from solver.separation import find_violations
+
+
+def to_black(cells, length):
+    """Build a flat black list from a list of (i, j) cells"""
+    black = [False] * (length * length)
+    for i, j in cells:
+        black[i * length + j] = True
+    return black
+
+
+def test_wall_between_boundaries():
+    """A diagonal chain from one border to another is a wall"""
+    wall = [(0, 1), (1, 2), (2, 3), (3, 4)]
+    walls, loops = find_violations(to_black(wall, 5), 5)
+    assert walls == [wall]
+    assert not loops
+
+
+def test_wall_trims_trailing_cells():
+    """Branches that do not reach a border are not part of the wall"""
+    wall = [(0, 2), (1, 1), (2, 0)]
+    walls, _ = find_violations(to_black(wall + [(2, 2)], 5), 5)
+    assert walls == [wall]
+
+
+def test_loop_in_the_middle():
+    """Four diagonal black cells around a white cell form a loop"""
+    loop = [(1, 2), (2, 1), (2, 3), (3, 2)]
+    walls, loops = find_violations(to_black(loop + [(4, 4)], 6), 6)
+    assert not walls
+    assert loops == [loop]
+
+
+def test_no_violation():
+    """Scattered black cells do not cut the white cells"""
+    walls, loops = find_violations(to_black([(0, 0), (2, 2), (4, 0)], 5), 5)
+    assert not walls
+    assert not loops
+
+
+def test_no_recursion_limit():
+    """A long chain is handled without recursion"""
+    length = 1200
+    chain = [(i, i) for i in range(length)]
+    walls, _ = find_violations(to_black(chain, length), length)
+    assert walls == [chain]
+
+
+def test_minimal_splits_component():
+    """Minimal mode returns each shortest wall and cycle of a component"""
+    loop = [(1, 2), (2, 1), (2, 3), (3, 2)]
+    black = to_black(loop + [(0, 1), (0, 3)], 6)
+    walls, loops = find_violations(black, 6, minimal=True)
+    assert walls == [[(0, 1), (0, 3), (1, 2)]]
+    assert loops == [loop]
@@ -0,0 +1,71 @@
+"""Test the solve sessions"""
+from test.consts_input import input_matrix_7x7
+from test.test_solver import matrix_7x7_real_solution
+import numpy as np
+import pytest
+
+from solver.session import SessionRegistry, SolveSession, edit_rooms
+from solver.utils import InvalidInputError
+
+
+def test_edit_rooms():
+    """Symbols are set on the first cell of a room and merged rooms are removed"""
+    rooms = edit_rooms(input_matrix_7x7, symbols={2: 'A'}, merges=[(2, 3), (3, 6)])
+    assert len(rooms) == len(input_matrix_7x7) - 2
+    assert rooms[2] == {'0,1': 'A', '0,2': '', '0,3': '', '0,4': ''}
+    with pytest.raises(InvalidInputError):
+        edit_rooms(input_matrix_7x7, merges=[(0, 10)])
+
+
+@pytest.mark.parametrize("backend", ["gurobi", "cpsat"])
+def test_session_resolves_edits(backend):
+    """An edit and its undo are re-solved with the cuts found before"""
+    session = SolveSession(input_matrix_7x7, backend)
+    assert np.array_equal(matrix_7x7_real_solution, np.array(session.update()))
+    cuts = len(session.cuts)
+
+    session.update(symbols={4: ''})
+    assert session.rows_changed > 0
+    result = session.update(symbols={4: 'S'})
+    assert session.coordinates == input_matrix_7x7
+    assert np.array_equal(matrix_7x7_real_solution, np.array(result))
+    assert len(session.cuts) >= cuts
+    session.close()
+
+
+@pytest.mark.parametrize("backend", ["gurobi", "cpsat"])
+def test_edits_keep_the_model(backend):
+    """An edit swaps the changed rows of the model and a solve without an edit starts again"""
+    session = SolveSession(input_matrix_7x7, backend)
+    session.update()
+    model = session.model
+    session.update(symbols={4: ''})
+    session.update()
+    result = session.update(symbols={4: 'S'})
+    assert session.model is model
+    assert np.array_equal(matrix_7x7_real_solution, np.array(result))
+    session.close()
+    assert session.model is None
+
+
+def test_invalid_edit_keeps_the_session():
+    """An edit leading to an invalid puzzle leaves the session unchanged"""
+    session = SolveSession(input_matrix_7x7, 'gurobi')
+    session.update()
+    with pytest.raises(ValueError):
+        session.update(symbols={0: 'X'})
+    assert session.coordinates == input_matrix_7x7
+    session.close()
+
+
+def test_registry_drops_idle_and_old_sessions():
+    """Sessions idle for longer than the ttl and the least recently used ones are dropped"""
+    now = [0.0]
+    registry = SessionRegistry(maxsize=2, ttl=10, clock=lambda: now[0])
+    first, second, third = (registry.add(SolveSession(input_matrix_7x7, 'cpsat'))
+                            for _ in range(3))
+    assert registry.get(first.id) is None
+    assert registry.get(second.id) is second
+    now[0] = 11
+    assert registry.get(third.id) is None
+    assert first.closed and third.closed
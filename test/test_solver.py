@@ -1,9 +1,13 @@
 """Test the solver module"""
+from test.consts_input import input_matrix_7x7, input_matrix_10x10
 import pytest
 import numpy as np
 
+from solver.backends.gurobi import WORKER, GurobiBackend
+from solver.heuristic import cell_neigh, whites_connected
 from solver.solver import Solver
-from solver.utils import InvalidInputError
+from solver.utils import EAST, NORTH, SOUTH, WEST, Grid, InvalidInputError
+from solver.verify import Verifier, black_from_result
 
 matrix_10x10_real_solution = np.array(
     [['W', 'W', 'W', 'W', 'W', 'B', 'W', 'B', 'W', 'W'],
@@ -57,11 +61,11 @@ def test_solution_too_small():
     with pytest.raises(InvalidInputError) as exc_info:
         Solver(input_matrix=too_small_input)
     assert str(
-        exc_info.value) == "The amount of rows and columns must be between 2 and 23"
+        exc_info.value) == "The amount of rows and columns must be between 2 and 64"
 
 
 too_big_input = [
-    {'0,36': '', '36,0': '', }
+    {'0,70': '', '70,0': '', }
 ]
 
 
@@ -70,7 +74,7 @@ def test_solution_too_big():
     with pytest.raises(InvalidInputError) as exc_info:
         Solver(input_matrix=too_big_input)
     assert str(
-        exc_info.value) == "The amount of rows and columns must be between 2 and 23"
+        exc_info.value) == "The amount of rows and columns must be between 2 and 64"
 
 
 different_rows_and_cols = [
@@ -134,3 +138,173 @@ def test_check_input_validity():
         Solver(input_matrix=inp_test)
     assert str(
         exc_info.value) == "Invalid value in coordinates, must be empty string or 'S'/'A'."
+
+
+def test_solution_matrix_10x10_multi_cut():
+    """
+    Validate the solution for 10x10 matrix when all violated cuts are added at once
+    """
+    solver = Solver(input_matrix=input_matrix_10x10, multi_cut=True)
+    _solution_10x10 = np.array(solver.solve())
+    assert np.array_equal(matrix_10x10_real_solution, _solution_10x10)
+    assert solver.get_stats()['lazy_constraints_added'] == solver.lazy_constraints_added
+
+
+def test_solution_matrix_7x7_cpsat():
+    """
+    Validate the solution for 7x7 matrix with the CP-SAT backend
+    """
+    solver = Solver(input_matrix=input_matrix_7x7, backend='cpsat')
+    _solution_7x7 = np.array(solver.solve())
+    assert np.array_equal(matrix_7x7_real_solution, _solution_7x7)
+    assert solver.get_stats()['backend'] == 'cpsat'
+
+
+def test_cpsat_lifts_size_limit():
+    """Test that grids above the Gurobi limit are solved by the CP-SAT backend"""
+    one_room = [{f'{x},{y}': '' for x in range(30) for y in range(30)}]
+    with pytest.raises(InvalidInputError):
+        Solver(input_matrix=one_room, backend='gurobi')
+    solver = Solver(input_matrix=one_room)
+    assert len(solver.solve()) == 30
+    assert solver.get_stats()['backend'] == 'cpsat'
+
+
+@pytest.mark.parametrize("backend", ["gurobi", "cpsat", "bitboard"])
+def test_unique_solution_7x7(backend):
+    """The 7x7 puzzle is proven unique on every backend"""
+    solver = Solver(input_matrix=input_matrix_7x7, backend=backend, unique=True)
+    assert np.array_equal(solver.solve(), matrix_7x7_real_solution)
+    assert solver.get_uniqueness() == {"unique": True, "witness": None}
+
+
+def test_second_solution_10x10():
+    """The 10x10 puzzle has another solution, returned as a witness"""
+    solver = Solver(input_matrix=input_matrix_10x10, unique=True)
+    solution = solver.solve()
+    assert np.array_equal(solution, matrix_10x10_real_solution)
+    assert solver.is_unique is False
+    assert solver.witness and solver.witness != solution
+
+
+input_matrix_5x5_ambiguous = [
+    {'3,4': '', '4,4': 'S'},
+    {'0,0': '', '0,1': 'S', '0,2': '', '0,3': '', '0,4': ''},
+    {'1,0': '', '1,1': '', '1,2': '', '2,0': '', '2,1': '', '2,2': '',
+     '3,0': '', '3,1': '', '3,2': '', '4,0': '', '4,1': '', '4,2': ''},
+    {'1,3': 'S'},
+    {'1,4': 'A', '2,4': ''},
+    {'2,3': '', '3,3': '', '4,3': 'S'},
+]
+
+
+@pytest.mark.parametrize("backend", ["gurobi", "cpsat", "bitboard"])
+def test_iter_solutions(backend):
+    """Every backend enumerates the same 5 distinct solutions"""
+    solver = Solver(input_matrix=input_matrix_5x5_ambiguous, backend=backend)
+    solutions = sorted(map(str, solver.iter_solutions()))
+    assert len(set(solutions)) == 5
+    reference = Solver(input_matrix=input_matrix_5x5_ambiguous, backend='bitboard')
+    assert solutions == sorted(map(str, reference.iter_solutions()))
+    assert len(list(Solver(input_matrix_5x5_ambiguous).iter_solutions(limit=2))) == 2
+
+
+def test_run_ends():
+    """A run ends at the first cell of its third region"""
+    assert Solver.run_ends([0, 0, 1, 2, 2, 1, 3]) == [3, 3, 6, 6, 6, None, None]
+    assert Solver.run_ends([0, None, 1, 2]) == [3, None, None, None]
+
+
+def test_region_index(solution_7x7):
+    """Every cell maps to the region holding it"""
+    for region_id, region in enumerate(solution_7x7.regions):
+        assert all(solution_7x7.region_ids[x][y] == region_id for x, y in region.get_pos())
+
+
+def test_grid_walls_and_result():
+    """Walls separate the regions of a grid and the result keeps the cell symbols"""
+    # a 2x2 grid: the left column, then the right column
+    grid = Grid.from_groups(2, [[0, 1], [2, 3]], {3: 'S'})
+    assert grid.walls.tolist() == [NORTH | EAST | WEST, SOUTH | EAST | WEST,
+                                   NORTH | EAST | WEST, SOUTH | EAST | WEST]
+    assert [region.get_pos() for region in grid.regions()] == [[(0, 0), (0, 1)],
+                                                              [(1, 0), (1, 1)]]
+    assert grid.regions()[1].symbol == 'S'
+    grid.set_colours([0, 3])
+    assert grid.result() == [['B', 'W'], ['W', 'B/S']]
+
+
+@pytest.mark.parametrize("build", ["matrix", "tight"])
+@pytest.mark.parametrize("backend", ["gurobi", "cpsat"])
+def test_matrix_build(backend, build):
+    """The matrix and tight builds have the same solutions as the loop build"""
+    solver = Solver(input_matrix=input_matrix_7x7, backend=backend, build=build)
+    assert np.array_equal(solver.solve(), matrix_7x7_real_solution)
+    solver = Solver(input_matrix_5x5_ambiguous, backend=backend, build=build)
+    solutions = list(solver.iter_solutions())
+    reference = Solver(input_matrix_5x5_ambiguous, backend=backend).iter_solutions()
+    assert sorted(map(str, solutions)) == sorted(map(str, reference))
+    verifier = Verifier(solver)
+    assert not any(verifier.check(black_from_result(solution, 5)) for solution in solutions)
+
+
+def test_constraint_matrix_shape(solution_7x7):
+    """The matrices have a column per cell and a row per constraint"""
+    matrix, sense, rhs = solution_7x7.neighbour_matrix()
+    assert matrix.shape == (2 * 49, 49)
+    assert len(sense) == len(rhs) == 2 * 49
+    equal, exclusive, _ = solution_7x7.symmetry_pairs()
+    matrix, sense, rhs = solution_7x7.region_matrix(equal, exclusive)
+    rows = len(solution_7x7.orthogonal_runs()) + len(equal) + len(exclusive)
+    assert matrix.shape == (rows, 49)
+    assert len(sense) == len(rhs) == rows
+
+
+def test_matrix_template_is_reused():
+    """Models of the same size are copied from one template per worker"""
+    for _ in range(2):
+        solver = Solver(input_matrix=input_matrix_7x7, build='matrix', backend='gurobi')
+        assert np.array_equal(solver.solve(), matrix_7x7_real_solution)
+    assert ('matrix', 7) in WORKER.templates
+    template = WORKER.templates[('matrix', 7)]
+    assert template.NumVars == 49 and template.NumConstrs == 2 * 49
+    assert GurobiBackend().model.NumVars == 0
+
+
+def test_loop_template_is_reused():
+    """Models of the default build copy their size-only rows from a template"""
+    for _ in range(2):
+        solver = Solver(input_matrix=input_matrix_7x7, backend='gurobi')
+        assert np.array_equal(solver.solve(), matrix_7x7_real_solution)
+    template = WORKER.templates[('loop', 7)]
+    assert template.NumVars == 2 * 49 and template.NumConstrs == 3 * 49
+
+
+def test_tight_build_merges_s_pairs(solution_7x7):
+    """Cells of an 'S' pair share their variable in the tight build"""
+    black_vars = solution_7x7.build_tight_model(GurobiBackend(), {})
+    equal, _, _ = solution_7x7.symmetry_pairs()
+    assert equal
+    assert all(black_vars[first] is black_vars[second] for first, second in equal)
+    assert len(set(map(id, black_vars.values()))) == 49 - len(equal)
+
+
+@pytest.mark.parametrize("backend", ["gurobi", "cpsat"])
+def test_warm_start_from_solution(backend):
+    """A known solution offered as a start is used and solved again"""
+    start = [(x, y) for y, row in enumerate(matrix_7x7_real_solution)
+             for x, cell in enumerate(row) if cell.startswith('B')]
+    solver = Solver(input_matrix=input_matrix_7x7, backend=backend)
+    assert np.array_equal(matrix_7x7_real_solution, np.array(solver.solve(start=start)))
+    assert solver.get_stats()['warm_started']
+
+
+def test_heuristic_start():
+    """The greedy start keeps black cells apart and white cells connected"""
+    solver = Solver(input_matrix=input_matrix_10x10, warm_start=True)
+    black = set(solver.heuristic_start({}))
+    assert black
+    assert not any(neighbour in black for cell in black for neighbour in cell_neigh(cell, 10))
+    assert whites_connected(black, 10)
+    solver.solve()
+    assert solver.get_stats()['warm_started']
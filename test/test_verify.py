@@ -0,0 +1,42 @@
+"""Test the solution verifier"""
+from test.consts_input import input_matrix_7x7
+from test.test_solver import matrix_7x7_real_solution
+import pytest
+
+from solver.solver import Solver
+from solver.utils import InvalidInputError
+from solver.verify import Verifier, black_from_cells, black_from_result
+
+
+@pytest.fixture(name="verifier")
+def fixture_verifier():
+    """Fixture for the verifier of the 7x7 puzzle"""
+    return Verifier(Solver(input_matrix=input_matrix_7x7))
+
+
+def test_solution_is_valid(verifier):
+    """The known solution breaks no rule"""
+    assert verifier.check(black_from_result(matrix_7x7_real_solution, 7)) == []
+
+
+def test_broken_rules_are_reported(verifier):
+    """Every flipped cell of the solution breaks a rule, reported by name"""
+    black = black_from_result(matrix_7x7_real_solution, 7)
+    for x in range(7):
+        for y in range(7):
+            flipped = black.copy()
+            flipped[x, y] = not flipped[x, y]
+            assert verifier.check(flipped)
+    rules = {violation["rule"] for violation in verifier.check(black_from_cells([], 7))}
+    assert "white run spanning 3 regions" in rules
+    adjacent = black_from_cells([(0, 0), (0, 1)], 7)
+    rules = {violation["rule"] for violation in verifier.check(adjacent)}
+    assert "adjacent black cells" in rules
+
+
+def test_invalid_solution_matrix():
+    """A matrix of the wrong size or with unknown cells is rejected"""
+    with pytest.raises(InvalidInputError):
+        black_from_result([['B', 'W'], ['W', 'W']], 7)
+    with pytest.raises(InvalidInputError):
+        black_from_result([['G'] * 7] * 7, 7)
@@ -0,0 +1,65 @@
+"""Test the buffered writer of generated documents"""
+import asyncio
+from types import SimpleNamespace
+
+from generators import all_possible_variants_generator
+from generators.all_possible_variants_generator import (additioal_conditions, layout,
+                                                         solve_variants)
+from generators.writer import BufferedWriter, WriteStats
+
+
+class SlowCollection:
+    """Collection keeping inserted documents, each insert_many takes a moment"""
+
+    def __init__(self):
+        self.batches = []
+        self.pending = 0
+        self.most_pending = 0
+
+    async def insert_many(self, documents, ordered=True):
+        """Record a batch and how many batches were pending at once"""
+        assert not ordered
+        self.pending += 1
+        self.most_pending = max(self.most_pending, self.pending)
+        await asyncio.sleep(0.01)
+        self.pending -= 1
+        self.batches.append(documents)
+        return SimpleNamespace(inserted_ids=list(range(len(documents))))
+
+
+def test_documents_are_written_in_bounded_batches():
+    """Every document is written in batches, with at most max_in_flight pending"""
+    collection = SlowCollection()
+    stats = WriteStats()
+
+    async def write():
+        async with BufferedWriter(collection, batch_size=10, max_in_flight=2,
+                                  stats=stats) as writer:
+            for k in range(95):
+                await writer.add({"k": k})
+
+    asyncio.run(write())
+    assert [len(batch) for batch in collection.batches] == [10] * 9 + [5]
+    assert sorted(doc["k"] for batch in collection.batches for doc in batch) == list(range(95))
+    assert collection.most_pending == 2
+    totals = stats.to_dict()
+    assert totals["documents"] == 95 and totals["batches"] == 10
+    assert totals["documents_per_second"] > 0
+
+
+def test_variants_are_solved_in_the_pool(monkeypatch):
+    """Every layout is solved in the batch pool and its solvable variants are written"""
+    collection = SlowCollection()
+
+    async def delete_many(_query):
+        collection.batches.clear()
+
+    collection.delete_many = delete_many
+    monkeypatch.setattr(all_possible_variants_generator, 'DB',
+                        {'variant-3': collection})
+    count = asyncio.run(all_possible_variants_generator.generate_variants(3, ['S'], 0, 8))
+    documents = [document for batch in collection.batches for document in batch]
+    assert count == len(documents) > 0
+    expected = [document for i in range(8) for document in solve_variants(
+        additioal_conditions(layout(3, i), ['', 'S'])[0])]
+    assert documents == expected